@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import List, Optional, Dict, Any, Tuple, TextIO
+
+# Import the shared cache directory and file hashing
+try:
+    from embedding_cache import DEFAULT_CACHE_DIR
+    from index_manifest import compute_file_hash
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.embedding_cache import DEFAULT_CACHE_DIR
+    from code_review_assistant.index_manifest import compute_file_hash
+
+CACHE_FILENAME = "analysis.sqlite3"
+
+class AnalysisCache:
+    """Disk-backed cache of the issues found in each analyzed file
+
+    Entries are keyed by (project path, file path) and are only valid for the
+    content hash and rule-set version they were computed with. A file whose
+    size and modification time are unchanged is served without being read; a
+    file whose stat changed but whose content hash is unchanged (for example
+    after a checkout) is served after hashing it.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        """Open (and create if needed) the analysis cache
+
+        Args:
+            cache_dir: Directory where the cache database is stored
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, CACHE_FILENAME)
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS file_issues (
+                project TEXT NOT NULL,
+                path TEXT NOT NULL,
+                ruleset TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                issues TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (project, path)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def lookup(
+        self,
+        project_path: str,
+        file_paths: List[str],
+        ruleset: str,
+    ) -> Tuple[Dict[str, str], Dict[str, Tuple[str, int, int]]]:
+        """Look up the cached issues of the files of a project
+
+        Args:
+            project_path: Path of the analyzed project
+            file_paths: Paths of the files to look up
+            ruleset: Version of the rule set the issues must have been computed with
+
+        Returns:
+            Tuple of (JSON-encoded issues of each cached file, (content hash,
+            size, mtime) of each file that has to be analyzed, for storing its
+            result). The issues are left encoded so callers can decode one
+            file at a time.
+        """
+        project = os.path.abspath(project_path)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, ruleset, content_hash, size, mtime_ns, issues FROM file_issues WHERE project = ?",
+                (project,),
+            ).fetchall()
+        entries = {row[0]: row[1:] for row in rows}
+
+        cached = {}
+        misses = {}
+        touched = []
+        for file_path in file_paths:
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                # Let the analysis report the unreadable file
+                continue
+
+            key = os.path.abspath(file_path)
+            entry = entries.get(key)
+            if entry is not None and entry[0] == ruleset:
+                _, _, size, mtime_ns, issues = entry
+                if size == stat.st_size and mtime_ns == stat.st_mtime_ns:
+                    cached[file_path] = issues
+                    continue
+
+            try:
+                file_hash = compute_file_hash(file_path)
+            except OSError:
+                continue
+
+            if entry is not None and entry[0] == ruleset and entry[1] == file_hash:
+                cached[file_path] = entry[4]
+                touched.append((stat.st_size, stat.st_mtime_ns, project, key))
+            else:
+                misses[file_path] = (file_hash, stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            # Refresh the stat of files served by content hash so the next run takes the fast path
+            if touched:
+                self._conn.executemany(
+                    "UPDATE file_issues SET size = ?, mtime_ns = ? WHERE project = ? AND path = ?",
+                    touched,
+                )
+                self._conn.commit()
+            self.hits += len(cached)
+            self.misses += len(file_paths) - len(cached)
+
+        return cached, misses
+
+    def store(
+        self,
+        project_path: str,
+        ruleset: str,
+        results: List[Tuple[str, Tuple[str, int, int], List[Dict[str, Any]]]],
+    ) -> None:
+        """Store the issues of analyzed files
+
+        Args:
+            project_path: Path of the analyzed project
+            ruleset: Version of the rule set the issues were computed with
+            results: (file path, (content hash, size, mtime), issues) of each file
+        """
+        project = os.path.abspath(project_path)
+        now = time.time()
+        rows = [
+            (project, os.path.abspath(file_path), ruleset, file_hash, size, mtime_ns, json.dumps(issues), now)
+            for file_path, (file_hash, size, mtime_ns), issues in results
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO file_issues (project, path, ruleset, content_hash, size, mtime_ns, issues, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def prune(self, project_path: str, file_paths: List[str]) -> None:
+        """Remove the entries of files that are no longer part of a project
+
+        Args:
+            project_path: Path of the analyzed project
+            file_paths: Paths of all current files of the project
+        """
+        project = os.path.abspath(project_path)
+        current = set(os.path.abspath(file_path) for file_path in file_paths)
+        with self._lock:
+            stale = [
+                (project, path)
+                for (path,) in self._conn.execute("SELECT path FROM file_issues WHERE project = ?", (project,))
+                if path not in current
+            ]
+            self._conn.executemany("DELETE FROM file_issues WHERE project = ? AND path = ?", stale)
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the cache counters and size
+
+        Returns:
+            Dictionary with hits, misses, hit rate and entries
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM file_issues").fetchone()[0]
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+    def report(self, stream: Optional[TextIO] = None) -> None:
+        """Print the cache counters
+
+        Args:
+            stream: Stream to print to (stdout if None)
+        """
+        stats = self.stats()
+        print(
+            f"Analysis cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} hit rate), {stats['entries']} entries",
+            file=stream,
+        )
+
+    def close(self) -> None:
+        """Close the cache database"""
+        with self._lock:
+            self._conn.close()
+
+def open_analysis_cache(cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> Optional[AnalysisCache]:
+    """Open the analysis cache, or return None if it is disabled or unavailable
+
+    Args:
+        cache_dir: Directory of the cache, or None to disable it
+
+    Returns:
+        The opened cache, or None
+    """
+    if cache_dir is None:
+        return None
+    try:
+        return AnalysisCache(cache_dir)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Warning: Could not open the analysis cache in '{cache_dir}': {e}")
+        print("Continuing without the analysis cache.")
+        return None
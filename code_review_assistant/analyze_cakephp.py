@@ -4,16 +4,21 @@
 import os
 import sys
 import argparse
-from pathlib import Path
 from typing import List, Dict, Any, Optional
 
 # Import CakePHP analyzer
 try:
-    from cakephp_analyzer import analyze_cakephp, CakePHP210Analyzer
+    from cakephp_analyzer import (
+        analyze_cakephp, CakePHP210Analyzer, DEFAULT_CACHE_DIR, DEFAULT_MAX_FILE_SIZE,
+        OUTPUT_FORMATS, STREAMING_FORMATS, MIN_SEVERITY_CHOICES,
+    )
 except ImportError:
     # If imported from a different directory
     try:
-        from code_review_assistant.cakephp_analyzer import analyze_cakephp, CakePHP210Analyzer
+        from code_review_assistant.cakephp_analyzer import (
+            analyze_cakephp, CakePHP210Analyzer, DEFAULT_CACHE_DIR, DEFAULT_MAX_FILE_SIZE,
+            OUTPUT_FORMATS, STREAMING_FORMATS, MIN_SEVERITY_CHOICES,
+        )
     except ImportError:
         print("Error: Could not import CakePHP analyzer.")
         sys.exit(1)
@@ -44,35 +49,68 @@ def find_cakephp_project(start_path: str) -> str:
     # If we couldn't find a CakePHP project, return the original path
     return start_path
 
-def main():
-    """Main function to run the CakePHP analyzer"""
-    parser = argparse.ArgumentParser(description="CakePHP 2.10 Code Analyzer")
+def main(argv: Optional[List[str]] = None, prog: Optional[str] = None):
+    """Main function to run the CakePHP analyzer
+
+    Args:
+        argv: Command-line arguments (sys.argv[1:] if None)
+        prog: Program name shown in the usage message
+    """
+    parser = argparse.ArgumentParser(prog=prog, description="CakePHP 2.10 Code Analyzer")
     parser.add_argument("path", help="Path to the CakePHP project or file to analyze")
-    parser.add_argument("--output", "-o", default="console", choices=["console", "json"],
-                        help="Output format")
+    parser.add_argument("--output", "-o", default="console", choices=OUTPUT_FORMATS,
+                        help="Output format (jsonl and sarif are written while files are analyzed)")
+    parser.add_argument("--output-file", "-f",
+                        help="Write the output to this file instead of stdout")
+    parser.add_argument("--min-severity", choices=MIN_SEVERITY_CHOICES,
+                        help="Drop issues below this severity")
     parser.add_argument("--auto-detect", "-a", action="store_true",
                         help="Auto-detect CakePHP project root")
+    parser.add_argument("--related", "-r", action="store_true",
+                        help="Analyze only the given file and its MVC counterparts (model, controller, views, components)")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="Number of processes analyzing files (0 for one per CPU)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help="Directory of the analysis result cache")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not read or write the analysis result cache")
+    parser.add_argument("--no-ignore", action="store_true",
+                        help="Also analyze vendor, tmp and minified files and the paths listed in .gitignore/.reviewignore")
+    parser.add_argument("--max-file-kb", type=int, default=DEFAULT_MAX_FILE_SIZE // 1024,
+                        help=f"Skip files larger than this many KB, 0 for no limit (default: {DEFAULT_MAX_FILE_SIZE // 1024})")
     parser.add_argument("--version", "-v", action="version", version="CakePHP Analyzer 1.0")
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+
+    # Keep status messages out of results streamed to stdout
+    status = sys.stderr if args.output in STREAMING_FORMATS and not args.output_file else sys.stdout
 
     # Check if path exists
     if not os.path.exists(args.path):
         print(f"Error: Path '{args.path}' not found.")
         sys.exit(1)
 
+    target_file = None
+    if args.related:
+        # Scope the analysis to the file; its project root is always detected
+        if not os.path.isfile(args.path):
+            print(f"Error: --related requires a file, but '{args.path}' is a directory.")
+            sys.exit(1)
+        target_file = args.path
+        project_path = find_cakephp_project(args.path)
+        print(f"Using CakePHP project root: {project_path}", file=status)
     # Auto-detect CakePHP project root if requested
-    if args.auto_detect:
+    elif args.auto_detect:
         detected_path = find_cakephp_project(args.path)
         if detected_path != args.path:
-            print(f"Auto-detected CakePHP project root: {detected_path}")
+            print(f"Auto-detected CakePHP project root: {detected_path}", file=status)
             project_path = detected_path
         else:
             # If no CakePHP project was detected, check if we're analyzing a specific file
             if os.path.isfile(args.path):
                 # Use the current working directory or parent directories
                 cwd = os.getcwd()
-                print(f"No CakePHP project structure found. Using current directory: {cwd}")
+                print(f"No CakePHP project structure found. Using current directory: {cwd}", file=status)
                 project_path = cwd
             else:
                 project_path = args.path
@@ -80,7 +118,17 @@ def main():
         project_path = args.path
 
     # Run the analyzer
-    analyze_cakephp(project_path, args.output)
+    analyze_cakephp(
+        project_path,
+        args.output,
+        args.jobs,
+        None if args.no_cache else args.cache_dir,
+        target_file,
+        min_severity=args.min_severity,
+        output_file=args.output_file,
+        ignore=not args.no_ignore,
+        max_file_size=args.max_file_kb * 1024 or None,
+    )
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import math
+import hashlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+ANN_FILENAME = "ann_ivf.npz"
+MAX_TRAINING_ROWS = 50000
+KMEANS_ITERATIONS = 10
+ASSIGN_CHUNK_ROWS = 8192
+
+def fingerprint_node_ids(node_ids: List[str]) -> str:
+    """Return a fingerprint of the node id table an ANN index was built for
+
+    Args:
+        node_ids: The node id of each matrix row
+
+    Returns:
+        Hex digest of the node ids in row order
+    """
+    digest = hashlib.sha1()
+    for node_id in node_ids:
+        digest.update(node_id.encode('utf-8'))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def recommended_list_count(num_rows: int) -> int:
+    """Return the number of inverted lists for a matrix of the given size
+
+    Args:
+        num_rows: Number of vectors in the index
+
+    Returns:
+        Number of k-means clusters (about the square root of the row count)
+    """
+    return max(1, min(4096, int(math.sqrt(num_rows))))
+
+def _assign(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Assign each row to its most similar centroid, in chunks to bound memory"""
+    assignments = np.empty(matrix.shape[0], dtype=np.int32)
+    for start in range(0, matrix.shape[0], ASSIGN_CHUNK_ROWS):
+        chunk = np.asarray(matrix[start:start + ASSIGN_CHUNK_ROWS], dtype=np.float32)
+        assignments[start:start + chunk.shape[0]] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+def _train_centroids(matrix: np.ndarray, n_lists: int, seed: int) -> np.ndarray:
+    """Train centroids with spherical k-means on a sample of the rows"""
+    rng = np.random.default_rng(seed)
+    num_rows = matrix.shape[0]
+    sample_rows = np.sort(rng.choice(num_rows, size=min(num_rows, MAX_TRAINING_ROWS), replace=False))
+    sample = np.asarray(matrix[sample_rows], dtype=np.float32)
+
+    centroids = sample[rng.choice(sample.shape[0], size=n_lists, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignments = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=n_lists)
+
+        # Re-seed empty clusters with random sample rows
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            sums[empty] = sample[rng.choice(sample.shape[0], size=empty.size, replace=False)]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+
+    return centroids
+
+class IVFIndex:
+    """Inverted-file approximate nearest-neighbour index over a vector matrix
+
+    The rows of the matrix are clustered with spherical k-means and stored in
+    one inverted list per centroid. A search only scores the rows of the
+    `nprobe` lists whose centroids are closest to the query, so `nprobe` trades
+    recall for latency. The index stores row numbers only; the vectors stay in
+    the (memory-mapped) vector store matrix.
+    """
+
+    def __init__(self, centroids: np.ndarray, list_offsets: np.ndarray, list_rows: np.ndarray, fingerprint: str):
+        """Initialize the index from its arrays
+
+        Args:
+            centroids: Normalised centroid matrix (one row per inverted list)
+            list_offsets: Start offset of each list in `list_rows` (length n_lists + 1)
+            list_rows: Matrix row numbers grouped by list
+            fingerprint: Fingerprint of the node ids the index was built for
+        """
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.fingerprint = fingerprint
+
+    @property
+    def num_lists(self) -> int:
+        return self.centroids.shape[0]
+
+    @property
+    def num_rows(self) -> int:
+        return self.list_rows.shape[0]
+
+    @classmethod
+    def build(
+        cls,
+        matrix: np.ndarray,
+        node_ids: List[str],
+        n_lists: Optional[int] = None,
+        centroids: Optional[np.ndarray] = None,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """Build the index for a normalised vector matrix
+
+        Args:
+            matrix: Normalised vector matrix (one row per node)
+            node_ids: The node id of each matrix row
+            n_lists: Number of inverted lists (defaults to about sqrt(rows))
+            centroids: Centroids of a previous build to reuse instead of training
+            seed: Random seed for k-means
+
+        Returns:
+            The built index
+        """
+        num_rows = matrix.shape[0]
+        if num_rows == 0:
+            raise ValueError("Cannot build an ANN index for an empty matrix.")
+
+        if centroids is None:
+            n_lists = min(n_lists or recommended_list_count(num_rows), num_rows)
+            centroids = _train_centroids(matrix, n_lists, seed)
+
+        assignments = _assign(matrix, centroids)
+        list_rows = np.argsort(assignments, kind="stable").astype(np.int64)
+        counts = np.bincount(assignments, minlength=centroids.shape[0])
+        list_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+        return cls(centroids, list_offsets, list_rows, fingerprint_node_ids(node_ids))
+
+    def search(self, matrix: np.ndarray, query_vector: np.ndarray, k: int, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the approximate top-k rows for a normalised query vector
+
+        Args:
+            matrix: The vector matrix the index was built for
+            query_vector: Normalised query vector
+            k: Number of results
+            nprobe: Number of inverted lists to scan
+
+        Returns:
+            Tuple of (rows, scores) in descending score order
+        """
+        nprobe = max(1, min(nprobe, self.num_lists))
+        centroid_scores = self.centroids @ query_vector
+        if nprobe < self.num_lists:
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probe = np.arange(self.num_lists)
+
+        rows = np.concatenate([
+            self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probe
+        ])
+        if rows.size == 0:
+            return rows, np.array([], dtype=np.float32)
+
+        # Read the candidate rows in file order, which is kinder to a memmap
+        rows.sort()
+        scores = np.asarray(matrix[rows], dtype=np.float32) @ query_vector
+
+        k = min(k, rows.size)
+        top = np.argpartition(-scores, k - 1)[:k] if k < rows.size else np.arange(rows.size)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return rows[top], scores[top]
+
+    def save(self, persist_dir: str) -> None:
+        """Save the index next to the vector store files
+
+        Args:
+            persist_dir: Directory where the index is stored
+        """
+        path = os.path.join(persist_dir, ANN_FILENAME)
+        with open(path + ".tmp", 'wb') as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                list_offsets=self.list_offsets,
+                list_rows=self.list_rows,
+                fingerprint=np.array(self.fingerprint),
+            )
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, persist_dir: str) -> Optional["IVFIndex"]:
+        """Load a saved index
+
+        Args:
+            persist_dir: Directory where the index is stored
+
+        Returns:
+            The loaded index, or None if there is none
+        """
+        path = os.path.join(persist_dir, ANN_FILENAME)
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path) as data:
+            return cls(
+                data["centroids"],
+                data["list_offsets"],
+                data["list_rows"],
+                str(data["fingerprint"]),
+            )
+
+def remove_ann_index(persist_dir: str) -> None:
+    """Remove a saved index that no longer matches the vector store
+
+    Args:
+        persist_dir: Directory where the index is stored
+    """
+    path = os.path.join(persist_dir, ANN_FILENAME)
+    if os.path.exists(path):
+        os.remove(path)
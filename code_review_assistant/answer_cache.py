@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from typing import Optional, Dict, Any, Sequence
+
+import numpy as np
+
+# Import the shared cache directory and the answer cache defaults
+try:
+    from defaults import DEFAULT_CACHE_DIR, DEFAULT_ANSWER_TTL_HOURS, DEFAULT_ANSWER_CACHE_SIZE
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.defaults import DEFAULT_CACHE_DIR, DEFAULT_ANSWER_TTL_HOURS, DEFAULT_ANSWER_CACHE_SIZE
+
+CACHE_FILENAME = "answers.sqlite3"
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different phrasings share a cache entry
+
+    Case, repeated whitespace and trailing punctuation are ignored. Punctuation
+    inside the query is kept, as it is often part of code (`$this->Auth`).
+
+    Args:
+        query: The query as typed
+
+    Returns:
+        The normalized query
+    """
+    query = unicodedata.normalize("NFKC", query).casefold()
+    query = re.sub(r"\s+", " ", query).strip()
+    return query.rstrip("?!.。？！ ")
+
+def hash_key(value: Any) -> str:
+    """Return a short hash of a JSON-serializable value
+
+    Args:
+        value: The value to hash, such as an index fingerprint or the generation settings
+
+    Returns:
+        Hex digest of the value
+    """
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":")).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+class AnswerCache:
+    """Disk-backed cache of query answers
+
+    Entries are keyed by (index directory, index version, settings, normalized
+    query). The index version is a hash of the index file fingerprint, so an
+    answer is never served from a rebuilt or updated index; the entries of
+    older versions are deleted when the new index is loaded. The settings
+    cover everything that changes the answer: models, temperature, token
+    limit and retrieval options.
+
+    With a similarity threshold, a query with a different wording is served
+    the answer of the most similar cached query if the cosine similarity of
+    their embeddings reaches the threshold. Entries expire after `ttl_hours`,
+    and beyond `max_entries` the least recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        ttl_hours: float = DEFAULT_ANSWER_TTL_HOURS,
+        max_entries: int = DEFAULT_ANSWER_CACHE_SIZE,
+    ):
+        """Open (and create if needed) the answer cache
+
+        Args:
+            cache_dir: Directory where the cache database is stored
+            ttl_hours: Hours after which an answer expires (never if 0)
+            max_entries: Maximum number of cached answers
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, CACHE_FILENAME)
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_entries = max_entries
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                index_dir TEXT NOT NULL,
+                index_version TEXT NOT NULL,
+                settings TEXT NOT NULL,
+                query_hash TEXT NOT NULL,
+                query TEXT NOT NULL,
+                embedding BLOB,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (index_dir, index_version, settings, query_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+        self._conn.commit()
+
+    def _expiry(self) -> float:
+        """Return the creation time before which entries are expired"""
+        return time.time() - self.ttl_seconds if self.ttl_seconds > 0 else 0.0
+
+    def get(self, index_dir: str, index_version: str, settings: str, query: str) -> Optional[Dict[str, Any]]:
+        """Look up the answer to the same normalized query
+
+        Args:
+            index_dir: Directory of the queried index
+            index_version: Hash of the index fingerprint
+            settings: Hash of the settings the answer must have been generated with
+            query: The query
+
+        Returns:
+            The cached query result, or None for a miss
+        """
+        key = (os.path.abspath(index_dir), index_version, settings, hash_key(normalize_query(query)))
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM answers WHERE index_dir = ? AND index_version = ? AND settings = ? "
+                "AND query_hash = ? AND created_at >= ?",
+                key + (self._expiry(),),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE answers SET last_used = ? WHERE index_dir = ? AND index_version = ? AND settings = ? AND query_hash = ?",
+                (time.time(),) + key,
+            )
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def get_similar(
+        self,
+        index_dir: str,
+        index_version: str,
+        settings: str,
+        embedding: Sequence[float],
+        threshold: float,
+    ) -> Optional[Dict[str, Any]]:
+        """Look up the answer of the most similar cached query
+
+        Args:
+            index_dir: Directory of the queried index
+            index_version: Hash of the index fingerprint
+            settings: Hash of the settings the answer must have been generated with
+            embedding: Embedding of the query
+            threshold: Minimum cosine similarity of the cached query
+
+        Returns:
+            The cached query result with the matched query under "cached_query",
+            or None if no cached query is similar enough
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        vector = vector / norm
+
+        index_dir = os.path.abspath(index_dir)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT query_hash, query, embedding FROM answers WHERE index_dir = ? AND index_version = ? "
+                "AND settings = ? AND embedding IS NOT NULL AND created_at >= ?",
+                (index_dir, index_version, settings, self._expiry()),
+            ).fetchall()
+            rows = [row for row in rows if len(row[2]) == vector.nbytes]
+            if not rows:
+                return None
+
+            # Stored embeddings are normalized, so the dot product is the cosine similarity
+            matrix = np.frombuffer(b"".join(row[2] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+            scores = matrix @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < threshold:
+                return None
+
+            query_hash, cached_query = rows[best][:2]
+            key = (index_dir, index_version, settings, query_hash)
+            row = self._conn.execute(
+                "SELECT result FROM answers WHERE index_dir = ? AND index_version = ? AND settings = ? AND query_hash = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE answers SET last_used = ? WHERE index_dir = ? AND index_version = ? AND settings = ? AND query_hash = ?",
+                (time.time(),) + key,
+            )
+            self._conn.commit()
+            self.similar_hits += 1
+
+        result = json.loads(row[0])
+        result["cached_query"] = cached_query
+        return result
+
+    def record_miss(self) -> None:
+        """Count a query that had to be answered by the model"""
+        with self._lock:
+            self.misses += 1
+
+    def put(
+        self,
+        index_dir: str,
+        index_version: str,
+        settings: str,
+        query: str,
+        result: Dict[str, Any],
+        embedding: Optional[Sequence[float]] = None,
+    ) -> None:
+        """Store the answer to a query
+
+        Args:
+            index_dir: Directory of the queried index
+            index_version: Hash of the index fingerprint
+            settings: Hash of the settings the answer was generated with
+            query: The query
+            result: The query result dictionary
+            embedding: Embedding of the query, for similarity lookups
+        """
+        blob = None
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            if norm > 0:
+                blob = (vector / norm).tobytes()
+
+        now = time.time()
+        row = (
+            os.path.abspath(index_dir), index_version, settings, hash_key(normalize_query(query)),
+            query, blob, json.dumps(result), now, now,
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (index_dir, index_version, settings, query_hash, query, embedding, "
+                "result, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row,
+            )
+            self._conn.commit()
+            self._evict()
+
+    def _evict(self) -> None:
+        """Delete expired entries and the least recently used entries beyond the limit"""
+        cursor = self._conn.execute("DELETE FROM answers WHERE created_at < ?", (self._expiry(),))
+        evicted = cursor.rowcount
+        entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        if entries > self.max_entries:
+            cursor = self._conn.execute(
+                "DELETE FROM answers WHERE rowid IN (SELECT rowid FROM answers ORDER BY last_used LIMIT ?)",
+                (entries - self.max_entries,),
+            )
+            evicted += cursor.rowcount
+        self._conn.commit()
+        self.evictions += evicted
+
+    def invalidate(self, index_dir: str, index_version: str) -> int:
+        """Delete the answers computed from other versions of an index
+
+        Args:
+            index_dir: Directory of the index
+            index_version: Hash of the fingerprint of the current index
+
+        Returns:
+            Number of deleted answers
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM answers WHERE index_dir = ? AND index_version != ?",
+                (os.path.abspath(index_dir), index_version),
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the cache counters and size
+
+        Returns:
+            Dictionary with hits, similar hits, misses, hit rate, evictions and entries
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+        hits = self.hits + self.similar_hits
+        lookups = hits + self.misses
+        return {
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+        }
+
+    def report(self) -> None:
+        """Print the cache counters"""
+        stats = self.stats()
+        print(
+            f"Answer cache: {stats['hits']} hits, {stats['similar_hits']} similar hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} hit rate), {stats['evictions']} evicted, {stats['entries']} entries"
+        )
+
+    def close(self) -> None:
+        """Close the cache database"""
+        with self._lock:
+            self._conn.close()
+
+def open_answer_cache(
+    cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    ttl_hours: float = DEFAULT_ANSWER_TTL_HOURS,
+    max_entries: int = DEFAULT_ANSWER_CACHE_SIZE,
+) -> Optional[AnswerCache]:
+    """Open the answer cache, or return None if it is disabled or unavailable
+
+    Args:
+        cache_dir: Directory of the cache, or None to disable it
+        ttl_hours: Hours after which an answer expires (never if 0)
+        max_entries: Maximum number of cached answers
+
+    Returns:
+        The opened cache, or None
+    """
+    if cache_dir is None:
+        return None
+    try:
+        return AnswerCache(cache_dir, ttl_hours, max_entries)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Warning: Could not open the answer cache in '{cache_dir}': {e}")
+        print("Continuing without the answer cache.")
+        return None
@@ -0,0 +1,428 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable
+
+# Import the CakePHP analyzer
+try:
+    from cakephp_analyzer import CakePHP210Analyzer, LineIndex
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.cakephp_analyzer import CakePHP210Analyzer, LineIndex
+
+BENCHMARK_NAME = "cakephp_analyzer"
+DEFAULT_FILES = 60
+DEFAULT_SIZES = [100, 1000, 10000]
+DEFAULT_DENSITY = 0.05
+DEFAULT_REPEAT = 3
+DEFAULT_SEED = 42
+
+# Lines that trigger an analyzer rule, by kind of file
+CONTROLLER_ISSUE_LINES = [
+    '        $rows = $this->{model}->query("SELECT * FROM {table} WHERE id = $id");',
+    '        $this->{model}->save($this->request->data);',
+    "        $items = Set::extract($rows, '{{n}}.{model}');",
+    "        $this->Session->setFlash(__('Saved'));",
+    '        return $this->render(null, "view");',
+]
+MODEL_ISSUE_LINES = [
+    "        return $this->saveField('status', $value);",
+    '        $this->query("DELETE FROM {table} WHERE id = $id");',
+    "        $result = Set::combine($rows, '{{n}}.{model}.id', '{{n}}.{model}.name');",
+]
+VIEW_ISSUE_LINES = [
+    "<p><?php echo $title; ?></p>",
+    "<span><?= $item['{model}']['name'] ?></span>",
+]
+
+# Lines that trigger no rule
+CONTROLLER_CLEAN_LINES = [
+    "        $options = array('conditions' => array('{model}.id' => $id));",
+    "        $count = $count + 1;",
+    "        // Keep the list sorted by creation date",
+    "        $this->set(compact('items', 'count'));",
+]
+MODEL_CLEAN_LINES = [
+    "        $conditions = array('{model}.active' => 1);",
+    "        // Only active records are listed",
+    "        $total = $total + $value;",
+]
+VIEW_CLEAN_LINES = [
+    "<p><?php echo h($item['{model}']['name']); ?></p>",
+    "<div class=\"{table}-row\">",
+    "</div>",
+    "<?php echo $this->Html->link(__('Edit'), array('action' => 'edit', $id)); ?>",
+]
+
+def _body_line(rng: random.Random, density: float, issue_lines: List[str], clean_lines: List[str], **names) -> str:
+    """Pick a body line, triggering a rule with probability `density`"""
+    lines = issue_lines if rng.random() < density else clean_lines
+    return rng.choice(lines).format(**names)
+
+def _php_class(
+    rng: random.Random,
+    header: List[str],
+    lines_per_file: int,
+    density: float,
+    issue_lines: List[str],
+    clean_lines: List[str],
+    action_name: Callable[[int], str],
+    **names
+) -> str:
+    """Build a PHP class of about `lines_per_file` lines made of short methods"""
+    lines = list(header)
+    index = 0
+    while len(lines) < lines_per_file - 1:
+        lines.append(f"    public function {action_name(index)}($id = null) {{")
+        for _ in range(4):
+            lines.append(_body_line(rng, density, issue_lines, clean_lines, **names))
+        lines.append("    }")
+        index += 1
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def generate_project(
+    root: str,
+    files: int = DEFAULT_FILES,
+    lines_per_file: int = DEFAULT_SIZES[0],
+    density: float = DEFAULT_DENSITY,
+    seed: int = DEFAULT_SEED
+) -> Dict[str, int]:
+    """Generate a synthetic CakePHP 2.10 project
+
+    The files are split between controllers, models and views. Each body
+    line triggers one of the analyzer's rules with probability `density`,
+    and the same seed always generates the same tree.
+
+    Args:
+        root: Directory to create the project in
+        files: Number of files to generate
+        lines_per_file: Approximate number of lines of each file
+        density: Fraction of body lines that contain an issue
+        seed: Seed of the random generator
+
+    Returns:
+        Dictionary with the number of files, lines and bytes generated
+    """
+    rng = random.Random(seed)
+    controllers_dir = os.path.join(root, 'app', 'Controller')
+    models_dir = os.path.join(root, 'app', 'Model')
+    views_dir = os.path.join(root, 'app', 'View')
+    os.makedirs(controllers_dir, exist_ok=True)
+    os.makedirs(models_dir, exist_ok=True)
+
+    def write(path: str, content: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        stats["files"] += 1
+        stats["lines"] += content.count("\n")
+        stats["bytes"] += len(content.encode('utf-8'))
+
+    def camel_action(index: int) -> str:
+        # A few actions break the camelCase convention
+        return f"action_{index}" if rng.random() < density else f"action{index}"
+
+    stats = {"files": 0, "lines": 0, "bytes": 0}
+    for number in range(files):
+        model = f"Item{number}"
+        table = f"item{number}s"
+        kind = number % 3
+
+        if kind == 0:
+            # Some controllers are named in singular form
+            controller = f"Item{number}" if rng.random() < density else f"Item{number}s"
+            header = [
+                "<?php",
+                "App::uses('AppController', 'Controller');",
+                f"class {controller}Controller extends AppController {{",
+                "    public $components = array('Session', 'Security');",
+            ]
+            content = _php_class(
+                rng, header, lines_per_file, density, CONTROLLER_ISSUE_LINES, CONTROLLER_CLEAN_LINES,
+                camel_action, model=model, table=table,
+            )
+            write(os.path.join(controllers_dir, f"{controller}Controller.php"), content)
+        elif kind == 1:
+            header = ["<?php", f"class {model} extends AppModel {{", "    public $actsAs = array('Containable');"]
+            content = _php_class(
+                rng, header, lines_per_file, density, MODEL_ISSUE_LINES, MODEL_CLEAN_LINES,
+                lambda index: f"find{index}", model=model, table=table,
+            )
+            write(os.path.join(models_dir, f"{model}.php"), content)
+        else:
+            view_dir = os.path.join(views_dir, f"Item{number}s")
+            os.makedirs(view_dir, exist_ok=True)
+            lines = [
+                _body_line(rng, density, VIEW_ISSUE_LINES, VIEW_CLEAN_LINES, model=model, table=table)
+                for _ in range(lines_per_file)
+            ]
+            write(os.path.join(view_dir, "index.ctp"), "\n".join(lines) + "\n")
+
+    return stats
+
+def _time(function: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Time a function, returning the best and median of `repeat` runs"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return {"seconds_min": min(timings), "seconds_median": statistics.median(timings)}
+
+def _load_files(analyzer: CakePHP210Analyzer) -> List[Dict[str, Any]]:
+    """Read the project files once so rule timings exclude file I/O"""
+    loaded = []
+    for file_path in analyzer._find_files():
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        loaded.append({"path": file_path, "content": content, "line_index": LineIndex(content)})
+    return loaded
+
+def benchmark_rules(project_path: str, repeat: int) -> List[Dict[str, Any]]:
+    """Time each check, and each security category, over all files of a project
+
+    Args:
+        project_path: Path of the project
+        repeat: Number of timed runs of each rule
+
+    Returns:
+        One entry per rule with its timings and issue count
+    """
+    analyzer = CakePHP210Analyzer(project_path)
+    loaded = _load_files(analyzer)
+
+    def run(check: Callable[..., List[Any]], with_index: bool) -> int:
+        count = 0
+        for file in loaded:
+            if with_index:
+                count += len(check(file["path"], file["content"], file["line_index"]))
+            else:
+                count += len(check(file["path"], file["content"]))
+        return count
+
+    rules = [
+        ("naming_convention", analyzer.check_naming_conventions, False),
+        ("deprecated_feature", analyzer.check_deprecated_features, True),
+        ("security_risk", analyzer.check_security_issues, True),
+    ]
+    # A security category is timed by an analyzer whose other categories have no patterns
+    for category in analyzer.security_patterns:
+        restricted = CakePHP210Analyzer(project_path)
+        restricted.security_patterns = {
+            name: (patterns if name == category else []) for name, patterns in analyzer.security_patterns.items()
+        }
+        rules.append((f"security_risk:{category}", restricted.check_security_issues, True))
+
+    results = []
+    for name, check, with_index in rules:
+        issues = run(check, with_index)
+        entry = {"rule": name, "issues": issues}
+        entry.update(_time(lambda: run(check, with_index), repeat))
+        results.append(entry)
+    return results
+
+def benchmark_size(
+    root: str,
+    files: int,
+    lines_per_file: int,
+    density: float,
+    seed: int,
+    repeat: int,
+    jobs: int
+) -> Dict[str, Any]:
+    """Generate a project of one file size and benchmark the analyzer on it
+
+    Args:
+        root: Directory to generate the project in
+        files: Number of files
+        lines_per_file: Approximate number of lines of each file
+        density: Fraction of body lines that contain an issue
+        seed: Seed of the generator
+        repeat: Number of timed runs
+        jobs: Number of analysis processes
+
+    Returns:
+        Dictionary with the project size, analyze_project timings and rule timings
+    """
+    project_path = os.path.join(root, f"lines_{lines_per_file}")
+    # Files left by an earlier run with other settings would skew the results
+    if os.path.exists(project_path):
+        shutil.rmtree(project_path)
+    stats = generate_project(project_path, files, lines_per_file, density, seed)
+
+    with open(os.devnull, 'w') as devnull:
+        issues = []
+
+        def analyze():
+            # A fresh analyzer per run, without the result cache
+            analyzer = CakePHP210Analyzer(project_path, jobs, cache_dir=None, log_stream=devnull)
+            issues[:] = analyzer.analyze_project()
+
+        result = {"lines_per_file": lines_per_file}
+        result.update(stats)
+        result.update(_time(analyze, repeat))
+
+    result["issues"] = len(issues)
+    result["lines_per_second"] = stats["lines"] / result["seconds_min"] if result["seconds_min"] else 0.0
+    result["rules"] = benchmark_rules(project_path, repeat)
+    return result
+
+def git_commit() -> Optional[str]:
+    """Return the current git commit of the repository, if available"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(
+    files: int = DEFAULT_FILES,
+    sizes: Optional[List[int]] = None,
+    density: float = DEFAULT_DENSITY,
+    seed: int = DEFAULT_SEED,
+    repeat: int = DEFAULT_REPEAT,
+    jobs: int = 1,
+    work_dir: Optional[str] = None
+) -> Dict[str, Any]:
+    """Benchmark the analyzer on synthetic projects of several file sizes
+
+    Args:
+        files: Number of files of each project
+        sizes: Approximate lines per file of each project
+        density: Fraction of body lines that contain an issue
+        seed: Seed of the generator
+        repeat: Number of timed runs
+        jobs: Number of analysis processes
+        work_dir: Directory to generate the projects in and keep, or None
+            for a temporary directory
+
+    Returns:
+        Machine-readable benchmark results
+    """
+    sizes = sizes or DEFAULT_SIZES
+    results = {
+        "benchmark": BENCHMARK_NAME,
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "files": files,
+            "sizes": sizes,
+            "density": density,
+            "seed": seed,
+            "repeat": repeat,
+            "jobs": jobs,
+        },
+        "sizes": [],
+    }
+
+    with tempfile.TemporaryDirectory(prefix="cakephp_bench_") as temp_dir:
+        root = work_dir or temp_dir
+        for lines_per_file in sizes:
+            print(f"Benchmarking {files} files of about {lines_per_file} lines...", file=sys.stderr)
+            results["sizes"].append(benchmark_size(root, files, lines_per_file, density, seed, repeat, jobs))
+
+    return results
+
+def format_results(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    """Format benchmark results as a table, with ratios to a baseline run if given
+
+    Args:
+        results: Results of run_benchmark
+        baseline: Earlier results to compare against
+
+    Returns:
+        The formatted table
+    """
+    previous = {}
+    if baseline:
+        for size in baseline.get("sizes", []):
+            previous[(size["lines_per_file"], None)] = size["seconds_min"]
+            for rule in size.get("rules", []):
+                previous[(size["lines_per_file"], rule["rule"])] = rule["seconds_min"]
+
+    def row(label: str, seconds: float, issues: int, key) -> str:
+        line = f"  {label:<32} {seconds * 1000:>10.1f} ms {issues:>10}"
+        if key in previous and previous[key]:
+            line += f" {seconds / previous[key]:>8.2f}x"
+        return line
+
+    output = []
+    header = f"  {'':<32} {'best':>13} {'issues':>10}"
+    if baseline:
+        header += f" {'vs ' + str(baseline.get('commit') or 'baseline'):>9}"
+    for size in results["sizes"]:
+        output.append(
+            f"{size['files']} files x ~{size['lines_per_file']} lines "
+            f"({size['lines']} lines, {size['lines_per_second']:.0f} lines/s)"
+        )
+        output.append(header)
+        output.append(row("analyze_project", size["seconds_min"], size["issues"], (size["lines_per_file"], None)))
+        for rule in size["rules"]:
+            output.append(row(rule["rule"], rule["seconds_min"], rule["issues"], (size["lines_per_file"], rule["rule"])))
+        output.append("")
+    return "\n".join(output)
+
+def parse_sizes(value: str) -> List[int]:
+    """Parse a comma-separated list of file sizes"""
+    try:
+        sizes = [int(size) for size in value.split(",") if size.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size list: '{value}'")
+    if not sizes or any(size <= 0 for size in sizes):
+        raise argparse.ArgumentTypeError(f"invalid size list: '{value}'")
+    return sizes
+
+def main():
+    """Main function to run the analyzer benchmark from command line"""
+    parser = argparse.ArgumentParser(description="Benchmark the CakePHP 2.10 analyzer on synthetic projects")
+    parser.add_argument("--files", type=int, default=DEFAULT_FILES, help="Number of files of each project")
+    parser.add_argument("--sizes", type=parse_sizes, default=DEFAULT_SIZES,
+                        help="Comma-separated approximate lines per file, one project each")
+    parser.add_argument("--density", type=float, default=DEFAULT_DENSITY,
+                        help="Fraction of lines that contain an issue")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Seed of the project generator")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Number of timed runs (the best is reported)")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="Number of processes analyzing files (0 for one per CPU)")
+    parser.add_argument("--work-dir", help="Generate the projects in this directory and keep them")
+    parser.add_argument("--output", "-o", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not read baseline results '{args.compare}': {e}")
+            sys.exit(1)
+
+    results = run_benchmark(
+        args.files, args.sizes, args.density, args.seed, max(1, args.repeat), args.jobs, args.work_dir
+    )
+    print(format_results(results, baseline))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
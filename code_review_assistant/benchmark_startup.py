@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+# Import the git helper of the analyzer benchmark
+try:
+    from benchmark_cakephp import git_commit
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.benchmark_cakephp import git_commit
+
+BENCHMARK_NAME = "startup"
+DEFAULT_REPEAT = 10
+# Median start time allowed for the budgeted commands (marked * in the report)
+DEFAULT_BUDGET_MS = 100.0
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PROJECT = os.path.join(os.path.dirname(SCRIPT_DIR), "cakephp_test_project")
+
+def startup_commands(project_path: str) -> List[Dict[str, Any]]:
+    """Return the commands to time
+
+    Args:
+        project_path: CakePHP project analyzed by the analyze command
+
+    Returns:
+        Commands with their name, arguments and whether the budget applies
+    """
+    cli = os.path.join(SCRIPT_DIR, "cli.py")
+    return [
+        {"name": "python", "args": ["-c", "pass"], "budgeted": False},
+        {"name": "cli --help", "args": [cli, "--help"], "budgeted": True},
+        {"name": "analyze --help", "args": [cli, "analyze", "--help"], "budgeted": True},
+        {"name": "analyze", "args": [cli, "analyze", project_path, "--no-cache", "--output", "json",
+                                     "--output-file", os.devnull], "budgeted": True},
+        {"name": "review --help", "args": [cli, "review", "--help"], "budgeted": False},
+        {"name": "query --help", "args": [cli, "query", "--help"], "budgeted": False},
+        {"name": "index --help", "args": [cli, "index", "--help"], "budgeted": False},
+    ]
+
+def time_command(args: List[str], repeat: int) -> Dict[str, Any]:
+    """Run a Python command several times and time each run
+
+    Args:
+        args: Arguments after the Python interpreter
+        repeat: Number of timed runs
+
+    Returns:
+        Best and median wall-clock time, and the exit status of the last run
+    """
+    # Let the runs write bytecode caches, as an installed package would have them
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+    timings = []
+    returncode = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        returncode = subprocess.run(
+            [sys.executable] + args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=SCRIPT_DIR, env=env
+        ).returncode
+        timings.append(time.perf_counter() - start)
+    return {
+        "seconds_min": min(timings),
+        "seconds_median": statistics.median(timings),
+        "returncode": returncode,
+    }
+
+def run_benchmark(
+    repeat: int = DEFAULT_REPEAT,
+    budget_ms: float = DEFAULT_BUDGET_MS,
+    project_path: str = DEFAULT_PROJECT,
+) -> Dict[str, Any]:
+    """Time the startup of the CLI commands
+
+    Each command runs once untimed first, so the bytecode caches are warm.
+
+    Args:
+        repeat: Number of timed runs of each command
+        budget_ms: Maximum median time of the budgeted commands in milliseconds
+        project_path: CakePHP project analyzed by the analyze command
+
+    Returns:
+        Machine-readable benchmark results
+    """
+    results = {
+        "benchmark": BENCHMARK_NAME,
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"repeat": repeat, "budget_ms": budget_ms, "project": project_path},
+        "commands": [],
+    }
+
+    for command in startup_commands(project_path):
+        print(f"Timing {command['name']}...", file=sys.stderr)
+        time_command(command["args"], 1)
+        timing = time_command(command["args"], repeat)
+        timing.update(name=command["name"], budgeted=command["budgeted"])
+        timing["over_budget"] = command["budgeted"] and timing["seconds_median"] * 1000 > budget_ms
+        results["commands"].append(timing)
+
+    return results
+
+def format_results(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    """Format benchmark results as a table, with ratios to a baseline run if given
+
+    Args:
+        results: Results of run_benchmark
+        baseline: Earlier results to compare against
+
+    Returns:
+        The formatted table
+    """
+    previous = {}
+    if baseline:
+        previous = {command["name"]: command["seconds_median"] for command in baseline.get("commands", [])}
+
+    header = f"  {'command':<18} {'best':>10} {'median':>10}"
+    if baseline:
+        header += f" {'vs ' + str(baseline.get('commit') or 'baseline'):>9}"
+    output = [f"Startup time (budget {results['config']['budget_ms']:.0f} ms for * commands):", header]
+    for command in results["commands"]:
+        name = command["name"] + (" *" if command["budgeted"] else "")
+        line = f"  {name:<18} {command['seconds_min'] * 1000:>7.1f} ms {command['seconds_median'] * 1000:>7.1f} ms"
+        if previous.get(command["name"]):
+            line += f" {command['seconds_median'] / previous[command['name']]:>8.2f}x"
+        if command["returncode"]:
+            line += f"  (exit status {command['returncode']})"
+        if command["over_budget"]:
+            line += "  OVER BUDGET"
+        output.append(line)
+    return "\n".join(output)
+
+def main():
+    """Main function to run the startup benchmark from command line"""
+    parser = argparse.ArgumentParser(description="Benchmark the startup time of the CLI commands")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Number of timed runs of each command")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="Maximum median startup time of --help and analyze in milliseconds")
+    parser.add_argument("--project", default=DEFAULT_PROJECT, help="CakePHP project analyzed by the analyze command")
+    parser.add_argument("--output", "-o", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not read baseline results '{args.compare}': {e}")
+            sys.exit(1)
+
+    results = run_benchmark(max(1, args.repeat), args.budget_ms, os.path.abspath(args.project))
+    print(format_results(results, baseline))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    # Exit with an error so the benchmark can guard the budget in CI
+    if any(command["over_budget"] for command in results["commands"]):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -4,20 +4,575 @@
 import os
 import re
 import sys
+import json
+import hashlib
 import argparse
-from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from collections import abc
+from bisect import bisect_left
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple, NamedTuple, Pattern, Iterable, Iterator, TextIO, Mapping
+
+# Import the cache location; the cache itself is imported when it is opened,
+# so --help and --no-cache runs do not load sqlite3
+try:
+    from defaults import DEFAULT_CACHE_DIR
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.defaults import DEFAULT_CACHE_DIR
+
+# Import the shared file walker and reader
+try:
+    from file_loader import SourceFile, walk_files, read_source_file, load_files, DEFAULT_MAX_FILE_SIZE
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.file_loader import SourceFile, walk_files, read_source_file, load_files, DEFAULT_MAX_FILE_SIZE
+
+# Version of the check logic; bump it when a check changes so cached results are recomputed
+ANALYZER_VERSION = 2
+
+# Output formats; the streaming ones write each issue as soon as its file is analyzed
+OUTPUT_FORMATS = ["console", "json", "jsonl", "sarif"]
+STREAMING_FORMATS = ["jsonl", "sarif"]
+
+# Rank of each severity, used by the minimum severity threshold
+SEVERITY_LEVELS = {
+    "info": 0,
+    "warning": 1,
+    "medium": 2,
+    "error": 2,
+    "high": 3,
+    "critical": 4,
+}
+MIN_SEVERITY_CHOICES = ["warning", "medium", "high", "critical"]
+
+# Number of analyzed files whose results are written to the cache together
+CACHE_STORE_BATCH = 256
+
+# SARIF rule descriptors of the issue types, and the SARIF level of each severity
+SARIF_VERSION = "2.1.0"
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+SARIF_RULES = [
+    {"id": "naming_convention", "shortDescription": {"text": "CakePHP naming convention violation"}},
+    {"id": "deprecated_feature", "shortDescription": {"text": "Deprecated CakePHP feature"}},
+    {"id": "security_risk", "shortDescription": {"text": "Potential security vulnerability"}},
+    {"id": "file_error", "shortDescription": {"text": "File could not be analyzed"}},
+]
+SARIF_LEVELS = {
+    "critical": "error",
+    "high": "error",
+    "error": "error",
+    "medium": "warning",
+    "warning": "warning",
+    "info": "note",
+}
+
+# Deprecated methods in CakePHP 2.10 and their recommended alternatives
+DEPRECATED_METHODS = {
+    "Set::": "Hash::",
+    "->saveField(": "->save()",
+    "->data": "->request->data",
+    "->Model->": "->",
+    "->paginate(null": "->paginate()",
+    "->render(null": "->render()",
+    "->beforeFilter(parent::beforeFilter": "parent::beforeFilter(); // then add your code",
+    "->beforeRender(parent::beforeRender": "parent::beforeRender(); // then add your code",
+    "->afterFilter(parent::afterFilter": "parent::afterFilter(); // then add your code",
+    "->fields": "->schema()",
+    "->name": "Table configuration",
+    "->del(": "->delete(",
+    "Router::connect": "Router::scope",
+    "CakeRequest": "Request class",
+    "CakeResponse": "Response class",
+    "CakeSession": "Session class",
+    "->Session->": "->getSession()->",
+    "->Auth->login": "->Auth->identify()",
+    "->data->": "->request->data->"
+}
+
+# Common security vulnerability patterns
+SECURITY_PATTERNS = {
+    "sql_injection": [
+        r"->query\(\s*[\"']SELECT.*\$(?!\{)",
+        r"->execute\(\s*[\"']SELECT.*\$(?!\{)",
+        r"->query\(\s*[\"']UPDATE.*\$(?!\{)",
+        r"->query\(\s*[\"']DELETE.*\$(?!\{)",
+        r"->query\(\s*[\"']INSERT.*\$(?!\{)",
+        r"->rawQuery\(\s*[\"'].*\$(?!\{)"
+    ],
+    "xss": [
+        r"echo\s+\$(?!this->Html->|this->Form->)(?!.*h\()",
+        r"<\?=\s*\$(?!this->Html->|this->Form->)(?!.*h\()"
+    ],
+    "csrf": [
+        r"SecurityComponent.*csrf\s*=>\s*false"
+    ],
+    "mass_assignment": [
+        r"->saveAll\(\$this->request->data",
+        r"->save\(\$this->request->data\)",
+        r"->save\(\$_POST",
+        r"->save\(\$data(?!.*[\'\"]\w+[\'\"])"
+    ]
+}
+
+CLASS_PATTERN = re.compile(r"class\s+(\w+)")
+PUBLIC_FUNCTION_PATTERN = re.compile(r"public\s+function\s+(\w+)\s*\(")
+APP_USES_CONTROLLER_PATTERN = re.compile(r"App::uses\s*\(\s*['\"]Controller['\"]")
+SECURITY_COMPONENT_PATTERN = re.compile(r"public\s+\$components\s*=.*Security")
+# Class properties naming the components, helpers, models and behaviors a class uses
+DEPENDENCY_PROPERTY_PATTERN = re.compile(
+    r"\$(components|helpers|uses|actsAs)\s*=\s*(?:array\s*\(|\[)(.*?)(?:\)|\])\s*;", re.DOTALL
+)
+QUOTED_NAME_PATTERN = re.compile(r"['\"](?:\w+\.)?(\w+)['\"]")
+FIELD_LIST_PATTERN = re.compile(r"->save\(\$this->request->data\s*,\s*['\"]fieldList['\"]")
+# Longest literal prefix of a regex, used to skip a pattern when the file cannot match it
+LITERAL_PREFIX_PATTERN = re.compile(r"(?:[^\\.^$*+?{}\[\]|()]|\\[^A-Za-z0-9])+")
+
+class IssueRule(NamedTuple):
+    """Type, severity and message template shared by the issues of one check"""
+    id: str
+    type: str
+    severity: str
+    # Formatted with the issue's arguments when the message is read
+    template: str
+
+CONTROLLER_SUFFIX_RULE = IssueRule(
+    "controller_suffix", "naming_convention", "error",
+    "Controller class '{0}' does not follow CakePHP naming convention. It should end with 'Controller'."
+)
+CONTROLLER_PLURAL_RULE = IssueRule(
+    "controller_plural", "naming_convention", "warning",
+    "Controller '{0}' should be named in plural form (e.g., '{1}sController')."
+)
+MODEL_SINGULAR_RULE = IssueRule(
+    "model_singular", "naming_convention", "warning",
+    "Model class '{0}' should be in singular form according to CakePHP conventions."
+)
+ACTION_CAMEL_CASE_RULE = IssueRule(
+    "action_camel_case", "naming_convention", "warning",
+    "Action method '{0}' should use camelCase naming convention."
+)
+DEPRECATED_METHOD_RULE = IssueRule(
+    "deprecated_method", "deprecated_feature", "warning",
+    "Deprecated feature '{0}' used. Consider using '{1}' instead."
+)
+APP_USES_CONTROLLER_RULE = IssueRule(
+    "app_uses_controller", "deprecated_feature", "warning",
+    "App::uses() for loading controllers is deprecated. CakePHP 2.10 uses autoloading."
+)
+SQL_INJECTION_RULE = IssueRule(
+    "sql_injection", "security_risk", "critical",
+    "Potential SQL injection risk. Use parameterized queries with bound parameters instead of string concatenation."
+)
+XSS_RULE = IssueRule(
+    "xss", "security_risk", "high",
+    "Potential XSS vulnerability. Use h() function or echo $this->Html->... to properly escape output."
+)
+CSRF_DISABLED_RULE = IssueRule(
+    "csrf_disabled", "security_risk", "high",
+    "CSRF protection is disabled. Consider enabling CSRF protection in SecurityComponent."
+)
+SECURITY_COMPONENT_RULE = IssueRule(
+    "security_component", "security_risk", "medium",
+    "SecurityComponent not used. Consider adding Security component for CSRF protection and form tampering prevention."
+)
+MASS_ASSIGNMENT_RULE = IssueRule(
+    "mass_assignment", "security_risk", "high",
+    "Potential mass assignment vulnerability. Use the fieldList option in save() to specify allowed fields."
+)
+FILE_ERROR_RULE = IssueRule("file_error", "file_error", "error", "{0}")
+
+ISSUE_RULES = {
+    rule.id: rule
+    for rule in (
+        CONTROLLER_SUFFIX_RULE, CONTROLLER_PLURAL_RULE, MODEL_SINGULAR_RULE, ACTION_CAMEL_CASE_RULE,
+        DEPRECATED_METHOD_RULE, APP_USES_CONTROLLER_RULE, SQL_INJECTION_RULE, XSS_RULE,
+        CSRF_DISABLED_RULE, SECURITY_COMPONENT_RULE, MASS_ASSIGNMENT_RULE, FILE_ERROR_RULE,
+    )
+}
+
+class Issue(abc.Mapping):
+    """An issue found by the analyzer
+
+    Issues of one check share their IssueRule, so the type and severity
+    strings are not repeated per issue, and the message is rendered from the
+    rule template only when it is read. Issues read like the dictionaries
+    the analyzer used to return (`issue["message"]`, `issue.get("line")`,
+    `"line" in issue`); use `to_dict()` or `dict(issue)` for a plain copy.
+    """
+
+    __slots__ = ("file", "line", "rule", "args")
+
+    def __init__(self, file: str, line: Optional[int], rule: IssueRule, args: Tuple = ()):
+        """Create an issue
+
+        Args:
+            file: Path of the file, relative to the project
+            line: Line number, or None for issues about the whole file
+            rule: Rule that found the issue
+            args: Values filling the rule's message template
+        """
+        self.file = file
+        self.line = line
+        self.rule = rule
+        self.args = args
+
+    @property
+    def type(self) -> str:
+        return self.rule.type
+
+    @property
+    def severity(self) -> str:
+        return self.rule.severity
+
+    @property
+    def message(self) -> str:
+        if not self.args:
+            return self.rule.template
+        return self.rule.template.format(*self.args)
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "file":
+            return self.file
+        if key == "line" and self.line is not None:
+            return self.line
+        if key == "type":
+            return self.rule.type
+        if key == "severity":
+            return self.rule.severity
+        if key == "message":
+            return self.message
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        # Same key order as the dictionaries, so JSON output is unchanged
+        yield "file"
+        if self.line is not None:
+            yield "line"
+        yield "type"
+        yield "severity"
+        yield "message"
+
+    def __len__(self) -> int:
+        return 4 if self.line is None else 5
+
+    def __contains__(self, key: object) -> bool:
+        if key == "line":
+            return self.line is not None
+        return key in ("file", "type", "severity", "message")
+
+    def __repr__(self) -> str:
+        return f"Issue({self.to_dict()!r})"
+
+    def __reduce__(self):
+        # Pickle the rule by id so issues from worker processes share the parent's rules
+        return (issue_from_row, (self.to_row(),))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the issue as a plain dictionary"""
+        issue = {"file": self.file}
+        if self.line is not None:
+            issue["line"] = self.line
+        issue["type"] = self.rule.type
+        issue["severity"] = self.rule.severity
+        issue["message"] = self.message
+        return issue
+
+    def to_row(self) -> List[Any]:
+        """Return the compact form stored in the analysis cache"""
+        return [self.file, self.line, self.rule.id, list(self.args)]
+
+def issue_from_row(row: List[Any]) -> Issue:
+    """Rebuild an issue from its compact form
+
+    Args:
+        row: (file, line, rule id, message arguments) as returned by Issue.to_row
+
+    Returns:
+        The issue
+    """
+    file, line, rule_id, args = row
+    return Issue(file, line, ISSUE_RULES[rule_id], tuple(args))
+
+def issue_json_default(obj: Any) -> Any:
+    """json.dumps hook serializing issues as dictionaries"""
+    if isinstance(obj, Issue):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class CompiledRules(NamedTuple):
+    """Rule tables compiled for scanning"""
+    # Literal -> alternative, in the order issues are reported
+    deprecated: Tuple[Tuple[str, str], ...]
+    # Zero-width alternation that stops at every offset where a deprecated literal starts
+    deprecated_scanner: Pattern
+    # Category -> list of (compiled pattern, literal that every match contains)
+    security: Dict[str, List[Tuple[Pattern, str]]]
+    # Fingerprint of the analyzer version and rule tables, used to key cached results
+    version: str
+
+def _literal_prefix(pattern: str) -> str:
+    """Return the literal text every match of a regex starts with"""
+    match = LITERAL_PREFIX_PATTERN.match(pattern)
+    if not match:
+        return ""
+    literal = match.group(0)
+    # A quantifier right after the prefix applies to its last character
+    if pattern[match.end():match.end() + 1] in ("*", "?", "{"):
+        literal = literal[:-1]
+    return re.sub(r"\\(.)", r"\1", literal)
+
+@lru_cache(maxsize=None)
+def compile_rules(
+    deprecated_methods: Tuple[Tuple[str, str], ...],
+    security_patterns: Tuple[Tuple[str, Tuple[str, ...]], ...],
+) -> CompiledRules:
+    """Compile the rule tables once per process
+
+    Args:
+        deprecated_methods: (deprecated literal, alternative) pairs
+        security_patterns: (category, regex patterns) pairs
+
+    Returns:
+        The compiled rules
+    """
+    literals = sorted({literal for literal, _ in deprecated_methods}, key=len, reverse=True)
+    deprecated_scanner = re.compile("(?=" + "|".join(re.escape(literal) for literal in literals) + ")")
+
+    security = {
+        name: [(re.compile(pattern), _literal_prefix(pattern)) for pattern in patterns]
+        for name, patterns in security_patterns
+    }
+
+    # Cached issues are rendered from the rule templates, so they are part of the fingerprint
+    version = hashlib.sha256(
+        json.dumps([ANALYZER_VERSION, deprecated_methods, security_patterns, list(ISSUE_RULES.values())]).encode('utf-8')
+    ).hexdigest()[:16]
+    return CompiledRules(deprecated_methods, deprecated_scanner, security, version)
+
+class LineIndex:
+    """Maps character offsets of a file to line numbers"""
+
+    def __init__(self, content: str):
+        """Index the newline offsets of the content
+
+        Args:
+            content: Content of the file
+        """
+        self.newlines = []
+        offset = content.find("\n")
+        while offset != -1:
+            self.newlines.append(offset)
+            offset = content.find("\n", offset + 1)
+
+    def line_number(self, offset: int) -> int:
+        """Return the 1-based line number of a character offset
+
+        Args:
+            offset: Character offset in the content
+
+        Returns:
+            Line number of the offset
+        """
+        return bisect_left(self.newlines, offset) + 1
+
+def singularize(name: str) -> str:
+    """Return the singular form of a CakePHP model or controller name
+
+    Args:
+        name: Name such as 'Users' or 'Categories'
+
+    Returns:
+        Singular name such as 'User' or 'Category'
+    """
+    if name.endswith("ies"):
+        return name[:-3] + "y"
+    if name.endswith(("ses", "xes", "ches", "shes")):
+        return name[:-2]
+    if name.endswith("s") and not name.endswith("ss"):
+        return name[:-1]
+    return name
+
+def pluralize(name: str) -> str:
+    """Return the plural form of a CakePHP model name
+
+    Args:
+        name: Name such as 'User' or 'Category'
+
+    Returns:
+        Plural name such as 'Users' or 'Categories'
+    """
+    if name.endswith("y") and name[-2:-1] not in ("a", "e", "i", "o", "u"):
+        return name[:-1] + "ies"
+    if name.endswith(("s", "x", "ch", "sh")):
+        return name + "es"
+    return name + "s"
+
+def find_related_files(project_path: str, target_file: str) -> List[str]:
+    """Find a file and its CakePHP MVC counterparts
+
+    For a controller these are its model, its view directory and the
+    components, helpers and models it declares; for a model its controller,
+    view directory and behaviors; for a view its controller and model. Names
+    are tried in singular and plural form so misnamed classes are found too.
+
+    Args:
+        project_path: Root directory of the CakePHP project
+        target_file: Path to the file being reviewed
+
+    Returns:
+        The target file followed by its existing counterparts, without duplicates
+    """
+    app_dir = os.path.join(project_path, 'app')
+    rel_path = os.path.relpath(os.path.abspath(target_file), os.path.abspath(app_dir))
+    parts = rel_path.split(os.sep)
+    stem = os.path.splitext(os.path.basename(target_file))[0]
+
+    # Determine the resource name the file belongs to
+    if len(parts) >= 2 and parts[0] == 'Controller' and parts[1] != 'Component':
+        base_name = stem[:-len('Controller')] if stem.endswith('Controller') else stem
+    elif len(parts) >= 2 and parts[0] == 'Model' and parts[1] != 'Behavior':
+        base_name = stem
+    elif len(parts) >= 3 and parts[0] == 'View' and parts[1] not in ('Helper', 'Elements', 'Layouts'):
+        base_name = parts[1]
+    else:
+        base_name = None
+
+    candidates = [target_file]
+    if base_name:
+        names = []
+        for name in (base_name, singularize(base_name), pluralize(base_name)):
+            if name not in names:
+                names.append(name)
+
+        for name in names:
+            candidates.append(os.path.join(app_dir, 'Controller', f"{name}Controller.php"))
+            candidates.append(os.path.join(app_dir, 'Model', f"{name}.php"))
+            view_dir = os.path.join(app_dir, 'View', name)
+            for root, _, files in os.walk(view_dir):
+                for file in sorted(files):
+                    candidates.append(os.path.join(root, file))
+
+    # Add the components, helpers, models and behaviors declared by the file
+    dependency_dirs = {
+        'components': ('Controller/Component', 'Component'),
+        'helpers': ('View/Helper', 'Helper'),
+        'uses': ('Model', ''),
+        'actsAs': ('Model/Behavior', 'Behavior'),
+    }
+    content = read_source_file(target_file).text or ""
+    for match in DEPENDENCY_PROPERTY_PATTERN.finditer(content):
+        directory, suffix = dependency_dirs[match.group(1)]
+        for name in QUOTED_NAME_PATTERN.findall(match.group(2)):
+            candidates.append(os.path.join(app_dir, *directory.split('/'), f"{name}{suffix}.php"))
+
+    related = []
+    seen = set()
+    for file_path in candidates:
+        key = os.path.abspath(file_path)
+        if key in seen or os.path.splitext(file_path)[1].lower() not in ('.php', '.ctp') or not os.path.isfile(file_path):
+            continue
+        seen.add(key)
+        related.append(file_path)
+    return related
+
+def resolve_jobs(jobs: int) -> int:
+    """Return the number of analysis processes for a --jobs value
+
+    Args:
+        jobs: Requested number of processes (0 for one per CPU)
+
+    Returns:
+        Number of processes to use
+    """
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+def severity_level(severity: Optional[str]) -> int:
+    """Return the rank of a severity
+
+    Args:
+        severity: Severity name, or None for no threshold
+
+    Returns:
+        Rank of the severity (unknown severities rank as info)
+    """
+    if not severity:
+        return 0
+    return SEVERITY_LEVELS.get(severity, 0)
+
+def file_error_issue(file_path: str, message: str) -> Issue:
+    """Build the issue reported for a file that could not be analyzed
+
+    Args:
+        file_path: Path to the file
+        message: Description of the error
+
+    Returns:
+        The file_error issue
+    """
+    return Issue(file_path, None, FILE_ERROR_RULE, (message,))
+
+# Analyzer of a worker process, set up once per process by _init_worker
+_worker_analyzer = None
+
+def _init_worker(
+    project_path: str,
+    deprecated_methods: Dict[str, str],
+    security_patterns: Dict[str, List[str]],
+    min_severity: Optional[str],
+    max_file_size: Optional[int],
+) -> None:
+    """Set up the analyzer of a worker process with the parent's rule tables"""
+    global _worker_analyzer
+    _worker_analyzer = CakePHP210Analyzer(project_path, min_severity=min_severity, max_file_size=max_file_size)
+    _worker_analyzer.deprecated_methods = deprecated_methods
+    _worker_analyzer.security_patterns = security_patterns
+
+def _analyze_file_in_worker(file_path: str) -> List[Issue]:
+    """Analyze one file in a worker process"""
+    return _worker_analyzer.collect_file_issues(file_path)
 
 class CakePHP210Analyzer:
     """Class for analyzing CakePHP 2.10 code"""
 
-    def __init__(self, project_path: str):
+    def __init__(
+        self,
+        project_path: str,
+        jobs: int = 1,
+        cache_dir: Optional[str] = None,
+        min_severity: Optional[str] = None,
+        log_stream: Optional[TextIO] = None,
+        ignore: bool = True,
+        max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE,
+    ):
         """Initialize the analyzer with the project path
 
         Args:
             project_path: Path to the CakePHP project to analyze
+            jobs: Number of processes analyzing files (0 for one per CPU)
+            cache_dir: Directory of the analysis result cache, or None to disable it
+            min_severity: Drop issues below this severity, or None to keep all
+            log_stream: Stream for progress messages (stdout if None)
+            ignore: Skip vendor, tmp and minified files and the paths listed in
+                .gitignore and .reviewignore files
+            max_file_size: Skip files larger than this many bytes (no limit if None)
         """
         self.project_path = project_path
+        self.jobs = resolve_jobs(jobs)
+        self.cache = None
+        if cache_dir is not None:
+            try:
+                from analysis_cache import open_analysis_cache
+            except ImportError:
+                # If imported from a different directory
+                from code_review_assistant.analysis_cache import open_analysis_cache
+            self.cache = open_analysis_cache(cache_dir)
+        self.min_severity = min_severity
+        self.min_level = severity_level(min_severity)
+        self.log_stream = log_stream
+        self.ignore = ignore
+        self.max_file_size = max_file_size
         self.issues = []
         self.cake_version = "2.10"
 
@@ -30,79 +585,190 @@ class CakePHP210Analyzer:
         self.helpers_dir = os.path.join(project_path, 'app', 'View', 'Helper')
 
         # Deprecated methods in CakePHP 2.10 and their recommended alternatives
-        self.deprecated_methods = {
-            "Set::": "Hash::",
-            "->saveField(": "->save()",
-            "->data": "->request->data",
-            "->Model->": "->",
-            "->paginate(null": "->paginate()",
-            "->render(null": "->render()",
-            "->beforeFilter(parent::beforeFilter": "parent::beforeFilter(); // then add your code",
-            "->beforeRender(parent::beforeRender": "parent::beforeRender(); // then add your code",
-            "->afterFilter(parent::afterFilter": "parent::afterFilter(); // then add your code",
-            "->fields": "->schema()",
-            "->name": "Table configuration",
-            "->del(": "->delete(",
-            "Router::connect": "Router::scope",
-            "CakeRequest": "Request class",
-            "CakeResponse": "Response class",
-            "CakeSession": "Session class",
-            "->Session->": "->getSession()->",
-            "->Auth->login": "->Auth->identify()",
-            "->data->": "->request->data->"
-        }
+        self.deprecated_methods = dict(DEPRECATED_METHODS)
 
         # Common security vulnerability patterns
-        self.security_patterns = {
-            "sql_injection": [
-                r"->query\(\s*[\"']SELECT.*\$(?!\{)",
-                r"->execute\(\s*[\"']SELECT.*\$(?!\{)",
-                r"->query\(\s*[\"']UPDATE.*\$(?!\{)",
-                r"->query\(\s*[\"']DELETE.*\$(?!\{)",
-                r"->query\(\s*[\"']INSERT.*\$(?!\{)",
-                r"->rawQuery\(\s*[\"'].*\$(?!\{)"
-            ],
-            "xss": [
-                r"echo\s+\$(?!this->Html->|this->Form->)(?!.*h\()",
-                r"<\?=\s*\$(?!this->Html->|this->Form->)(?!.*h\()"
-            ],
-            "csrf": [
-                r"SecurityComponent.*csrf\s*=>\s*false"
-            ],
-            "mass_assignment": [
-                r"->saveAll\(\$this->request->data",
-                r"->save\(\$this->request->data\)",
-                r"->save\(\$_POST",
-                r"->save\(\$data(?!.*[\'\"]\w+[\'\"])"
-            ]
-        }
+        self.security_patterns = {name: list(patterns) for name, patterns in SECURITY_PATTERNS.items()}
+
+    def _rules(self) -> CompiledRules:
+        """Return the compiled rules for the current rule tables
+
+        Returns:
+            Compiled rules, shared by every analyzer with the same tables
+        """
+        return compile_rules(
+            tuple(self.deprecated_methods.items()),
+            tuple((name, tuple(patterns)) for name, patterns in self.security_patterns.items()),
+        )
+
+    def _log(self, message: str):
+        """Print a progress message to the log stream"""
+        print(message, file=self.log_stream)
 
-    def analyze_project(self) -> List[Dict[str, Any]]:
+    def _wants(self, severity: str) -> bool:
+        """Return whether issues of a severity pass the minimum severity"""
+        return SEVERITY_LEVELS.get(severity, 0) >= self.min_level
+
+    def analyze_project(self) -> List[Issue]:
         """Analyze the entire project
 
         Returns:
-            List of issue dictionaries with details about found problems
+            List of issues with details about found problems
         """
-        print(f"Analyzing CakePHP 2.10 project at: {self.project_path}")
+        self.issues.extend(self.iter_issues())
+        return self.issues
 
-        if not os.path.exists(self.project_path):
-            print(f"Error: Project path '{self.project_path}' does not exist.")
-            return []
+    def analyze_related(self, target_file: str) -> List[Issue]:
+        """Analyze a file and its MVC counterparts only
 
-        self._scan_files()
+        Args:
+            target_file: Path to the file being reviewed
+
+        Returns:
+            List of issues with details about found problems
+        """
+        self.issues.extend(self.iter_issues(target_file))
         return self.issues
 
+    def iter_issues(self, target_file: Optional[str] = None) -> Iterator[Issue]:
+        """Yield issues as the files are analyzed, without keeping them
+
+        Issues come out in the same order as from `analyze_project`, one file
+        at a time, so memory does not grow with the number of issues.
+
+        Args:
+            target_file: Analyze only this file and its MVC counterparts
+                instead of the whole project
+
+        Yields:
+            Issues at or above the minimum severity
+        """
+        if target_file:
+            file_paths = find_related_files(self.project_path, target_file)
+            self._log(f"Analyzing {len(file_paths)} CakePHP 2.10 files related to: {target_file}")
+            prune = False
+        else:
+            self._log(f"Analyzing CakePHP 2.10 project at: {self.project_path}")
+            if not os.path.exists(self.project_path):
+                self._log(f"Error: Project path '{self.project_path}' does not exist.")
+                return
+            file_paths = self._find_files()
+            prune = True
+
+        for file_issues in self._iter_file_issues(file_paths, prune):
+            yield from file_issues
+
+    def _find_files(self) -> List[str]:
+        """Find the files to analyze
+
+        Returns:
+            Paths of the PHP and template files in os.walk order
+        """
+        oversized = []
+        file_paths = walk_files(
+            self.project_path, ['.php', '.ctp'], self.ignore, self.max_file_size,
+            lambda file_path, reason: oversized.append(file_path),
+        )
+        if oversized:
+            self._log(f"Skipped {len(oversized)} files larger than {self.max_file_size // 1024} KB.")
+        return file_paths
+
     def _scan_files(self):
         """Scan all files in the project and perform analysis"""
-        php_extensions = ['.php', '.ctp']
+        for file_issues in self._iter_file_issues(self._find_files(), prune=True):
+            self.issues.extend(file_issues)
+
+    def _iter_file_issues(self, file_paths: List[str], prune: bool) -> Iterator[List[Issue]]:
+        """Analyze files, serving unchanged ones from the cache
 
-        # Walk through the project directory
-        for root, _, files in os.walk(self.project_path):
-            for file in files:
-                file_ext = os.path.splitext(file)[1].lower()
-                if file_ext in php_extensions:
-                    file_path = os.path.join(root, file)
-                    self._analyze_file(file_path)
+        Args:
+            file_paths: Paths of the files to analyze
+            prune: Whether `file_paths` is the whole project, so cache entries
+                of other files are stale and can be removed
+
+        Yields:
+            The issues of each file, in the order of `file_paths`
+        """
+        if self.cache is None:
+            yield from self._analyze_files(file_paths)
+            return
+
+        # Serve unchanged files from the cache and analyze the rest
+        version = self._rules().version
+        cached, misses = self.cache.lookup(self.project_path, file_paths, version)
+        analyzed = self._analyze_files([file_path for file_path in file_paths if file_path not in cached])
+
+        # Results filtered by a severity threshold are incomplete, so they are not cached
+        store = self.min_level == 0
+        pending = []
+        for file_path in file_paths:
+            if file_path in cached:
+                # Cached entries are decoded one file at a time as they are yielded
+                file_issues = [issue_from_row(row) for row in json.loads(cached.pop(file_path))]
+                if self.min_level:
+                    file_issues = [issue for issue in file_issues if self._wants(issue.severity)]
+            else:
+                file_issues = next(analyzed)
+                # Read errors may be transient, so files with a file_error are not cached
+                if store and file_path in misses and not any(issue["type"] == "file_error" for issue in file_issues):
+                    pending.append((file_path, misses[file_path], [issue.to_row() for issue in file_issues]))
+                    if len(pending) >= CACHE_STORE_BATCH:
+                        self.cache.store(self.project_path, version, pending)
+                        pending = []
+            yield file_issues
+
+        if pending:
+            self.cache.store(self.project_path, version, pending)
+        if prune:
+            self.cache.prune(self.project_path, file_paths)
+
+    def _analyze_files(self, file_paths: List[str]) -> Iterator[List[Issue]]:
+        """Analyze files, in a process pool if more than one job is configured
+
+        Args:
+            file_paths: Paths of the files to analyze
+
+        Returns:
+            Iterator over the issues of each file, in the order of `file_paths`
+        """
+        if self.jobs > 1 and len(file_paths) > 1:
+            return self._analyze_files_parallel(file_paths)
+        # Files are read ahead in threads while the checks run
+        return (self.check_source(source) for source in load_files(file_paths, self.max_file_size))
+
+    def _analyze_files_parallel(self, file_paths: List[str]) -> Iterator[List[Issue]]:
+        """Analyze files in a process pool, keeping the serial issue order
+
+        Args:
+            file_paths: Paths of the files to analyze
+
+        Yields:
+            The issues of each file, in the order of `file_paths`
+        """
+        # Imported here because multiprocessing is slow to import and most runs are serial
+        from concurrent.futures import ProcessPoolExecutor
+
+        # A few chunks per process balances uneven file sizes against IPC overhead
+        chunksize = max(1, len(file_paths) // (self.jobs * 4))
+        done = 0
+
+        with ProcessPoolExecutor(
+            max_workers=self.jobs,
+            initializer=_init_worker,
+            initargs=(
+                self.project_path, self.deprecated_methods, self.security_patterns, self.min_severity,
+                self.max_file_size,
+            ),
+        ) as executor:
+            try:
+                # map yields results in input order, so the issues come out as in a serial run
+                for file_issues in executor.map(_analyze_file_in_worker, file_paths, chunksize=chunksize):
+                    done += 1
+                    yield file_issues
+            except Exception as e:
+                # A worker process died; report the files that have no results
+                for file_path in file_paths[done:]:
+                    yield [file_error_issue(file_path, f"Analysis failed: {str(e)}")]
 
     def _analyze_file(self, file_path: str):
         """Analyze a single file
@@ -110,28 +776,50 @@ class CakePHP210Analyzer:
         Args:
             file_path: Path to the file to analyze
         """
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except UnicodeDecodeError:
-            try:
-                with open(file_path, 'r', encoding='latin-1') as f:
-                    content = f.read()
-            except Exception as e:
-                self.issues.append({
-                    "file": file_path,
-                    "type": "file_error",
-                    "severity": "error",
-                    "message": f"Could not read file: {str(e)}"
-                })
-                return
+        self.issues.extend(self.collect_file_issues(file_path))
 
-        # Run all checks
-        self.issues.extend(self.check_naming_conventions(file_path, content))
-        self.issues.extend(self.check_deprecated_features(file_path, content))
-        self.issues.extend(self.check_security_issues(file_path, content))
+    def collect_file_issues(self, file_path: str) -> List[Issue]:
+        """Run all checks on a single file
 
-    def check_naming_conventions(self, file_path: str, content: str) -> List[Dict[str, Any]]:
+        Args:
+            file_path: Path to the file to analyze
+
+        Returns:
+            List of issues found in the file
+        """
+        return self.check_source(read_source_file(file_path, self.max_file_size))
+
+    def check_source(self, source: SourceFile) -> List[Issue]:
+        """Run all checks on a file that has been read
+
+        Args:
+            source: The file, as read by file_loader; binary and oversized files have no issues
+
+        Returns:
+            List of issues found in the file
+        """
+        file_path, content = source.path, source.text
+        if source.error:
+            if not self._wants(FILE_ERROR_RULE.severity):
+                return []
+            return [file_error_issue(file_path, f"Could not read file: {source.error}")]
+        if source.skipped:
+            return []
+
+        # Run all checks, sharing one line index
+        try:
+            line_index = LineIndex(content)
+            issues = []
+            issues.extend(self.check_naming_conventions(file_path, content))
+            issues.extend(self.check_deprecated_features(file_path, content, line_index))
+            issues.extend(self.check_security_issues(file_path, content, line_index))
+        except Exception as e:
+            if not self._wants(FILE_ERROR_RULE.severity):
+                return []
+            return [file_error_issue(file_path, f"Analysis failed: {str(e)}")]
+        return issues
+
+    def check_naming_conventions(self, file_path: str, content: str) -> List[Issue]:
         """Check adherence to CakePHP naming conventions
 
         Args:
@@ -147,169 +835,140 @@ class CakePHP210Analyzer:
         # Controller checks
         if "/Controller/" in file_path and not "/Component/" in file_path:
             # Controller class should end with 'Controller'
-            class_match = re.search(r"class\s+(\w+)", content)
+            class_match = CLASS_PATTERN.search(content)
             if class_match:
                 class_name = class_match.group(1)
-                if not class_name.endswith("Controller"):
-                    issues.append({
-                        "file": rel_path,
-                        "type": "naming_convention",
-                        "severity": "error",
-                        "message": f"Controller class '{class_name}' does not follow CakePHP naming convention. It should end with 'Controller'."
-                    })
+                if not class_name.endswith("Controller") and self._wants(CONTROLLER_SUFFIX_RULE.severity):
+                    issues.append(Issue(rel_path, None, CONTROLLER_SUFFIX_RULE, (class_name,)))
 
                 # Controller class should be in plural form before 'Controller'
                 base_name = class_name.replace("Controller", "")
-                if base_name == base_name.rstrip('s'):  # Simple singular check
-                    issues.append({
-                        "file": rel_path,
-                        "type": "naming_convention",
-                        "severity": "warning",
-                        "message": f"Controller '{class_name}' should be named in plural form (e.g., '{base_name}sController')."
-                    })
+                if base_name == base_name.rstrip('s') and self._wants(CONTROLLER_PLURAL_RULE.severity):  # Simple singular check
+                    issues.append(Issue(rel_path, None, CONTROLLER_PLURAL_RULE, (class_name, base_name)))
 
         # Model checks
         if "/Model/" in file_path and not "/Behavior/" in file_path:
             # Model class should be singular
-            class_match = re.search(r"class\s+(\w+)", content)
+            class_match = CLASS_PATTERN.search(content)
             if class_match:
                 class_name = class_match.group(1)
-                if class_name.endswith('s') and not class_name.endswith('Status'):
-                    issues.append({
-                        "file": rel_path,
-                        "type": "naming_convention",
-                        "severity": "warning",
-                        "message": f"Model class '{class_name}' should be in singular form according to CakePHP conventions."
-                    })
+                if class_name.endswith('s') and not class_name.endswith('Status') and self._wants(MODEL_SINGULAR_RULE.severity):
+                    issues.append(Issue(rel_path, None, MODEL_SINGULAR_RULE, (class_name,)))
 
         # Function naming conventions
         # Controller action methods should be camelCase
-        if "/Controller/" in file_path:
-            function_matches = re.finditer(r"public\s+function\s+(\w+)\s*\(", content)
+        if "/Controller/" in file_path and self._wants(ACTION_CAMEL_CASE_RULE.severity):
+            function_matches = PUBLIC_FUNCTION_PATTERN.finditer(content)
             for match in function_matches:
                 function_name = match.group(1)
                 if function_name != 'beforeFilter' and function_name != 'afterFilter' and function_name != 'beforeRender':
                     if not function_name[0].islower() or '_' in function_name:
-                        issues.append({
-                            "file": rel_path,
-                            "type": "naming_convention",
-                            "severity": "warning",
-                            "message": f"Action method '{function_name}' should use camelCase naming convention."
-                        })
+                        issues.append(Issue(rel_path, None, ACTION_CAMEL_CASE_RULE, (function_name,)))
 
         return issues
 
-    def check_deprecated_features(self, file_path: str, content: str) -> List[Dict[str, Any]]:
+    def check_deprecated_features(self, file_path: str, content: str, line_index: Optional[LineIndex] = None) -> List[Issue]:
         """Check for usage of deprecated methods and features
 
+        All deprecated literals are found in one pass over the content. Each
+        literal's matches are non-overlapping, as with a separate search per
+        literal, and the issues are reported in rule order.
+
         Args:
             file_path: Path to the file being analyzed
             content: Content of the file
+            line_index: Line index of the content (built if not given)
 
         Returns:
             List of deprecated feature issues
         """
+        # Every deprecated feature issue is a warning; skip the scan below the threshold
+        if not self._wants(DEPRECATED_METHOD_RULE.severity):
+            return []
+
         issues = []
         rel_path = os.path.relpath(file_path, self.project_path)
+        rules = self._rules()
+        if line_index is None:
+            line_index = LineIndex(content)
+
+        # The scanner stops wherever any literal starts; several literals can
+        # start at the same offset (e.g. '->data' and '->data->')
+        offsets = {deprecated: [] for deprecated, _ in rules.deprecated}
+        next_allowed = {deprecated: 0 for deprecated, _ in rules.deprecated}
+        for match in rules.deprecated_scanner.finditer(content):
+            start = match.start()
+            for deprecated, _ in rules.deprecated:
+                if start >= next_allowed[deprecated] and content.startswith(deprecated, start):
+                    offsets[deprecated].append(start)
+                    next_allowed[deprecated] = start + len(deprecated)
 
-        for deprecated, alternative in self.deprecated_methods.items():
-            matches = re.finditer(re.escape(deprecated), content)
-            for match in matches:
-                line_num = content[:match.start()].count('\n') + 1
-                issues.append({
-                    "file": rel_path,
-                    "line": line_num,
-                    "type": "deprecated_feature",
-                    "severity": "warning",
-                    "message": f"Deprecated feature '{deprecated}' used. Consider using '{alternative}' instead."
-                })
+        # All issues of a literal share its (literal, alternative) pair as message arguments
+        for pair in rules.deprecated:
+            for start in offsets[pair[0]]:
+                issues.append(Issue(rel_path, line_index.line_number(start), DEPRECATED_METHOD_RULE, pair))
 
         # Check for specific patterns indicating deprecated usage
-        if re.search(r"App::uses\s*\(\s*['\"]Controller['\"]", content):
-            line_num = content.find("App::uses") + 1
-            issues.append({
-                "file": rel_path,
-                "line": line_num,
-                "type": "deprecated_feature",
-                "severity": "warning",
-                "message": "App::uses() for loading controllers is deprecated. CakePHP 2.10 uses autoloading."
-            })
+        app_uses_match = APP_USES_CONTROLLER_PATTERN.search(content)
+        if app_uses_match:
+            line_num = line_index.line_number(app_uses_match.start())
+            issues.append(Issue(rel_path, line_num, APP_USES_CONTROLLER_RULE))
 
         return issues
 
-    def check_security_issues(self, file_path: str, content: str) -> List[Dict[str, Any]]:
+    def check_security_issues(self, file_path: str, content: str, line_index: Optional[LineIndex] = None) -> List[Issue]:
         """Check for security vulnerabilities in the code
 
         Args:
             file_path: Path to the file being analyzed
             content: Content of the file
+            line_index: Line index of the content (built if not given)
 
         Returns:
             List of security issue dictionaries
         """
         issues = []
         rel_path = os.path.relpath(file_path, self.project_path)
+        rules = self._rules()
+        if line_index is None:
+            line_index = LineIndex(content)
+
+        def find_matches(category: str, rule: IssueRule):
+            # Skip the regex pass when its issues are below the threshold or
+            # the file lacks the literal every match starts with
+            if not self._wants(rule.severity):
+                return
+            for pattern, literal in rules.security[category]:
+                if literal in content:
+                    yield from pattern.finditer(content)
 
         # Check for SQL injection vulnerabilities
-        for pattern in self.security_patterns["sql_injection"]:
-            matches = re.finditer(pattern, content)
-            for match in matches:
-                line_num = content[:match.start()].count('\n') + 1
-                issues.append({
-                    "file": rel_path,
-                    "line": line_num,
-                    "type": "security_risk",
-                    "severity": "critical",
-                    "message": "Potential SQL injection risk. Use parameterized queries with bound parameters instead of string concatenation."
-                })
+        for match in find_matches("sql_injection", SQL_INJECTION_RULE):
+            line_num = line_index.line_number(match.start())
+            issues.append(Issue(rel_path, line_num, SQL_INJECTION_RULE))
 
         # Check for XSS vulnerabilities
         if file_path.endswith(".ctp") or "/View/" in file_path:
-            for pattern in self.security_patterns["xss"]:
-                matches = re.finditer(pattern, content)
-                for match in matches:
-                    line_num = content[:match.start()].count('\n') + 1
-                    issues.append({
-                        "file": rel_path,
-                        "line": line_num,
-                        "type": "security_risk",
-                        "severity": "high",
-                        "message": "Potential XSS vulnerability. Use h() function or echo $this->Html->... to properly escape output."
-                    })
+            for match in find_matches("xss", XSS_RULE):
+                line_num = line_index.line_number(match.start())
+                issues.append(Issue(rel_path, line_num, XSS_RULE))
 
         # Check for CSRF protection issues
-        for pattern in self.security_patterns["csrf"]:
-            if re.search(pattern, content):
-                issues.append({
-                    "file": rel_path,
-                    "type": "security_risk",
-                    "severity": "high",
-                    "message": "CSRF protection is disabled. Consider enabling CSRF protection in SecurityComponent."
-                })
+        for pattern, literal in rules.security["csrf"] if self._wants(CSRF_DISABLED_RULE.severity) else []:
+            if literal in content and pattern.search(content):
+                issues.append(Issue(rel_path, None, CSRF_DISABLED_RULE))
 
         # Check if Security component is used in controllers
-        if "/Controller/" in file_path and not "/Component/" in file_path:
-            if not re.search(r"public\s+\$components\s*=.*Security", content):
-                issues.append({
-                    "file": rel_path,
-                    "type": "security_risk",
-                    "severity": "medium",
-                    "message": "SecurityComponent not used. Consider adding Security component for CSRF protection and form tampering prevention."
-                })
+        if "/Controller/" in file_path and not "/Component/" in file_path and self._wants(SECURITY_COMPONENT_RULE.severity):
+            if not SECURITY_COMPONENT_PATTERN.search(content):
+                issues.append(Issue(rel_path, None, SECURITY_COMPONENT_RULE))
 
         # Check for mass assignment vulnerabilities
-        for pattern in self.security_patterns["mass_assignment"]:
-            matches = re.finditer(pattern, content)
-            for match in matches:
-                if not re.search(r"->save\(\$this->request->data\s*,\s*['\"]fieldList['\"]", content):
-                    line_num = content[:match.start()].count('\n') + 1
-                    issues.append({
-                        "file": rel_path,
-                        "line": line_num,
-                        "type": "security_risk",
-                        "severity": "high",
-                        "message": "Potential mass assignment vulnerability. Use the fieldList option in save() to specify allowed fields."
-                    })
+        # A fieldList anywhere in the file suppresses these issues, so it is searched once
+        if self._wants(MASS_ASSIGNMENT_RULE.severity) and not FIELD_LIST_PATTERN.search(content):
+            for match in find_matches("mass_assignment", MASS_ASSIGNMENT_RULE):
+                line_num = line_index.line_number(match.start())
+                issues.append(Issue(rel_path, line_num, MASS_ASSIGNMENT_RULE))
 
         return issues
 
@@ -402,42 +1061,194 @@ def format_console_output(result: Dict[str, Any]) -> str:
 
     return "\n".join(output)
 
+def write_jsonl(issues: Iterable[Mapping[str, Any]], stream: TextIO) -> int:
+    """Write issues as JSON Lines, one issue per line as it arrives
+
+    Args:
+        issues: Issues to write
+        stream: Stream to write to
+
+    Returns:
+        Number of issues written
+    """
+    encode = json.JSONEncoder(ensure_ascii=False, default=issue_json_default).encode
+    count = 0
+    for issue in issues:
+        stream.write(encode(issue.to_dict() if isinstance(issue, Issue) else issue))
+        stream.write("\n")
+        count += 1
+    return count
+
+def sarif_result(issue: Mapping[str, Any], project_path: str) -> Dict[str, Any]:
+    """Convert an issue to a SARIF result
+
+    Args:
+        issue: Issue to convert
+        project_path: Path of the analyzed project
+
+    Returns:
+        The SARIF result object
+    """
+    file_path = issue["file"]
+    if os.path.isabs(file_path):
+        file_path = os.path.relpath(file_path, project_path)
+    severity = issue.get("severity", "info")
+
+    location = {
+        "artifactLocation": {"uri": file_path.replace(os.sep, "/"), "uriBaseId": "SRCROOT"},
+    }
+    if "line" in issue:
+        location["region"] = {"startLine": issue["line"]}
+
+    return {
+        "ruleId": issue["type"],
+        "level": SARIF_LEVELS.get(severity, "note"),
+        "message": {"text": issue["message"]},
+        "locations": [{"physicalLocation": location}],
+        "properties": {"severity": severity},
+    }
+
+def write_sarif(issues: Iterable[Mapping[str, Any]], stream: TextIO, project_path: str) -> int:
+    """Write issues as a SARIF 2.1.0 log, writing each result as it arrives
+
+    Args:
+        issues: Issues to write
+        stream: Stream to write to
+        project_path: Path of the analyzed project, the base of the result locations
+
+    Returns:
+        Number of issues written
+    """
+    tool = {
+        "driver": {
+            "name": "CakePHP 2.10 Code Analyzer",
+            "version": str(ANALYZER_VERSION),
+            "rules": SARIF_RULES,
+        }
+    }
+    # pathlib is only needed here; importing it at module level slows down the CLI startup
+    from pathlib import Path
+
+    base_uri = {"SRCROOT": {"uri": Path(os.path.abspath(project_path)).as_uri() + "/"}}
+
+    # The envelope is written by hand so the results array never has to be held in memory
+    stream.write(f'{{"version": "{SARIF_VERSION}", "$schema": "{SARIF_SCHEMA}", "runs": [{{')
+    stream.write(f'"tool": {json.dumps(tool)}, "originalUriBaseIds": {json.dumps(base_uri)}, "results": [')
+    count = 0
+    for issue in issues:
+        if count:
+            stream.write(",")
+        stream.write("\n")
+        stream.write(json.dumps(sarif_result(issue, project_path), ensure_ascii=False))
+        count += 1
+    stream.write("\n]}]}\n")
+    return count
+
 def analyze_cakephp(
     project_path: str,
-    output_format: str = "console"
+    output_format: Optional[str] = "console",
+    jobs: int = 1,
+    cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    target_file: Optional[str] = None,
+    min_severity: Optional[str] = None,
+    output_file: Optional[str] = None,
+    ignore: bool = True,
+    max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE,
 ) -> Optional[Dict[str, Any]]:
     """Analyze a CakePHP 2.10 project
 
     Args:
         project_path: Path to the CakePHP project to analyze
-        output_format: Format for output (console, json, or returning results)
+        output_format: Format for output (console, json, jsonl, sarif, or
+            None for returning results)
+        jobs: Number of processes analyzing files (0 for one per CPU)
+        cache_dir: Directory of the analysis result cache, or None to disable it
+        target_file: Analyze only this file and its MVC counterparts instead
+            of the whole project
+        min_severity: Drop issues below this severity, or None to keep all
+        output_file: Write the output to this file instead of stdout
+        ignore: Skip vendor, tmp and minified files and the paths listed in
+            .gitignore and .reviewignore files
+        max_file_size: Skip files larger than this many bytes (no limit if None)
 
     Returns:
         Analysis results as a dictionary if output_format is None, otherwise None
     """
-    analyzer = CakePHP210Analyzer(project_path)
-    analyzer.analyze_project()
+    streaming = output_format in STREAMING_FORMATS
+    # Keep progress messages out of results streamed to stdout
+    log_stream = sys.stderr if streaming and not output_file else None
+    analyzer = CakePHP210Analyzer(project_path, jobs, cache_dir, min_severity, log_stream, ignore, max_file_size)
+
+    if streaming:
+        out = open(output_file, 'w', encoding='utf-8') if output_file else sys.stdout
+        try:
+            issues = analyzer.iter_issues(target_file)
+            if output_format == "jsonl":
+                count = write_jsonl(issues, out)
+            else:
+                count = write_sarif(issues, out, project_path)
+        finally:
+            if output_file:
+                out.close()
+        if analyzer.cache is not None:
+            analyzer.cache.report(log_stream)
+            analyzer.cache.close()
+        if output_file:
+            print(f"Wrote {count} issues to {output_file}", file=log_stream)
+        return None
+
+    if target_file:
+        analyzer.analyze_related(target_file)
+    else:
+        analyzer.analyze_project()
+    if analyzer.cache is not None:
+        # Keep the counters out of the report and of the results returned to callers
+        analyzer.cache.report(sys.stderr)
+        analyzer.cache.close()
 
     result = analyzer.format_issues_for_output()
 
     if output_format == "console":
-        print(format_console_output(result))
-        return None
+        output = format_console_output(result)
     elif output_format == "json":
-        import json
-        print(json.dumps(result, indent=2))
-        return None
+        output = json.dumps(result, indent=2, default=issue_json_default)
     else:
         return result
 
+    if output_file:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+        print(f"Wrote {result['total_issues']} issues to {output_file}")
+    else:
+        print(output)
+    return None
+
 def main():
     """Main function to run the analyzer from command line"""
     parser = argparse.ArgumentParser(description="CakePHP 2.10 Code Analyzer")
     parser.add_argument("project_path", help="Path to the CakePHP project to analyze")
-    parser.add_argument("--output", "-o", default="console", choices=["console", "json"], help="Output format")
+    parser.add_argument("--output", "-o", default="console", choices=OUTPUT_FORMATS, help="Output format")
+    parser.add_argument("--output-file", "-f", help="Write the output to this file instead of stdout")
+    parser.add_argument("--min-severity", choices=MIN_SEVERITY_CHOICES, help="Drop issues below this severity")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="Number of processes analyzing files (0 for one per CPU)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory of the analysis result cache")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the analysis result cache")
+    parser.add_argument("--no-ignore", action="store_true",
+                        help="Also analyze vendor, tmp and minified files and the paths listed in .gitignore/.reviewignore")
+    parser.add_argument("--max-file-kb", type=int, default=DEFAULT_MAX_FILE_SIZE // 1024,
+                        help=f"Skip files larger than this many KB, 0 for no limit (default: {DEFAULT_MAX_FILE_SIZE // 1024})")
     args = parser.parse_args()
 
-    analyze_cakephp(args.project_path, args.output)
+    analyze_cakephp(
+        args.project_path,
+        args.output,
+        args.jobs,
+        None if args.no_cache else args.cache_dir,
+        min_severity=args.min_severity,
+        output_file=args.output_file,
+        ignore=not args.no_ignore,
+        max_file_size=args.max_file_kb * 1024 or None,
+    )
 
 if __name__ == "__main__":
     main()
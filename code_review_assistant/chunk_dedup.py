@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.core.storage.docstore.types import BaseDocumentStore
+
+# Import the default near-duplicate threshold
+try:
+    from defaults import DEFAULT_DEDUP_SIMILARITY
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.defaults import DEFAULT_DEDUP_SIMILARITY
+
+# Number of consecutive tokens in a shingle
+SHINGLE_SIZE = 5
+# Chunks with fewer shingles are only deduplicated when identical
+MIN_SHINGLES = 10
+# MinHash signature length, split into LSH bands of NUM_PERM // LSH_BANDS rows.
+# 16 bands of 8 rows make pairs of 0.85 similarity or more candidates with over
+# 99% probability; candidates are then checked against the similarity threshold.
+NUM_PERM = 128
+LSH_BANDS = 16
+# Largest prime below 2**32, the modulus of the MinHash hash functions
+HASH_PRIME = 4294967291
+# Node metadata listing the other locations of a representative chunk
+DUPLICATES_KEY = "duplicates"
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+LOCATION_LINES_PATTERN = re.compile(r":\d+-\d+$")
+
+class DedupResult(NamedTuple):
+    """Outcome of deduplicating the nodes of an indexing run"""
+    representatives: List[BaseNode]
+    # (duplicate, representative) pairs
+    duplicates: List[Tuple[BaseNode, BaseNode]]
+    exact: int
+    near: int
+    saved_characters: int
+    total_characters: int
+
+def normalize_text(text: str) -> str:
+    """Normalize a chunk for exact comparison: strip indentation and drop blank lines"""
+    return "\n".join(line.strip() for line in text.splitlines() if line.strip())
+
+def shingle_hashes(text: str) -> np.ndarray:
+    """Return the 32-bit hashes of the distinct token shingles of a text"""
+    tokens = TOKEN_PATTERN.findall(text)
+    shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+
+class MinHasher:
+    """Computes MinHash signatures with NUM_PERM universal hash functions"""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        """Draw the hash functions
+
+        Args:
+            num_perm: Number of hash functions (signature length)
+            seed: Seed of the random coefficients, fixed so signatures are reproducible
+        """
+        rng = np.random.RandomState(seed)
+        # a * hash stays below 2**64 for 32-bit coefficients and hashes
+        self.a = rng.randint(1, HASH_PRIME, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self.b = rng.randint(0, HASH_PRIME, size=num_perm, dtype=np.int64).astype(np.uint64)
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        """Return the MinHash signature of a set of shingle hashes"""
+        prime = np.uint64(HASH_PRIME)
+        return ((np.outer(hashes, self.a) % prime + self.b) % prime).min(axis=0)
+
+def find_duplicates(
+    texts: Sequence[str],
+    similarity: float = DEFAULT_DEDUP_SIMILARITY,
+) -> List[Optional[Tuple[int, bool]]]:
+    """Find the texts that repeat an earlier text exactly or nearly
+
+    Texts are compared after normalize_text. Near duplicates are found with
+    MinHash signatures of token shingles and locality-sensitive hashing, so
+    each text is compared only with the few earlier texts that share an LSH
+    band. A text is only matched against representatives, never against
+    another duplicate, so groups cannot drift apart through chains of
+    near matches.
+
+    Args:
+        texts: The texts in order; the first text of each group is its representative
+        similarity: Minimum estimated Jaccard similarity of near duplicates
+            (1.0 or more to find exact duplicates only)
+
+    Returns:
+        For each text, None if it is a representative, otherwise the index of its
+        representative and whether it is an exact duplicate
+    """
+    matches: List[Optional[Tuple[int, bool]]] = [None] * len(texts)
+    # Normalized text -> match of its later copies
+    by_text: Dict[str, Tuple[int, bool]] = {}
+    near = similarity < 1.0
+    hasher = MinHasher() if near else None
+    rows = NUM_PERM // LSH_BANDS
+    buckets: Dict[Tuple[int, bytes], List[int]] = {}
+    signatures: Dict[int, np.ndarray] = {}
+
+    for i, text in enumerate(texts):
+        normalized = normalize_text(text)
+        if normalized in by_text:
+            matches[i] = by_text[normalized]
+            continue
+        by_text[normalized] = (i, True)
+
+        if not near:
+            continue
+        hashes = shingle_hashes(normalized)
+        if len(hashes) < MIN_SHINGLES:
+            continue
+        signature = hasher.signature(hashes)
+        bands = [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(LSH_BANDS)]
+
+        candidates = dict.fromkeys(j for band in bands for j in buckets.get(band, []))
+        best, best_score = None, similarity
+        for j in candidates:
+            score = float(np.mean(signatures[j] == signature))
+            if score >= best_score:
+                best, best_score = j, score
+        if best is not None:
+            # Copies of a near duplicate belong to the same representative
+            matches[i] = by_text[normalized] = (best, False)
+            continue
+
+        signatures[i] = signature
+        for band in bands:
+            buckets.setdefault(band, []).append(i)
+    return matches
+
+def format_location(metadata: Dict) -> str:
+    """Return "path:start-end" for a chunk, or the path if it has no line range"""
+    location = metadata.get("file_path", "unknown")
+    if metadata.get("start_line"):
+        location += f":{metadata['start_line']}-{metadata['end_line']}"
+    return location
+
+def location_path(location: str) -> str:
+    """Return the file path of a location made by format_location"""
+    return LOCATION_LINES_PATTERN.sub("", location)
+
+def deduplicate_nodes(nodes: Sequence[BaseNode], similarity: float = DEFAULT_DEDUP_SIMILARITY) -> DedupResult:
+    """Keep one representative of each group of duplicate nodes
+
+    The representative gets the locations of its duplicates in its
+    DUPLICATES_KEY metadata, which is excluded from the embedding and
+    LLM text. The duplicates are not embedded or stored.
+
+    Args:
+        nodes: The nodes of the indexing run, in file order
+        similarity: Minimum estimated Jaccard similarity of near duplicates
+            (1.0 or more to remove exact duplicates only)
+
+    Returns:
+        The representatives, the removed duplicates and the work saved
+    """
+    texts = [node.get_content(metadata_mode=MetadataMode.NONE) for node in nodes]
+    matches = find_duplicates(texts, similarity)
+
+    representatives, duplicates = [], []
+    exact = near = saved_characters = 0
+    for node, text, match in zip(nodes, texts, matches):
+        if match is None:
+            representatives.append(node)
+            continue
+        representative = nodes[match[0]]
+        if DUPLICATES_KEY not in representative.metadata:
+            representative.metadata[DUPLICATES_KEY] = []
+            for keys in ("excluded_embed_metadata_keys", "excluded_llm_metadata_keys"):
+                setattr(representative, keys, list(getattr(representative, keys)) + [DUPLICATES_KEY])
+        representative.metadata[DUPLICATES_KEY].append(format_location(node.metadata))
+        duplicates.append((node, representative))
+        exact += match[1]
+        near += not match[1]
+        saved_characters += len(text)
+
+    return DedupResult(representatives, duplicates, exact, near, saved_characters, sum(len(text) for text in texts))
+
+def report_dedup(result: DedupResult) -> None:
+    """Print how many nodes deduplication removed and the embedding work it saved
+
+    Args:
+        result: Result of deduplicate_nodes
+    """
+    total = len(result.representatives) + len(result.duplicates)
+    if not result.duplicates:
+        print(f"No duplicate chunks among {total} nodes.")
+        return
+    share = result.saved_characters / max(1, result.total_characters)
+    print(
+        f"Deduplicated {len(result.duplicates)} of {total} nodes ({result.exact} exact, {result.near} near duplicates); "
+        f"skipped embedding {result.saved_characters:,} characters ({share:.0%})."
+    )
+
+def remove_duplicate_locations(docstore: BaseDocumentStore, node_ids: Sequence[str], file_path: str) -> None:
+    """Remove the locations in a file from the back-references of representative nodes
+
+    Called when the file changes or is removed, so its old chunks are no longer
+    listed as duplicates. Representatives that were deleted are skipped.
+
+    Args:
+        docstore: Document store of the index
+        node_ids: Ids of the representatives of the file's duplicate chunks
+        file_path: Path of the file
+    """
+    for node_id in dict.fromkeys(node_ids):
+        node = docstore.get_node(node_id, raise_error=False)
+        if node is None or DUPLICATES_KEY not in node.metadata:
+            continue
+        node.metadata[DUPLICATES_KEY] = [
+            location for location in node.metadata[DUPLICATES_KEY] if location_path(location) != file_path
+        ]
+        docstore.add_documents([node], allow_update=True)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import argparse
+import importlib
+from typing import List, Optional, Tuple
+
+# Subcommands and the module whose main() runs them. Modules are imported only
+# when their command runs, so `analyze` and `--help` never load llama_index.
+COMMANDS = {
+    "index": ("index_code", "Index a code repository"),
+    "query": ("query_code", "Query the indexed codebase"),
+    "serve": ("query_service", "Run the resident query service"),
+    "review": ("code_review", "Review files with Ollama and the CakePHP analyzer"),
+    "analyze": ("analyze_cakephp", "Run the CakePHP 2.10 static analyzer (no Ollama needed)"),
+}
+
+# Modules checked by `doctor`: (module names, any of which will do; pip package; needed by)
+DEPENDENCIES = [
+    (["llama_index.core"], "llama-index", "index, query, serve, review"),
+    (["llama_index_llms_ollama", "llama_index.llms.ollama"], "llama-index-llms-ollama", "index, query, serve, review"),
+    (["llama_index_embeddings_ollama", "llama_index.embeddings.ollama"], "llama-index-embeddings-ollama", "index, query, serve, review"),
+    (["numpy"], "numpy", "index, query, serve, review"),
+    (["requests"], "requests", "all commands that talk to Ollama"),
+]
+
+def import_command(module_name: str):
+    """Import the module of a subcommand
+
+    Args:
+        module_name: Name of the module in code_review_assistant
+
+    Returns:
+        The imported module
+    """
+    try:
+        return importlib.import_module(module_name)
+    except ModuleNotFoundError as e:
+        if e.name != module_name:
+            raise
+        # If imported from a different directory
+        return importlib.import_module(f"code_review_assistant.{module_name}")
+
+def missing_module(error: ModuleNotFoundError) -> str:
+    """Return the name of the third-party module behind a failed import
+
+    With the fallback imports of the scripts, the error raised last is about
+    the code_review_assistant package; the module that is really missing is
+    the one that failed first.
+
+    Args:
+        error: The error raised by the import
+    """
+    while (error.name or "").startswith("code_review_assistant") and isinstance(error.__context__, ModuleNotFoundError):
+        error = error.__context__
+    return error.name or str(error)
+
+def is_installed(module_names: List[str]) -> bool:
+    """Return True if any of the modules can be imported, without importing it
+
+    Args:
+        module_names: Alternative names of the module
+    """
+    # Only the doctor command needs it
+    import importlib.util
+
+    for module_name in module_names:
+        try:
+            if importlib.util.find_spec(module_name) is not None:
+                return True
+        except (ImportError, ValueError):
+            continue
+    return False
+
+def check_dependencies() -> List[Tuple[str, str]]:
+    """Check that the packages the commands import are installed
+
+    Returns:
+        (status, message) pairs, status being "ok" or "error"
+    """
+    results = [("ok", f"Python {sys.version.split()[0]}")]
+    for module_names, package, needed_by in DEPENDENCIES:
+        if is_installed(module_names):
+            results.append(("ok", f"{package} is installed"))
+        else:
+            results.append(("error", f"{package} is not installed (needed by {needed_by}); run 'pip install {package}'"))
+    return results
+
+def check_ollama_server(base_url: str, models: List[str], timeout: float = 5.0) -> List[Tuple[str, str]]:
+    """Check that the Ollama server answers and has the models
+
+    Args:
+        base_url: Base URL for Ollama API
+        models: Model names the commands will use
+        timeout: Timeout for each request in seconds
+
+    Returns:
+        (status, message) pairs, status being "ok" or "error"
+    """
+    if not is_installed(["requests"]):
+        return [("error", "Cannot check the Ollama server without requests")]
+
+    try:
+        from ollama_client import create_session
+    except ImportError:
+        # If imported from a different directory
+        from code_review_assistant.ollama_client import create_session
+
+    # Report an unreachable server at once instead of retrying
+    session = create_session(retries=0)
+    base_url = base_url.rstrip('/')
+    try:
+        version = session.get(f"{base_url}/api/version", timeout=timeout).json().get("version", "unknown")
+        tags = session.get(f"{base_url}/api/tags", timeout=timeout).json().get("models", [])
+    except Exception as e:
+        return [("error", f"Could not connect to Ollama server at {base_url}: {e}")]
+
+    results = [("ok", f"Ollama server {version} at {base_url}")]
+    available = {model.get("name") for model in tags}
+    for model in dict.fromkeys(models):
+        # Ollama resolves a name without a tag to its :latest tag
+        if model in available or f"{model}:latest" in available:
+            results.append(("ok", f"Model '{model}' is available"))
+        else:
+            results.append(("error", f"Model '{model}' is not available; run 'ollama pull {model}'"))
+    return results
+
+def check_index(index_dir: str, embedding_model: str) -> List[Tuple[str, str]]:
+    """Check that an index exists and was built with the embedding model
+
+    Args:
+        index_dir: Directory where the index is stored
+        embedding_model: Embedding model the commands will use
+
+    Returns:
+        (status, message) pairs, status being "ok" or "warning"
+    """
+    try:
+        from index_manifest import load_manifest
+    except ImportError:
+        # If imported from a different directory
+        from code_review_assistant.index_manifest import load_manifest
+
+    if not os.path.isdir(index_dir):
+        return [("warning", f"No index in '{index_dir}'; run the index command first (review works without one)")]
+
+    manifest = load_manifest(index_dir)
+    if manifest is None:
+        return [("warning", f"Index in '{index_dir}' has no manifest; the next index run rebuilds it")]
+
+    results = [("ok", f"Index in '{index_dir}' covers {len(manifest.get('files', {}))} files")]
+    index_model = manifest.get("settings", {}).get("embedding_model")
+    if index_model != embedding_model:
+        results.append((
+            "warning",
+            f"Index was built with embedding model '{index_model}', not '{embedding_model}'; re-index with --full-rebuild",
+        ))
+    return results
+
+def run_doctor(argv: Optional[List[str]] = None, prog: Optional[str] = None) -> None:
+    """Check the dependencies, the Ollama server and the index
+
+    Exits with status 1 if a check failed.
+
+    Args:
+        argv: Command-line arguments of the doctor command
+        prog: Program name shown in the usage message
+    """
+    parser = argparse.ArgumentParser(prog=prog, description="Check dependencies, the Ollama server and the index")
+    parser.add_argument("--base-url", "-u", default="http://127.0.0.1:11434", help="Base URL for Ollama API")
+    parser.add_argument("--model", "-m", default="codellama:latest", help="Ollama model name to use")
+    parser.add_argument("--embedding-model", "-e", default="codellama:latest", help="Ollama model name to use for embeddings")
+    parser.add_argument("--index-dir", "-i", default="./data", help="Directory where the index is stored")
+    args = parser.parse_args(argv)
+
+    sections = [
+        ("Dependencies", check_dependencies()),
+        ("Ollama", check_ollama_server(args.base_url, [args.model, args.embedding_model])),
+        ("Index", check_index(args.index_dir, args.embedding_model)),
+    ]
+
+    failed = 0
+    for title, results in sections:
+        print(f"{title}:")
+        for status, message in results:
+            print(f"  [{status}] {message}")
+            failed += status == "error"
+
+    if failed:
+        print(f"\n{failed} check(s) failed.")
+        sys.exit(1)
+    print("\nAll checks passed.")
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the top-level parser listing the subcommands"""
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="Code review assistant for CakePHP projects using Ollama",
+        epilog="Run 'cli.py <command> --help' for the options of a command.",
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    subparsers.required = True
+    for name, (_, summary) in COMMANDS.items():
+        # The options are parsed by the command itself
+        subparsers.add_parser(name, help=summary, add_help=False)
+    subparsers.add_parser("doctor", help="Check dependencies, the Ollama server and the index", add_help=False)
+    return parser
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    # Only the command name is parsed here; the rest goes to the command. Building
+    # the parser costs several milliseconds, so it is skipped for a known command.
+    if argv and (argv[0] in COMMANDS or argv[0] == "doctor"):
+        command = argv[0]
+    else:
+        command = build_parser().parse_args(argv[:1]).command
+    command_argv = argv[1:]
+    prog = f"cli.py {command}"
+
+    if command == "doctor":
+        run_doctor(command_argv, prog)
+        return
+
+    module_name = COMMANDS[command][0]
+    # The commands import llama_index after parsing their arguments, so a missing
+    # package can surface while the command runs as well as when it is imported
+    try:
+        module = import_command(module_name)
+        module.main(command_argv, prog)
+    except ModuleNotFoundError as e:
+        print(f"Error: The {command} command needs the '{missing_module(e)}' module, which is not installed.")
+        print("Run 'cli.py doctor' to see the missing packages.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,17 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import io
 import os
 import sys
+import glob
+import time
 import argparse
 import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Dict, Any, TextIO
+from typing import TYPE_CHECKING, List, Optional, Dict, Any, TextIO, Tuple
 
 # Import the CakePHP analyzer
 try:
@@ -19,107 +24,421 @@ except ImportError:
         print("Warning: Could not import CakePHP analyzer. CakePHP-specific analysis will be disabled.")
         analyze_cakephp = None
 
-from llama_index.core import Settings, load_index_from_storage, StorageContext
+# llama_index and the Ollama integrations take seconds to import, so they are
+# imported when a review session is created; --help and the helpers stay fast
+
+if TYPE_CHECKING:
+    from llama_index.llms.ollama import Ollama
+
+# Import the cache location and the default ANN search width; ann_index and
+# the caches import numpy and sqlite3, which --help does not need
 try:
-    from llama_index_llms_ollama import Ollama
-    from llama_index_embeddings_ollama import OllamaEmbedding
+    from defaults import DEFAULT_CACHE_DIR, DEFAULT_NPROBE
 except ImportError:
-    try:
-        from llama_index.llms.ollama import Ollama
-        from llama_index.embeddings.ollama import OllamaEmbedding
-    except ImportError:
-        print("Error: Could not import Ollama modules. Please make sure llama-index-llms-ollama and llama-index-embeddings-ollama are installed.")
-        sys.exit(1)
+    # If imported from a different directory
+    from code_review_assistant.defaults import DEFAULT_CACHE_DIR, DEFAULT_NPROBE
+
+# Import the Ollama health check
+try:
+    from ollama_client import HealthCheck, import_ollama_classes, UNAVAILABLE_POLICIES, DEFAULT_UNAVAILABLE_POLICY
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.ollama_client import (
+        HealthCheck, import_ollama_classes, UNAVAILABLE_POLICIES, DEFAULT_UNAVAILABLE_POLICY
+    )
+
+# Import the tracing helpers
+try:
+    from tracing import span, count, start_run, finish_run
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.tracing import span, count, start_run, finish_run
+
+# Import the shared file reader and ignore rules
+try:
+    from file_loader import IgnoreMatcher, read_source_file, DEFAULT_MAX_FILE_SIZE
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.file_loader import IgnoreMatcher, read_source_file, DEFAULT_MAX_FILE_SIZE
+
+# Number of files reviewed concurrently in batch mode
+DEFAULT_REVIEW_JOBS = 2
+# How project context is built: "retrieve" packs the retrieved code into the
+# review prompt, "synthesize" asks the LLM to summarise it first (one extra generation)
+CONTEXT_MODES = ["retrieve", "synthesize"]
+DEFAULT_CONTEXT_MODE = "retrieve"
+DEFAULT_CONTEXT_TOP_K = 5
+DEFAULT_CONTEXT_TOKENS = 2048
+# Severities counted per reviewed file in the batch summary
+SEVERITIES = ["critical", "high", "medium", "warning"]
 
 def load_file_content(file_path: str) -> str:
     """
     Load the content of a file.
 
+    The file is read once and decoded as UTF-8, falling back to Latin-1.
+
     Args:
         file_path: Path to the file to load
 
     Returns:
         The content of the file
+
+    Raises:
+        OSError: If the file cannot be read
+        ValueError: If the file is binary
+    """
+    source = read_source_file(file_path)
+    if source.error:
+        raise OSError(f"Could not read '{file_path}': {source.error}")
+    if source.skipped:
+        raise ValueError(f"Cannot review '{file_path}': {source.skipped}")
+    return source.text
+
+class ReviewSession:
+    """Models, index and static-analysis results shared by the reviews of one run
+
+    The Ollama models and the index are loaded once, so reviewing many files
+    costs one setup instead of one per file. The CakePHP analysis is scoped to
+    each reviewed file and its MVC counterparts; files shared between reviews
+    are analyzed once and then served from the analysis result cache.
     """
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except UnicodeDecodeError:
-        # Try Latin-1 if UTF-8 decoding fails
-        with open(file_path, 'r', encoding='latin-1') as f:
-            return f.read()
 
-def review_code(
+    def __init__(
+        self,
+        index_dir: str = "./data",
+        model_name: str = "codellama:latest",
+        embedding_model_name: str = "codellama:latest",
+        temperature: float = 0.1,
+        base_url: str = "http://127.0.0.1:11434",
+        request_timeout: float = 60.0,
+        embedding_cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        nprobe: int = DEFAULT_NPROBE,
+        context_mode: str = DEFAULT_CONTEXT_MODE,
+        context_top_k: int = DEFAULT_CONTEXT_TOP_K,
+        context_tokens: int = DEFAULT_CONTEXT_TOKENS,
+        analysis_cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        on_unavailable: str = DEFAULT_UNAVAILABLE_POLICY,
+    ):
+        """Set up the models and load the index
+
+        Args:
+            index_dir: Directory where the index is stored
+            model_name: Ollama model name to use
+            embedding_model_name: Ollama model name to use for embeddings
+            temperature: Temperature parameter for generation
+            base_url: Base URL for Ollama API
+            request_timeout: Timeout for API requests in seconds
+            embedding_cache_dir: Directory of the shared embedding cache, or None to disable it
+            nprobe: Number of ANN inverted lists scanned per query (0 for exact search)
+            context_mode: "retrieve" to pack retrieved code into the prompt, or
+                "synthesize" to have the LLM summarise it first
+            context_top_k: Number of nodes retrieved for the project context
+            context_tokens: Token budget of the retrieved project context
+            analysis_cache_dir: Directory of the CakePHP analysis result cache, or None to disable it
+            on_unavailable: "fail" to exit if the Ollama server cannot be reached,
+                or "continue" to go on anyway
+        """
+        if context_mode not in CONTEXT_MODES:
+            raise ValueError(f"Unknown context mode '{context_mode}'. Choose from: {', '.join(CONTEXT_MODES)}")
+
+        self.context_mode = context_mode
+        self.context_top_k = context_top_k
+        self.context_tokens = context_tokens
+
+        print(f"Using Ollama API at: {base_url}")
+        print(f"Request timeout: {request_timeout} seconds")
+
+        # Test connection to Ollama server while llama_index and the index are loaded
+        health_check = HealthCheck(base_url)
+
+        from llama_index.core import Settings
+        try:
+            from embedding_pipeline import with_embedding_cache
+            from index_storage import load_code_index
+        except ImportError:
+            # If imported from a different directory
+            from code_review_assistant.embedding_pipeline import with_embedding_cache
+            from code_review_assistant.index_storage import load_code_index
+        Ollama, OllamaEmbedding = import_ollama_classes()
+
+        # Set up Ollama model
+        self.llm = Ollama(
+            model=model_name,
+            base_url=base_url,
+            request_timeout=request_timeout,
+            temperature=temperature,
+        )
+
+        # Update global settings
+        Settings.llm = self.llm
+
+        self.embed_model = None
+        self.index = None
+
+        # Check if index directory exists
+        if not os.path.exists(index_dir):
+            print(f"Warning: Index directory '{index_dir}' not found.")
+            print("Proceeding with code review without project knowledge.")
+        else:
+            try:
+                # Set up embedding model
+                embed_model = OllamaEmbedding(
+                    model_name=embedding_model_name,
+                    base_url=base_url,
+                    request_timeout=request_timeout
+                )
+                self.embed_model = with_embedding_cache(embed_model, embedding_cache_dir)
+                Settings.embed_model = self.embed_model
+
+                # Load index
+                with span("index_load"):
+                    self.index = load_code_index(index_dir, nprobe)
+            except Exception as e:
+                print(f"Warning: Failed to load index: {e}")
+                print("Proceeding with code review without project knowledge.")
+
+        self.analysis_cache_dir = analysis_cache_dir
+        health_check.wait(on_unavailable)
+
+    def report_embedding_cache(self) -> None:
+        """Print the hit rate of the embedding cache, if the index was loaded"""
+        try:
+            from embedding_pipeline import report_embedding_cache
+        except ImportError:
+            # If imported from a different directory
+            from code_review_assistant.embedding_pipeline import report_embedding_cache
+        report_embedding_cache(self.embed_model)
+
+    def get_project_context(self, file_path: str) -> Optional[str]:
+        """Retrieve project knowledge related to a file from the index
+
+        Args:
+            file_path: Path to the file being reviewed
+
+        Returns:
+            The project context, or None if there is no index or retrieval failed
+        """
+        if self.index is None:
+            return None
+
+        context_query = f"Please provide specifications and design information related to this file: {file_path}"
+
+        try:
+            if self.context_mode == "retrieve":
+                retriever = self.index.as_retriever(similarity_top_k=self.context_top_k)
+                with span("retrieve"):
+                    nodes = retriever.retrieve(context_query)
+                with span("pack_context"):
+                    return pack_context_nodes(nodes, file_path, self.context_tokens)
+
+            # Query engines are cheap to create; one per review keeps reviews independent
+            query_engine = self.index.as_query_engine(
+                similarity_top_k=3,
+                response_mode="compact",
+            )
+
+            # Get project knowledge
+            with span("synthesize_context"):
+                context_response = query_engine.query(context_query)
+            return context_response.response
+        except Exception as e:
+            print(f"Warning: Failed to retrieve context from index: {e}")
+            print("Proceeding with code review without project knowledge.")
+            return None
+
+    def analyze_cakephp_file(self, project_root: str, file_path: str) -> Optional[Dict[str, Any]]:
+        """Run the CakePHP analysis of a file and its MVC counterparts
+
+        Args:
+            project_root: Root directory of the CakePHP project
+            file_path: Path to the file being reviewed
+
+        Returns:
+            Analysis results as returned by analyze_cakephp
+        """
+        with span("cakephp_analysis"):
+            return analyze_cakephp(
+                project_root, output_format=None, cache_dir=self.analysis_cache_dir, target_file=file_path
+            )
+
+def pack_context_nodes(nodes: List[Any], file_path: str, max_tokens: int) -> Optional[str]:
+    """Pack retrieved nodes into project context text under a token budget
+
+    Nodes are added in relevance order, each with the path of its file. Chunks
+    of the reviewed file itself are skipped since its code is already in the
+    prompt. The node that crosses the budget is truncated and the rest dropped.
+
+    Args:
+        nodes: Retrieved nodes with scores, most relevant first
+        file_path: Path to the file being reviewed
+        max_tokens: Token budget of the packed context
+
+    Returns:
+        The packed context, or None if no node fits
+    """
+    from llama_index.core.utils import get_tokenizer
+
+    tokenizer = get_tokenizer()
+    target = os.path.abspath(file_path)
+    sections = []
+    remaining = max_tokens
+
+    for node_with_score in nodes:
+        node = node_with_score.node
+        source_path = node.metadata.get("file_path", "unknown")
+        if source_path != "unknown" and os.path.abspath(source_path) == target:
+            continue
+
+        header = f"File: {source_path}"
+        if node.metadata.get("start_line"):
+            header += f" (lines {node.metadata['start_line']}-{node.metadata['end_line']})"
+        header += "\n"
+        text = node.get_content()
+        section_tokens = len(tokenizer(header + text))
+        if section_tokens > remaining:
+            # Keep the share of the text that fits, estimated from its token density
+            keep_chars = int(len(text) * (remaining - len(tokenizer(header))) / max(1, section_tokens))
+            if keep_chars > 0:
+                sections.append(header + text[:keep_chars] + "\n...")
+            break
+
+        sections.append(header + text)
+        remaining -= section_tokens
+
+    if not sections:
+        return None
+    return "\n\n".join(sections)
+
+def is_cakephp_candidate(file_path: str) -> bool:
+    """Return whether a file should get the CakePHP-specific analysis
+
+    Args:
+        file_path: Path to the file being reviewed
+
+    Returns:
+        True if the file looks like part of a CakePHP project
+    """
+    file_extension = os.path.splitext(file_path)[1]
+    return file_extension in ['.php', '.ctp'] or '/cakephp' in file_path.lower() or '/cake' in file_path.lower()
+
+def find_cakephp_project_root(file_path: str) -> str:
+    """Find the root directory of the CakePHP project containing a file
+
+    Args:
+        file_path: Path to the file being reviewed
+
+    Returns:
+        The nearest parent directory with a CakePHP structure, or the file's directory
+    """
+    project_root = file_path
+    cakephp_markers = ['app/Controller', 'app/Model', 'app/View', 'app/Config', 'lib/Cake']
+
+    while os.path.dirname(project_root) != project_root:  # Stop at filesystem root
+        project_root = os.path.dirname(project_root)
+        # Check if this directory has CakePHP structure
+        if any(os.path.exists(os.path.join(project_root, marker)) for marker in cakephp_markers):
+            break
+
+    if project_root == os.path.dirname(project_root):  # If we reached filesystem root
+        project_root = os.path.dirname(file_path)  # Default to the file's directory
+
+    return project_root
+
+def format_cakephp_issues_for_prompt(cakephp_issues: Dict[str, Any]) -> str:
+    """Format CakePHP analysis results for the review prompt
+
+    Args:
+        cakephp_issues: Analysis results as returned by analyze_cakephp
+
+    Returns:
+        The issues as prompt text
+    """
+    cake_issues_str = []
+
+    if cakephp_issues["critical"]:
+        cake_issues_str.append("CRITICAL ISSUES:")
+        for issue in cakephp_issues["critical"]:
+            issue_str = f"[{issue['type']}] {issue['file']}"
+            if "line" in issue:
+                issue_str += f":{issue['line']}"
+            issue_str += f" - {issue['message']}"
+            cake_issues_str.append(issue_str)
+
+    if cakephp_issues["high"]:
+        cake_issues_str.append("\nHIGH SEVERITY ISSUES:")
+        for issue in cakephp_issues["high"]:
+            issue_str = f"[{issue['type']}] {issue['file']}"
+            if "line" in issue:
+                issue_str += f":{issue['line']}"
+            issue_str += f" - {issue['message']}"
+            cake_issues_str.append(issue_str)
+
+    # Add medium and warning issues
+    for severity in ["medium", "warning"]:
+        if cakephp_issues[severity]:
+            cake_issues_str.append(f"\n{severity.upper()} ISSUES:")
+            for issue in cakephp_issues[severity]:
+                issue_str = f"[{issue['type']}] {issue['file']}"
+                if "line" in issue:
+                    issue_str += f":{issue['line']}"
+                issue_str += f" - {issue['message']}"
+                cake_issues_str.append(issue_str)
+
+    return "\n".join(cake_issues_str)
+
+def count_file_issues(cakephp_issues: Optional[Dict[str, Any]], file_path: str, project_root: str) -> Dict[str, int]:
+    """Count the CakePHP issues reported for one file, by severity
+
+    Args:
+        cakephp_issues: Analysis results of the file's project
+        file_path: Path to the reviewed file
+        project_root: Root directory the analysis ran on
+
+    Returns:
+        Dictionary of severity to issue count
+    """
+    counts = {severity: 0 for severity in SEVERITIES}
+    if not cakephp_issues:
+        return counts
+
+    target = os.path.abspath(file_path)
+    for severity in SEVERITIES:
+        for issue in cakephp_issues[severity]:
+            if os.path.abspath(os.path.join(project_root, issue["file"])) == target:
+                counts[severity] += 1
+    return counts
+
+def review_file(
     file_path: str,
-    index_dir: str = "./data",
-    model_name: str = "codellama:latest",
-    embedding_model_name: str = "codellama:latest",
-    temperature: float = 0.1,
-    base_url: str = "http://127.0.0.1:11434",
-    request_timeout: float = 60.0,
-    output_file: Optional[str] = None,
-) -> None:
+    session: ReviewSession,
+    output_stream: TextIO,
+    stream: bool = False,
+) -> Dict[str, Any]:
     """
-    Perform a code review on the specified file.
+    Review one file with a loaded session and write the results.
 
     Args:
         file_path: Path to the file to review
-        index_dir: Directory where the index is stored
-        model_name: Ollama model name to use
-        embedding_model_name: Ollama model name to use for embeddings
-        temperature: Temperature parameter for generation
-        base_url: Base URL for Ollama API
-        request_timeout: Timeout for API requests in seconds
-        output_file: Optional path to save the review results
+        session: Loaded review session
+        output_stream: The output stream to write the results to (file or stdout)
+        stream: Print the review tokens as they are generated and write them
+            to the output stream incrementally
+
+    Returns:
+        Dictionary with the file path, its CakePHP issue counts and the elapsed time
     """
-    # Check if file exists
     if not os.path.exists(file_path):
-        print(f"Error: File '{file_path}' not found.")
-        sys.exit(1)
+        raise FileNotFoundError(f"File '{file_path}' not found.")
 
-    # Check if index directory exists
-    if not os.path.exists(index_dir):
-        print(f"Warning: Index directory '{index_dir}' not found.")
-        print("Proceeding with code review without project knowledge.")
-        has_index = False
-    else:
-        has_index = True
-
-    print(f"Using Ollama API at: {base_url}")
-    print(f"Request timeout: {request_timeout} seconds")
-
-    # Test connection to Ollama server
-    try:
-        import requests
-        version_response = requests.get(f"{base_url}/api/version", timeout=10)
-        if version_response.status_code == 200:
-            version_info = version_response.json()
-            print(f"Connected to Ollama server version: {version_info.get('version', 'unknown')}")
-        else:
-            print(f"Warning: Could not get Ollama server version. Status code: {version_response.status_code}")
-            print("Attempting to continue anyway...")
-    except Exception as e:
-        print(f"Warning: Could not connect to Ollama server at {base_url}: {e}")
-        print("Please make sure Ollama is running and accessible.")
-        user_input = input("Do you want to continue anyway? (y/n): ")
-        if user_input.lower() != 'y':
-            sys.exit(1)
+    start_time = time.time()
+    llm = session.llm
 
     # Load file content
-    code_content = load_file_content(file_path)
+    with span("load_file"):
+        code_content = load_file_content(file_path)
     file_extension = os.path.splitext(file_path)[1]
 
-    # Set up Ollama model
-    llm = Ollama(
-        model=model_name,
-        base_url=base_url,
-        request_timeout=request_timeout,
-        temperature=temperature,
-    )
-
-    # Update global settings
-    Settings.llm = llm
-
     # Create review prompt
     review_prompt = f"""
 As an experienced senior engineer, please review the following code.
@@ -144,162 +463,433 @@ Please provide a detailed code review in English.
 """
 
     # Utilize project knowledge if index exists
-    if has_index:
-        try:
-            # Set up embedding model
-            embed_model = OllamaEmbedding(
-                model_name=embedding_model_name,
-                base_url=base_url,
-                request_timeout=request_timeout
-            )
-            Settings.embed_model = embed_model
-
-            # Load index
-            storage_context = StorageContext.from_defaults(persist_dir=index_dir)
-            index = load_index_from_storage(storage_context)
-
-            # Create query engine
-            query_engine = index.as_query_engine(
-                similarity_top_k=3,
-                response_mode="compact",
-            )
-
-            # Get project knowledge
-            context_query = f"Please provide specifications and design information related to this file: {file_path}"
-            context_response = query_engine.query(context_query)
-
-            # Add additional context to prompt
-            review_prompt += f"""
+    project_context = session.get_project_context(file_path)
+    if project_context is not None:
+        # Add additional context to prompt
+        review_prompt += f"""
 Additional project context:
-{context_response.response}
+{project_context}
 
 Please consider the above project context in your code review.
 """
-        except Exception as e:
-            print(f"Warning: Failed to retrieve context from index: {e}")
-            print("Proceeding with code review without project knowledge.")
 
     print(f"Performing code review for file '{file_path}'...")
 
-    # Execute review
-    review_response = llm.complete(review_prompt)
-
     # Check if it's a CakePHP file and analyze with CakePHP analyzer
     cakephp_issues = None
-    if analyze_cakephp and (file_extension in ['.php', '.ctp'] or '/cakephp' in file_path.lower() or '/cake' in file_path.lower()):
+    project_root = None
+    if analyze_cakephp and is_cakephp_candidate(file_path):
         print("Detected potential CakePHP file. Running CakePHP-specific analysis...")
 
         # Try to find the CakePHP project root
-        project_root = file_path
-        cakephp_markers = ['app/Controller', 'app/Model', 'app/View', 'app/Config', 'lib/Cake']
-
-        while os.path.dirname(project_root) != project_root:  # Stop at filesystem root
-            project_root = os.path.dirname(project_root)
-            # Check if this directory has CakePHP structure
-            if any(os.path.exists(os.path.join(project_root, marker)) for marker in cakephp_markers):
-                break
-
-        if project_root == os.path.dirname(project_root):  # If we reached filesystem root
-            project_root = os.path.dirname(file_path)  # Default to the file's directory
-
+        project_root = find_cakephp_project_root(file_path)
         print(f"Using CakePHP project root: {project_root}")
 
         try:
-            cakephp_issues = analyze_cakephp(project_root, output_format=None)
+            cakephp_issues = session.analyze_cakephp_file(project_root, file_path)
 
             # Add CakePHP issues to prompt
             if cakephp_issues and cakephp_issues["total_issues"] > 0:
-                cake_issues_str = []
-
-                if cakephp_issues["critical"]:
-                    cake_issues_str.append("CRITICAL ISSUES:")
-                    for issue in cakephp_issues["critical"]:
-                        issue_str = f"[{issue['type']}] {issue['file']}"
-                        if "line" in issue:
-                            issue_str += f":{issue['line']}"
-                        issue_str += f" - {issue['message']}"
-                        cake_issues_str.append(issue_str)
-
-                if cakephp_issues["high"]:
-                    cake_issues_str.append("\nHIGH SEVERITY ISSUES:")
-                    for issue in cakephp_issues["high"]:
-                        issue_str = f"[{issue['type']}] {issue['file']}"
-                        if "line" in issue:
-                            issue_str += f":{issue['line']}"
-                        issue_str += f" - {issue['message']}"
-                        cake_issues_str.append(issue_str)
-
-                # Add medium and warning issues
-                for severity in ["medium", "warning"]:
-                    if cakephp_issues[severity]:
-                        cake_issues_str.append(f"\n{severity.upper()} ISSUES:")
-                        for issue in cakephp_issues[severity]:
-                            issue_str = f"[{issue['type']}] {issue['file']}"
-                            if "line" in issue:
-                                issue_str += f":{issue['line']}"
-                            issue_str += f" - {issue['message']}"
-                            cake_issues_str.append(issue_str)
-
-                # Add to review prompt
                 review_prompt += "\n\nCakePHP Specific Analysis Results:\n"
-                review_prompt += "\n".join(cake_issues_str)
+                review_prompt += format_cakephp_issues_for_prompt(cakephp_issues)
                 review_prompt += "\n\nPlease address these CakePHP specific issues in your review."
         except Exception as e:
             print(f"Error during CakePHP analysis: {e}")
             print("Continuing with standard code review...")
 
-    # Execute review
-    review_response = llm.complete(review_prompt)
+    count("prompt_chars", len(review_prompt))
+
+    # Execute review (when streaming, the review is generated while it is written)
+    review_response = None
+    if not stream:
+        with span("generate"):
+            review_response = llm.complete(review_prompt)
+
+    # Display results
+    print_output(output_stream, "\n" + "=" * 80)
+    print_output(output_stream, f"【Code Review Results: {file_path}】")
+    print_output(output_stream, "=" * 80)
+
+    # Display CakePHP-specific issues if available
+    if cakephp_issues and cakephp_issues["total_issues"] > 0:
+        print_output(output_stream, "CakePHP Specific Issues:")
+        print_output(output_stream, "-" * 40)
+        print_output(output_stream, f"Total issues found: {cakephp_issues['total_issues']}")
+
+        if cakephp_issues["critical"]:
+            print_output(output_stream, "\nCRITICAL ISSUES:")
+            for issue in cakephp_issues["critical"]:
+                file_info = issue["file"]
+                if "line" in issue:
+                    file_info += f":{issue['line']}"
+                print_output(output_stream, f"[{issue['type']}] {file_info}")
+                print_output(output_stream, f"  {issue['message']}")
+
+        if cakephp_issues["high"]:
+            print_output(output_stream, "\nHIGH SEVERITY ISSUES:")
+            for issue in cakephp_issues["high"]:
+                file_info = issue["file"]
+                if "line" in issue:
+                    file_info += f":{issue['line']}"
+                print_output(output_stream, f"[{issue['type']}] {file_info}")
+                print_output(output_stream, f"  {issue['message']}")
+
+        # Add medium and warning issues summary
+        for severity in ["medium", "warning"]:
+            if cakephp_issues[severity]:
+                print_output(output_stream, f"\n{severity.upper()} ISSUES: {len(cakephp_issues[severity])}")
+
+        print_output(output_stream, "\n" + "-" * 40)
+
+    print_output(output_stream, "\nGeneral Code Review:")
+    if stream:
+        with span("generate"):
+            first_token_seconds, total_seconds = stream_completion(llm, review_prompt, output_stream)
+    else:
+        print_output(output_stream, review_response.text)
+    print_output(output_stream, "=" * 80)
+
+    if stream:
+        print(f"Time to first token: {first_token_seconds:.2f} seconds, total: {total_seconds:.1f} seconds.")
+
+    return {
+        "file_path": file_path,
+        "issues": count_file_issues(cakephp_issues, file_path, project_root),
+        "elapsed_seconds": time.time() - start_time,
+    }
+
+def review_code(
+    file_path: str,
+    index_dir: str = "./data",
+    model_name: str = "codellama:latest",
+    embedding_model_name: str = "codellama:latest",
+    temperature: float = 0.1,
+    base_url: str = "http://127.0.0.1:11434",
+    request_timeout: float = 60.0,
+    output_file: Optional[str] = None,
+    embedding_cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    nprobe: int = DEFAULT_NPROBE,
+    context_mode: str = DEFAULT_CONTEXT_MODE,
+    context_tokens: int = DEFAULT_CONTEXT_TOKENS,
+    stream: bool = False,
+    analysis_cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    on_unavailable: str = DEFAULT_UNAVAILABLE_POLICY,
+) -> None:
+    """
+    Perform a code review on the specified file.
+
+    Args:
+        file_path: Path to the file to review
+        index_dir: Directory where the index is stored
+        model_name: Ollama model name to use
+        embedding_model_name: Ollama model name to use for embeddings
+        temperature: Temperature parameter for generation
+        base_url: Base URL for Ollama API
+        request_timeout: Timeout for API requests in seconds
+        output_file: Optional path to save the review results
+        embedding_cache_dir: Directory of the shared embedding cache, or None to disable it
+        nprobe: Number of ANN inverted lists scanned per query (0 for exact search)
+        context_mode: "retrieve" to pack retrieved code into the prompt, or
+            "synthesize" to have the LLM summarise it first
+        context_tokens: Token budget of the retrieved project context
+        stream: Print the review tokens as they are generated and write them
+            to the output file incrementally
+        analysis_cache_dir: Directory of the CakePHP analysis result cache, or None to disable it
+        on_unavailable: "fail" to exit if the Ollama server cannot be reached,
+            or "continue" to go on anyway
+    """
+    # Check if file exists
+    if not os.path.exists(file_path):
+        print(f"Error: File '{file_path}' not found.")
+        sys.exit(1)
+
+    session = ReviewSession(
+        index_dir,
+        model_name,
+        embedding_model_name,
+        temperature=temperature,
+        base_url=base_url,
+        request_timeout=request_timeout,
+        embedding_cache_dir=embedding_cache_dir,
+        nprobe=nprobe,
+        context_mode=context_mode,
+        context_tokens=context_tokens,
+        analysis_cache_dir=analysis_cache_dir,
+        on_unavailable=on_unavailable,
+    )
 
     # Open output file if specified
     output_stream = open(output_file, 'w', encoding='utf-8') if output_file else sys.stdout
 
     try:
-        # Display results
-        print_output(output_stream, "\n" + "=" * 80)
-        print_output(output_stream, f"【Code Review Results: {file_path}】")
-        print_output(output_stream, "=" * 80)
-
-        # Display CakePHP-specific issues if available
-        if cakephp_issues and cakephp_issues["total_issues"] > 0:
-            print_output(output_stream, "CakePHP Specific Issues:")
-            print_output(output_stream, "-" * 40)
-            print_output(output_stream, f"Total issues found: {cakephp_issues['total_issues']}")
-
-            if cakephp_issues["critical"]:
-                print_output(output_stream, "\nCRITICAL ISSUES:")
-                for issue in cakephp_issues["critical"]:
-                    file_info = issue["file"]
-                    if "line" in issue:
-                        file_info += f":{issue['line']}"
-                    print_output(output_stream, f"[{issue['type']}] {file_info}")
-                    print_output(output_stream, f"  {issue['message']}")
-
-            if cakephp_issues["high"]:
-                print_output(output_stream, "\nHIGH SEVERITY ISSUES:")
-                for issue in cakephp_issues["high"]:
-                    file_info = issue["file"]
-                    if "line" in issue:
-                        file_info += f":{issue['line']}"
-                    print_output(output_stream, f"[{issue['type']}] {file_info}")
-                    print_output(output_stream, f"  {issue['message']}")
-
-            # Add medium and warning issues summary
-            for severity in ["medium", "warning"]:
-                if cakephp_issues[severity]:
-                    print_output(output_stream, f"\n{severity.upper()} ISSUES: {len(cakephp_issues[severity])}")
-
-            print_output(output_stream, "\n" + "-" * 40)
-
-        print_output(output_stream, "\nGeneral Code Review:")
-        print_output(output_stream, review_response.text)
-        print_output(output_stream, "=" * 80)
+        review_file(file_path, session, output_stream, stream)
     finally:
         # Close file if it was opened
         if output_file and output_stream != sys.stdout:
             output_stream.close()
             print(f"Review results saved to: {output_file}")
 
+    if session.embed_model is not None:
+        session.report_embedding_cache()
+
+def expand_review_paths(
+    patterns: List[str],
+    ignore: bool = True,
+    max_size: Optional[int] = DEFAULT_MAX_FILE_SIZE,
+) -> List[str]:
+    """Expand file paths and glob patterns into the list of files to review
+
+    Glob matches under the current directory that are ignored (vendor, tmp and
+    minified files, and the paths listed in .gitignore/.reviewignore files)
+    or larger than the size cap are dropped; plain paths are always kept.
+
+    Args:
+        patterns: File paths or glob patterns (`**` matches subdirectories)
+        ignore: Drop ignored glob matches
+        max_size: Drop glob matches larger than this many bytes (no limit if None)
+
+    Returns:
+        Matching files in the given order, without duplicates
+    """
+    matcher = IgnoreMatcher(os.getcwd()) if ignore else None
+    file_paths = []
+    seen = set()
+    skipped = 0
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = []
+            for path in sorted(glob.glob(pattern, recursive=True)):
+                if not os.path.isfile(path):
+                    continue
+                if (matcher and matcher.is_ignored(path)) or (max_size is not None and os.path.getsize(path) > max_size):
+                    skipped += 1
+                    continue
+                matches.append(path)
+        else:
+            # Plain paths are kept so a missing file is reported by its review
+            matches = [pattern]
+        if not matches:
+            print(f"Warning: No files match '{pattern}'.")
+        for path in matches:
+            key = os.path.abspath(path)
+            if key not in seen:
+                seen.add(key)
+                file_paths.append(path)
+    if skipped:
+        print(f"Skipped {skipped} ignored or oversized files matched by the patterns (use --no-ignore and --max-file-kb to include them).")
+    return file_paths
+
+def make_log_file_path(log_dir: str, file_path: str, timestamp: str, used: Optional[set] = None) -> str:
+    """Build the log file path for the review of a file
+
+    Args:
+        log_dir: Directory to save log files
+        file_path: Path to the reviewed file
+        timestamp: Timestamp of the review run
+        used: Log file paths already assigned in this run, to keep names unique
+
+    Returns:
+        Path of the log file
+    """
+    filename = os.path.basename(file_path)
+    output_file = str(Path(log_dir) / f"review_{filename}_{timestamp}.txt")
+    if used is not None:
+        # Files with the same name in different directories get a numbered suffix
+        counter = 2
+        while output_file in used:
+            output_file = str(Path(log_dir) / f"review_{filename}_{timestamp}_{counter}.txt")
+            counter += 1
+        used.add(output_file)
+    return output_file
+
+def format_review_summary(results: List[Dict[str, Any]], total_seconds: float) -> str:
+    """Format the aggregate summary of a batch review
+
+    Args:
+        results: Per-file results in review order
+        total_seconds: Wall-clock time of the whole batch
+
+    Returns:
+        Formatted summary text
+    """
+    output = []
+    output.append("=" * 80)
+    output.append("Batch Review Summary")
+    output.append("=" * 80)
+
+    for result in results:
+        if result["status"] == "ok":
+            counts = result["issues"]
+            issues = ", ".join(f"{severity} {counts[severity]}" for severity in SEVERITIES)
+            output.append(f"[ok] {result['file_path']} ({result['elapsed_seconds']:.1f}s) CakePHP issues: {issues}")
+        else:
+            output.append(f"[error] {result['file_path']}: {result['error']}")
+        if result.get("output_file"):
+            output.append(f"  Log: {result['output_file']}")
+
+    reviewed = sum(1 for result in results if result["status"] == "ok")
+    failed = len(results) - reviewed
+    output.append("-" * 80)
+    output.append(f"Files reviewed: {reviewed}, failed: {failed}, total time: {total_seconds:.1f} seconds.")
+    for severity in SEVERITIES:
+        total = sum(result["issues"][severity] for result in results if result["status"] == "ok")
+        output.append(f"{severity.upper()} issues in reviewed files: {total}")
+    output.append("=" * 80)
+    return "\n".join(output)
+
+def review_files(
+    file_paths: List[str],
+    index_dir: str = "./data",
+    model_name: str = "codellama:latest",
+    embedding_model_name: str = "codellama:latest",
+    temperature: float = 0.1,
+    base_url: str = "http://127.0.0.1:11434",
+    request_timeout: float = 60.0,
+    log_dir: Optional[str] = None,
+    embedding_cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    nprobe: int = DEFAULT_NPROBE,
+    context_mode: str = DEFAULT_CONTEXT_MODE,
+    context_tokens: int = DEFAULT_CONTEXT_TOKENS,
+    jobs: int = DEFAULT_REVIEW_JOBS,
+    stream: bool = False,
+    analysis_cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    on_unavailable: str = DEFAULT_UNAVAILABLE_POLICY,
+) -> List[Dict[str, Any]]:
+    """
+    Review many files with one shared session and a bounded worker pool.
+
+    The index, the models and the CakePHP analysis are loaded once. Each review
+    is written to its own log file in `log_dir`, or printed as a whole when it
+    completes, and an aggregate summary is printed (and saved to `log_dir`).
+
+    Args:
+        file_paths: Paths to the files to review
+        index_dir: Directory where the index is stored
+        model_name: Ollama model name to use
+        embedding_model_name: Ollama model name to use for embeddings
+        temperature: Temperature parameter for generation
+        base_url: Base URL for Ollama API
+        request_timeout: Timeout for API requests in seconds
+        log_dir: Directory to save the per-file logs and the summary
+        embedding_cache_dir: Directory of the shared embedding cache, or None to disable it
+        nprobe: Number of ANN inverted lists scanned per query (0 for exact search)
+        context_mode: "retrieve" to pack retrieved code into the prompt, or
+            "synthesize" to have the LLM summarise it first
+        context_tokens: Token budget of the retrieved project context
+        jobs: Number of files reviewed concurrently
+        stream: Print the review tokens as they are generated (only with one job)
+        analysis_cache_dir: Directory of the CakePHP analysis result cache, or None to disable it
+        on_unavailable: "fail" to exit if the Ollama server cannot be reached,
+            or "continue" to go on anyway
+
+    Returns:
+        Per-file results in the order of `file_paths`
+    """
+    jobs = max(1, jobs)
+    if stream and jobs > 1:
+        print("Note: --stream requires --jobs 1; reviews are printed as they complete.")
+        stream = False
+
+    session = ReviewSession(
+        index_dir,
+        model_name,
+        embedding_model_name,
+        temperature=temperature,
+        base_url=base_url,
+        request_timeout=request_timeout,
+        embedding_cache_dir=embedding_cache_dir,
+        nprobe=nprobe,
+        context_mode=context_mode,
+        context_tokens=context_tokens,
+        analysis_cache_dir=analysis_cache_dir,
+        on_unavailable=on_unavailable,
+    )
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    used_log_files = set()
+    if log_dir:
+        Path(log_dir).mkdir(parents=True, exist_ok=True)
+
+    print(f"Reviewing {len(file_paths)} files with {jobs} workers...")
+    print_lock = threading.Lock()
+    start_time = time.time()
+
+    def run_review(file_path: str, output_file: Optional[str]) -> Dict[str, Any]:
+        try:
+            if not os.path.isfile(file_path):
+                raise FileNotFoundError(f"File '{file_path}' not found.")
+            if output_file:
+                with open(output_file, 'w', encoding='utf-8') as output_stream:
+                    result = review_file(file_path, session, output_stream, stream)
+                print(f"Review results saved to: {output_file}")
+            elif stream:
+                result = review_file(file_path, session, sys.stdout, stream)
+            else:
+                # Buffer the review so concurrent reviews are not interleaved
+                buffer = io.StringIO()
+                result = review_file(file_path, session, buffer, stream)
+                with print_lock:
+                    print(buffer.getvalue(), end="", flush=True)
+            result["status"] = "ok"
+        except Exception as e:
+            print(f"Error reviewing '{file_path}': {e}")
+            result = {"file_path": file_path, "status": "error", "error": str(e)}
+        result["output_file"] = output_file if output_file and os.path.exists(output_file) else None
+        return result
+
+    output_files = [
+        make_log_file_path(log_dir, file_path, timestamp, used_log_files) if log_dir else None
+        for file_path in file_paths
+    ]
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = list(executor.map(run_review, file_paths, output_files))
+
+    summary = format_review_summary(results, time.time() - start_time)
+    print("\n" + summary)
+    if log_dir:
+        summary_file = str(Path(log_dir) / f"review_summary_{timestamp}.txt")
+        with open(summary_file, 'w', encoding='utf-8') as f:
+            f.write(summary + "\n")
+        print(f"Summary saved to: {summary_file}")
+
+    if session.embed_model is not None:
+        session.report_embedding_cache()
+
+    return results
+
+def stream_completion(llm: "Ollama", prompt: str, output_stream: TextIO) -> Tuple[float, float]:
+    """Stream a completion to the output stream as tokens arrive.
+
+    When the output stream is a file, the tokens are also echoed to the
+    terminal and the file is flushed after every token.
+
+    Args:
+        llm: The LLM to generate with
+        prompt: The prompt to complete
+        output_stream: The output stream to write to (file or stdout)
+
+    Returns:
+        Tuple of (time to first token, total generation time) in seconds
+    """
+    start_time = time.time()
+    first_token_time = None
+
+    for chunk in llm.stream_complete(prompt):
+        if first_token_time is None:
+            first_token_time = time.time()
+        output_stream.write(chunk.delta or "")
+        output_stream.flush()
+        if output_stream is not sys.stdout:
+            sys.stdout.write(chunk.delta or "")
+            sys.stdout.flush()
+
+    output_stream.write("\n")
+    if output_stream is not sys.stdout:
+        sys.stdout.write("\n")
+
+    end_time = time.time()
+    return (first_token_time or end_time) - start_time, end_time - start_time
+
 def print_output(output_stream: TextIO, message: str) -> None:
     """Print message to the specified output stream.
 
@@ -309,9 +899,9 @@ def print_output(output_stream: TextIO, message: str) -> None:
     """
     print(message, file=output_stream)
 
-def main():
-    parser = argparse.ArgumentParser(description="Code review tool using Ollama")
-    parser.add_argument("file_path", help="Path to the file to review")
+def main(argv: Optional[List[str]] = None, prog: Optional[str] = None):
+    parser = argparse.ArgumentParser(prog=prog, description="Code review tool using Ollama")
+    parser.add_argument("file_paths", nargs="+", help="Paths or glob patterns of the files to review (quote globs, e.g. 'app/**/*.php')")
     parser.add_argument("--index-dir", "-i", default="./data", help="Directory where the index is stored")
     parser.add_argument("--model", "-m", default="codellama:latest", help="Ollama model name to use")
     parser.add_argument("--embedding-model", "-e", default="codellama:latest", help="Ollama model name to use for embeddings")
@@ -320,8 +910,65 @@ def main():
     parser.add_argument("--request-timeout", "-r", type=float, default=60.0, help="Timeout for API requests in seconds")
     parser.add_argument("--output", "-o", help="Path to save the review results (defaults to terminal output)")
     parser.add_argument("--log-dir", "-l", help="Directory to save log files (auto-generates filenames)")
+    parser.add_argument("--embedding-cache-dir", default=DEFAULT_CACHE_DIR, help="Directory of the shared embedding cache")
+    parser.add_argument("--no-embedding-cache", action="store_true", help="Do not read or write the embedding cache")
+    parser.add_argument("--no-analysis-cache", action="store_true", help="Do not read or write the CakePHP analysis result cache")
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE,
+                        help="ANN lists scanned per query; higher is more accurate but slower (0 for exact search)")
+    parser.add_argument("--stream", action="store_true", help="Print the review as it is generated and report the time to first token")
+    parser.add_argument("--context-mode", choices=CONTEXT_MODES, default=DEFAULT_CONTEXT_MODE,
+                        help="How to add project context: 'retrieve' packs the retrieved code into the prompt (one generation per review), "
+                             "'synthesize' has the LLM summarise it first (default: retrieve)")
+    parser.add_argument("--context-tokens", type=int, default=DEFAULT_CONTEXT_TOKENS,
+                        help=f"Token budget of the retrieved project context (default: {DEFAULT_CONTEXT_TOKENS})")
+    parser.add_argument("--jobs", "-j", type=int, default=DEFAULT_REVIEW_JOBS,
+                        help=f"Number of files reviewed concurrently when reviewing several files (default: {DEFAULT_REVIEW_JOBS})")
+    parser.add_argument("--on-unavailable", choices=UNAVAILABLE_POLICIES, default=DEFAULT_UNAVAILABLE_POLICY,
+                        help="What to do when the Ollama server cannot be reached (default: fail)")
+    parser.add_argument("--no-ignore", action="store_true",
+                        help="Also review vendor, tmp and minified files and the paths listed in .gitignore/.reviewignore that match a glob")
+    parser.add_argument("--max-file-kb", type=int, default=DEFAULT_MAX_FILE_SIZE // 1024,
+                        help=f"Skip files larger than this many KB that match a glob, 0 for no limit (default: {DEFAULT_MAX_FILE_SIZE // 1024})")
+    parser.add_argument("--metrics-file", help="Write the timing and token metrics of the run as JSON to this file")
+
+    args = parser.parse_args(argv)
+    embedding_cache_dir = None if args.no_embedding_cache else args.embedding_cache_dir
+    analysis_cache_dir = None if args.no_analysis_cache else DEFAULT_CACHE_DIR
+
+    file_paths = expand_review_paths(args.file_paths, not args.no_ignore, args.max_file_kb * 1024 or None)
+    if not file_paths:
+        print("Error: No files to review.")
+        sys.exit(1)
+
+    start_run("code_review")
+    if len(file_paths) > 1:
+        if args.output:
+            parser.error("--output can only be used with a single file; use --log-dir for several files")
+
+        results = review_files(
+            file_paths,
+            args.index_dir,
+            args.model,
+            args.embedding_model,
+            args.temperature,
+            args.base_url,
+            args.request_timeout,
+            args.log_dir,
+            embedding_cache_dir,
+            args.nprobe,
+            args.context_mode,
+            args.context_tokens,
+            args.jobs,
+            args.stream,
+            analysis_cache_dir=analysis_cache_dir,
+            on_unavailable=args.on_unavailable,
+        )
+        finish_run(args.metrics_file)
+        if any(result["status"] != "ok" for result in results):
+            sys.exit(1)
+        return
 
-    args = parser.parse_args()
+    file_path = file_paths[0]
 
     # Determine output file path
     output_file = None
@@ -333,12 +980,11 @@ def main():
         log_dir.mkdir(parents=True, exist_ok=True)
 
         # Create filename based on the reviewed file and timestamp
-        filename = os.path.basename(args.file_path)
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = str(log_dir / f"review_{filename}_{timestamp}.txt")
+        output_file = make_log_file_path(str(log_dir), file_path, timestamp)
 
     review_code(
-        args.file_path,
+        file_path,
         args.index_dir,
         args.model,
         args.embedding_model,
@@ -346,7 +992,15 @@ def main():
         args.base_url,
         args.request_timeout,
         output_file,
+        embedding_cache_dir,
+        args.nprobe,
+        args.context_mode,
+        args.context_tokens,
+        args.stream,
+        analysis_cache_dir=analysis_cache_dir,
+        on_unavailable=args.on_unavailable,
     )
+    finish_run(args.metrics_file)
 
 if __name__ == "__main__":
     main()
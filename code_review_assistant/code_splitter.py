@@ -0,0 +1,545 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.node_parser import NodeParser, SentenceSplitter
+from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.core.utils import get_tokenizer
+
+# File types chunked on syntax boundaries; other files go to the fallback splitter
+CODE_LANGUAGES = {".php": "php", ".ctp": "ctp", ".js": "js"}
+# Version of the chunking rules; stored in the index settings so a change rebuilds the index
+SPLITTER_VERSION = 3
+DEFAULT_CHUNK_SIZE = 1024
+# A unit of closing lines (`}`, `</div>`, `endforeach;`) may overflow the budget
+# by this many tokens to stay with the code it closes
+CLOSING_OVERFLOW_TOKENS = 32
+# Line ranges help the LLM cite code but carry no meaning for the embedding
+LINE_METADATA_KEYS = ["start_line", "end_line"]
+# Symbols listed in the metadata of a chunk that packs many small units
+MAX_CHUNK_SYMBOLS = 8
+
+OPENERS = "({["
+CLOSERS = ")}]"
+HEREDOC_PATTERN = re.compile(r"<<<\s*['\"]?(\w+)['\"]?\s*$")
+# Lines that belong to the unit below them
+TRIVIA_PREFIXES = ("//", "#", "/*", "*", "<!--")
+# An opening PHP tag alone on its line also belongs to the unit below it
+OPEN_TAGS = ("<?php", "<?")
+
+# Visibility and other modifiers before a declaration
+MODIFIERS_PATTERN = re.compile(r"^(?:(?:public|protected|private|static|abstract|final)\s+)+")
+PHP_SYMBOL_PATTERNS = [
+    re.compile(r"^(?:abstract\s+|final\s+)?(?:class|interface|trait)\s+(\w+)"),
+    re.compile(r"\bfunction\s+&?\s*(\w+)\s*\("),
+]
+JS_SYMBOL_PATTERNS = [
+    re.compile(r"^(?:export\s+)?(?:default\s+)?class\s+(\w+)"),
+    re.compile(r"^(?:export\s+)?(?:async\s+)?function\s*\*?\s*(\w+)\s*\("),
+    re.compile(r"^(?:export\s+)?(?:const|let|var)\s+(\w+)\s*=\s*(?:async\s+)?(?:function\b|\([^)]*\)\s*=>|\w+\s*=>)"),
+    re.compile(r"^(?:[\w$.]+\.)?(\w+)\s*[:=]\s*(?:async\s+)?function\b"),
+    re.compile(r"^(?:static\s+|async\s+|get\s+|set\s+)*(?!(?:if|for|while|switch|catch|function|return)\b)(\w+)\s*\([^)]*\)\s*\{"),
+]
+# Control-flow blocks and block elements of CakePHP templates
+TEMPLATE_OPEN_PATTERN = re.compile(r"<\?(?:php)?\s*((?:if|foreach|for|while|switch)\s*\(.*\))\s*:")
+TEMPLATE_CLOSE_PATTERN = re.compile(r"\b(?:endif|endforeach|endfor|endwhile|endswitch)\b")
+TEMPLATE_BLOCK_TAGS = "div|form|table|thead|tbody|ul|ol|dl|section|article|header|footer|nav|aside|main|fieldset|script|style"
+TEMPLATE_TAG_OPEN_PATTERN = re.compile(r"<(" + TEMPLATE_BLOCK_TAGS + r")\b([^>]*)", re.IGNORECASE)
+TEMPLATE_TAG_CLOSE_PATTERN = re.compile(r"</(?:" + TEMPLATE_BLOCK_TAGS + r")\s*>", re.IGNORECASE)
+TEMPLATE_ID_PATTERN = re.compile(r"\b(id|class)\s*=\s*['\"]([\w-]+)")
+# What is left of a closing line once these are removed is only punctuation. A
+# call right after a closer ends an immediately invoked function: `})();`, `})(jQuery);`
+CLOSING_LINE_PATTERN = re.compile(
+    r"</(?:" + TEMPLATE_BLOCK_TAGS + r")\s*>|\b(?:endif|endforeach|endfor|endwhile|endswitch)\b|<\?(?:php)?|\?>"
+    r"|(?<=[)}])\([\w$.,\s]*\)",
+    re.IGNORECASE,
+)
+
+class CodeChunk(NamedTuple):
+    """A chunk of a source file with the symbols it covers"""
+    text: str
+    start_line: int
+    end_line: int
+    symbol: str
+
+class Unit(NamedTuple):
+    """A syntactic unit: lines `start` to `end` (0-based, inclusive)"""
+    start: int
+    end: int
+    symbol: Optional[str]
+
+def code_language(file_path: str) -> Optional[str]:
+    """Return the language chunked on syntax boundaries for a file, if any
+
+    Args:
+        file_path: Path or name of the file
+
+    Returns:
+        "php", "ctp" or "js", or None for other files
+    """
+    return CODE_LANGUAGES.get(os.path.splitext(file_path)[1].lower())
+
+def bracket_depths(lines: List[str], php: bool) -> List[int]:
+    """Return the bracket nesting depth at the end of each line
+
+    Brackets in strings, comments and heredocs are ignored. For PHP, only the
+    code between `<?php` and `?>` is scanned.
+
+    Args:
+        lines: Lines of the file
+        php: Scan as PHP (HTML outside the PHP tags) instead of JavaScript
+
+    Returns:
+        The depth after each line
+    """
+    depths = []
+    depth = 0
+    state = "html" if php else "code"
+    quote = None
+    heredoc = None
+
+    for line in lines:
+        if state == "heredoc":
+            # The closing identifier may be indented and followed by ; , or )
+            if line.strip().rstrip(";,)").strip() == heredoc:
+                state = "code"
+            depths.append(depth)
+            continue
+
+        i = 0
+        length = len(line)
+        while i < length:
+            c = line[i]
+            if state == "html":
+                j = line.find("<?", i)
+                if j < 0:
+                    break
+                state = "code"
+                i = j + 2
+            elif state == "block_comment":
+                j = line.find("*/", i)
+                if j < 0:
+                    break
+                state = "code"
+                i = j + 2
+            elif state == "string":
+                if c == "\\":
+                    i += 2
+                    continue
+                if c == quote:
+                    state = "code"
+                i += 1
+            elif c == "'" or c == '"' or (c == "`" and not php):
+                state = "string"
+                quote = c
+                i += 1
+            elif line.startswith("//", i) or (php and c == "#"):
+                # A PHP line comment ends at the closing tag
+                j = line.find("?>", i) if php else -1
+                if j < 0:
+                    break
+                state = "html"
+                i = j + 2
+            elif line.startswith("/*", i):
+                state = "block_comment"
+                i += 2
+            elif php and line.startswith("?>", i):
+                state = "html"
+                i += 2
+            elif php and line.startswith("<<<", i) and HEREDOC_PATTERN.match(line, i):
+                heredoc = HEREDOC_PATTERN.match(line, i).group(1)
+                state = "heredoc"
+                break
+            else:
+                if c in OPENERS:
+                    depth += 1
+                elif c in CLOSERS:
+                    depth = max(0, depth - 1)
+                i += 1
+
+        # Only PHP strings and JavaScript template literals span lines
+        if state == "string" and not php and quote != "`":
+            state = "code"
+        depths.append(depth)
+    return depths
+
+def template_depths(lines: List[str]) -> List[int]:
+    """Return the nesting depth at the end of each line of a CakePHP template
+
+    The depth counts brackets in the PHP code, alternative-syntax control
+    blocks (`foreach (...):` ... `endforeach;`) and HTML block elements.
+
+    Args:
+        lines: Lines of the template
+
+    Returns:
+        The depth after each line
+    """
+    depths = []
+    block_depth = 0
+    for line, code_depth in zip(lines, bracket_depths(lines, php=True)):
+        block_depth += len(TEMPLATE_OPEN_PATTERN.findall(line)) + len(TEMPLATE_TAG_OPEN_PATTERN.findall(line))
+        block_depth -= len(TEMPLATE_CLOSE_PATTERN.findall(line)) + len(TEMPLATE_TAG_CLOSE_PATTERN.findall(line))
+        block_depth = max(0, block_depth)
+        depths.append(code_depth + block_depth)
+    return depths
+
+def is_trivia(line: str) -> bool:
+    """Return True for blank and comment lines, which belong to the next unit"""
+    stripped = line.strip()
+    return not stripped or stripped.startswith(TRIVIA_PREFIXES) or stripped in OPEN_TAGS
+
+def is_closing(line: str) -> bool:
+    """Return True for lines that only close blocks, such as `});`, `})();` or `<?php endforeach; ?>`"""
+    return not CLOSING_LINE_PATTERN.sub("", line).strip(CLOSERS + ";, \t")
+
+def find_symbol(lines: List[str], unit_start: int, unit_end: int, language: str) -> Optional[str]:
+    """Return the name of the class, function or template block a unit declares
+
+    Args:
+        lines: Lines of the file
+        unit_start: First line of the unit
+        unit_end: Last line of the unit
+        language: "php", "ctp" or "js"
+
+    Returns:
+        The symbol name, or None for other statements
+    """
+    for index in range(unit_start, unit_end + 1):
+        if is_trivia(lines[index]):
+            continue
+        line = lines[index].strip()
+        if language == "ctp":
+            match = TEMPLATE_OPEN_PATTERN.search(line)
+            if match:
+                return match.group(1)
+            match = TEMPLATE_TAG_OPEN_PATTERN.search(line)
+            # An element closed on the same line is not a block
+            if match and not TEMPLATE_TAG_CLOSE_PATTERN.search(line):
+                attribute = TEMPLATE_ID_PATTERN.search(match.group(2))
+                if attribute:
+                    return match.group(1).lower() + ("#" if attribute.group(1) == "id" else ".") + attribute.group(2)
+                return match.group(1).lower()
+            # Templates often declare PHP functions and classes too
+        patterns = JS_SYMBOL_PATTERNS if language == "js" else PHP_SYMBOL_PATTERNS
+        line = MODIFIERS_PATTERN.sub("", line)
+        for pattern in patterns:
+            match = pattern.search(line)
+            if match:
+                return match.group(1)
+        return None
+    return None
+
+class CodeChunker:
+    """Splits one source file into chunks on syntax boundaries
+
+    The file is divided into top-level units (classes, functions, statements,
+    template blocks) using the bracket depth of each line. Consecutive units are
+    packed into chunks up to the token budget. A unit that is larger than the
+    budget is split into its header, its body's units and its closing lines,
+    recursively; a unit without inner structure is split into line windows.
+    """
+
+    def __init__(self, text: str, language: str, chunk_size: int, tokenizer: Callable[[str], List[Any]],
+                 fallback: Optional[Callable[[str], List[str]]] = None):
+        """Scan the file
+
+        Args:
+            text: Content of the file
+            language: "php", "ctp" or "js"
+            chunk_size: Token budget of a chunk
+            tokenizer: Function returning the tokens of a text
+            fallback: Splits a single line that exceeds the budget
+        """
+        self.lines = text.split("\n")
+        self.language = language
+        self.chunk_size = chunk_size
+        self.fallback = fallback
+        if language == "ctp":
+            self.depths = template_depths(self.lines)
+        else:
+            self.depths = bracket_depths(self.lines, php=language == "php")
+
+        # Prefix sums of the token counts; the newline is tokenized with its line,
+        # which keeps the sum within a token or two of the tokens of the whole text
+        self._token_sums = [0]
+        for line in self.lines:
+            self._token_sums.append(self._token_sums[-1] + (len(tokenizer(line + "\n")) if line.strip() else 1))
+
+    def tokens(self, start: int, end: int) -> int:
+        """Return the number of tokens of lines `start` to `end`"""
+        return self._token_sums[end + 1] - self._token_sums[start]
+
+    def depth_before(self, index: int) -> int:
+        """Return the depth at the start of a line"""
+        return self.depths[index - 1] if index > 0 else 0
+
+    def split_units(self, start: int, end: int, level: int, parent: Optional[str]) -> List[Unit]:
+        """Split lines into the units that start at a nesting level
+
+        Args:
+            start: First line
+            end: Last line
+            level: Depth at which units start and end
+            parent: Symbol of the enclosing unit, used to qualify the symbols
+
+        Returns:
+            The units in line order
+        """
+        separator = "." if self.language == "js" else "::"
+        units = []
+        unit_start = None
+        only_trivia = True
+        for index in range(start, end + 1):
+            if unit_start is None:
+                unit_start = index
+                only_trivia = True
+            if not is_trivia(self.lines[index]):
+                only_trivia = False
+            if only_trivia or self.depths[index] > level or self._opens_next_line(index, end):
+                continue
+            symbol = find_symbol(self.lines, unit_start, index, self.language)
+            if symbol and parent:
+                symbol = parent + separator + symbol
+            units.append(Unit(unit_start, index, symbol))
+            unit_start = None
+        if unit_start is not None:
+            units.append(Unit(unit_start, end, None))
+        return units
+
+    def _opens_next_line(self, index: int, end: int) -> bool:
+        """Return True if the block of a declaration opens on a following line"""
+        stripped = self.lines[index].strip()
+        if not stripped or stripped.endswith((";", "}", ",")):
+            return False
+        for next_index in range(index + 1, end + 1):
+            next_line = self.lines[next_index].strip()
+            if next_line:
+                return next_line.startswith("{")
+        return False
+
+    def split_large_unit(self, unit: Unit) -> Optional[List[Unit]]:
+        """Split a unit into its header, the units of its body and its closing lines
+
+        Args:
+            unit: Unit that exceeds the token budget
+
+        Returns:
+            The smaller units, or None if the unit has no inner structure
+        """
+        level = self.depth_before(unit.start)
+        header_end = next((index for index in range(unit.start, unit.end + 1) if self.depths[index] > level), None)
+        if header_end is None or header_end >= unit.end - 1:
+            return None
+
+        body_level = self.depths[header_end]
+        body_end = unit.end - 1
+        parts = [Unit(unit.start, header_end, unit.symbol)]
+        parts.extend(self.split_units(header_end + 1, body_end, body_level, unit.symbol))
+        parts.append(Unit(unit.end, unit.end, None))
+        # A body made of a single unit is split when it is packed, under its own
+        # symbol; without inner structure the whole unit is split into windows
+        if len(parts) < 4 and parts[1].start == header_end + 1 and parts[1].end == body_end:
+            if self.tokens(parts[1].start, parts[1].end) > self.chunk_size and self.split_large_unit(parts[1]) is None:
+                return None
+        return parts
+
+    def window_units(self, unit: Unit) -> List[Unit]:
+        """Split a unit without inner structure into windows of whole lines"""
+        windows = []
+        window_start = unit.start
+        for index in range(unit.start, unit.end + 1):
+            if index > window_start and self.tokens(window_start, index) > self.chunk_size:
+                windows.append(Unit(window_start, index - 1, unit.symbol))
+                window_start = index
+        windows.append(Unit(window_start, unit.end, unit.symbol))
+        return windows
+
+    def pack(self, units: List[Unit], context: Optional[str] = None) -> List[CodeChunk]:
+        """Pack consecutive units into chunks within the token budget
+
+        The parts of a unit larger than the budget are packed in the same pass,
+        so the units before and after it share chunks with its first and last
+        parts instead of starting new ones.
+
+        Args:
+            units: Units in line order
+            context: Symbol of the enclosing unit, for chunks without a symbol
+
+        Returns:
+            The chunks in line order
+        """
+        chunks = []
+        current = []
+        self._pack_units(units, context, chunks, current)
+        self._flush(chunks, current)
+        return chunks
+
+    def _pack_units(
+        self,
+        units: List[Unit],
+        context: Optional[str],
+        chunks: List[CodeChunk],
+        current: List[Tuple[Unit, Optional[str]]],
+    ) -> None:
+        """Add units to the pending chunk, flushing it to `chunks` when it is full
+
+        Args:
+            units: Units in line order
+            context: Symbol of the enclosing unit, for chunks without a symbol
+            chunks: The finished chunks
+            current: The units of the pending chunk with their context
+        """
+        for unit in units:
+            size = self.tokens(unit.start, unit.end)
+            if size > self.chunk_size:
+                parts = self.split_large_unit(unit)
+                if parts is not None:
+                    self._pack_units(parts, unit.symbol or context, chunks, current)
+                elif unit.start == unit.end:
+                    self._flush(chunks, current)
+                    chunks.extend(self.split_long_line(unit, context))
+                else:
+                    self._pack_units(self.window_units(unit), unit.symbol or context, chunks, current)
+                continue
+            if current:
+                combined = self.tokens(current[0][0].start, unit.end)
+                if combined > self.chunk_size and not (
+                    combined <= self.chunk_size + CLOSING_OVERFLOW_TOKENS and self.closes_only(unit)
+                ):
+                    self._flush(chunks, current)
+            current.append((unit, context))
+
+    def _flush(self, chunks: List[CodeChunk], current: List[Tuple[Unit, Optional[str]]]) -> None:
+        """Turn the pending units into a chunk
+
+        Closing lines left over at the end of the file are added to the previous
+        chunk rather than becoming a chunk of their own.
+        """
+        if not current:
+            return
+        start, end = current[0][0].start, current[-1][0].end
+        if chunks and all(self.closes_only(unit) for unit, _ in current):
+            previous = chunks[-1]
+            if self.tokens(previous.start_line - 1, end) <= self.chunk_size + CLOSING_OVERFLOW_TOKENS:
+                text = previous.text + "\n" + "\n".join(self.lines[previous.end_line:end + 1])
+                chunks[-1] = previous._replace(text=text.rstrip("\n"), end_line=max(previous.end_line, self.last_line(end)))
+                current.clear()
+                return
+        # A chunk that starts inside a unit covers part of it too
+        symbols = [unit.symbol for unit, _ in current]
+        if symbols[0] is None and not self.closes_only(current[0][0]):
+            symbols[0] = current[0][1]
+        chunk = self.make_chunk(start, end, symbols, current[0][1])
+        if chunk is not None:
+            chunks.append(chunk)
+        current.clear()
+
+    def closes_only(self, unit: Unit) -> bool:
+        """Return True if a unit only has closing, blank and comment lines"""
+        return all(is_closing(self.lines[index]) or is_trivia(self.lines[index]) for index in range(unit.start, unit.end + 1))
+
+    def last_line(self, end: int) -> int:
+        """Return the 1-based number of the last non-blank line up to `end`"""
+        while end > 0 and not self.lines[end].strip():
+            end -= 1
+        return end + 1
+
+    def split_long_line(self, unit: Unit, context: Optional[str]) -> List[CodeChunk]:
+        """Split a single line that exceeds the budget, e.g. minified code"""
+        line = self.lines[unit.start]
+        pieces = self.fallback(line) if self.fallback else [line]
+        symbol = unit.symbol or context or ""
+        return [CodeChunk(piece, unit.start + 1, unit.start + 1, symbol) for piece in pieces if piece.strip()]
+
+    def make_chunk(self, start: int, end: int, symbols: List[Optional[str]], context: Optional[str]) -> Optional[CodeChunk]:
+        """Build a chunk from a line range, dropping blank lines at its edges"""
+        while start <= end and not self.lines[start].strip():
+            start += 1
+        while end >= start and not self.lines[end].strip():
+            end -= 1
+        if start > end:
+            return None
+
+        names = list(dict.fromkeys(symbol for symbol in symbols if symbol))
+        if len(names) > MAX_CHUNK_SYMBOLS:
+            names = names[:MAX_CHUNK_SYMBOLS] + ["..."]
+        symbol = ", ".join(names) or context or ""
+        return CodeChunk("\n".join(self.lines[start:end + 1]), start + 1, end + 1, symbol)
+
+    def chunks(self) -> List[CodeChunk]:
+        """Return the chunks of the whole file"""
+        if not self.lines:
+            return []
+        return self.pack(self.split_units(0, len(self.lines) - 1, 0, None))
+
+def split_code(
+    text: str,
+    language: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    tokenizer: Optional[Callable[[str], List[Any]]] = None,
+    fallback: Optional[Callable[[str], List[str]]] = None,
+) -> List[CodeChunk]:
+    """Split source code into chunks on class, function and template-block boundaries
+
+    Args:
+        text: Content of the file
+        language: "php", "ctp" or "js"
+        chunk_size: Token budget of a chunk
+        tokenizer: Function returning the tokens of a text (llama_index's default if None)
+        fallback: Splits a single line that exceeds the budget
+
+    Returns:
+        The chunks with their 1-based line ranges and symbols
+    """
+    return CodeChunker(text, language, chunk_size, tokenizer or get_tokenizer(), fallback).chunks()
+
+class CodeAwareSplitter(NodeParser):
+    """Node parser that chunks PHP, CakePHP templates and JavaScript on syntax boundaries
+
+    Chunks do not overlap, and each carries `symbol`, `start_line` and
+    `end_line` metadata. Other files are split with the fallback splitter.
+    """
+
+    chunk_size: int = Field(default=DEFAULT_CHUNK_SIZE, description="Token budget of a chunk", gt=0)
+    _fallback: NodeParser = PrivateAttr()
+    _tokenizer: Callable = PrivateAttr()
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, fallback: Optional[NodeParser] = None, **kwargs: Any):
+        """Create the splitter
+
+        Args:
+            chunk_size: Token budget of a chunk
+            fallback: Splitter for other files (a SentenceSplitter with the same budget if None)
+        """
+        super().__init__(chunk_size=chunk_size, **kwargs)
+        self._fallback = fallback or SentenceSplitter(chunk_size=chunk_size)
+        self._tokenizer = get_tokenizer()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CodeAwareSplitter"
+
+    def _parse_nodes(self, nodes: Sequence[BaseNode], show_progress: bool = False, **kwargs: Any) -> List[BaseNode]:
+        all_nodes = []
+        for node in nodes:
+            file_path = node.metadata.get("file_path") or node.metadata.get("file_name") or ""
+            language = code_language(file_path)
+            if language is None:
+                all_nodes.extend(self._fallback._parse_nodes([node], show_progress=show_progress, **kwargs))
+                continue
+
+            text = node.get_content(metadata_mode=MetadataMode.NONE)
+            split_line = getattr(self._fallback, "split_text", None)
+            chunks = split_code(text, language, self.chunk_size, self._tokenizer, split_line)
+            code_nodes = build_nodes_from_splits([chunk.text for chunk in chunks], node, id_func=self.id_func)
+            for code_node, chunk in zip(code_nodes, chunks):
+                code_node.metadata = {"symbol": chunk.symbol, "start_line": chunk.start_line, "end_line": chunk.end_line}
+                code_node.excluded_embed_metadata_keys = list(code_node.excluded_embed_metadata_keys) + LINE_METADATA_KEYS
+            all_nodes.extend(code_nodes)
+        return all_nodes
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Defaults shared by the command line tools. This module imports nothing but
+# os, so option defaults never pull llama_index, numpy or sqlite3 into
+# `--help`, argument errors or the CakePHP analyzer.
+
+import os
+
+# Directory of the embedding, analysis and answer caches
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "code_review_assistant")
+
+# Nodes sent in one embedding request and embedding requests in flight
+DEFAULT_EMBED_BATCH_SIZE = 16
+DEFAULT_EMBED_CONCURRENCY = 4
+
+# Near duplicates share at least this fraction of their shingles (Jaccard similarity)
+DEFAULT_DEDUP_SIMILARITY = 0.9
+
+# Below this many nodes an exact scan is already fast enough
+ANN_MIN_NODES = 20000
+# ANN inverted lists scanned per query
+DEFAULT_NPROBE = 32
+
+# How query nodes are retrieved: by embedding, by BM25, or both fused
+RETRIEVAL_MODES = ["vector", "hybrid", "lexical"]
+DEFAULT_RETRIEVAL_MODE = "hybrid"
+
+# Answer cache expiry and size
+DEFAULT_ANSWER_TTL_HOURS = 7 * 24
+DEFAULT_ANSWER_CACHE_SIZE = 1000
+# 0 only serves answers to the same normalized query
+DEFAULT_ANSWER_SIMILARITY = 0.0
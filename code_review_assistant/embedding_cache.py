@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from typing import List, Optional, Sequence, Dict, Any
+
+# Import the shared cache directory
+try:
+    from defaults import DEFAULT_CACHE_DIR
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.defaults import DEFAULT_CACHE_DIR
+
+DEFAULT_MAX_SIZE_MB = 512
+CACHE_FILENAME = "embeddings.sqlite3"
+
+def hash_text(text: str) -> str:
+    """Return the cache key hash of a text
+
+    Args:
+        text: The text to hash
+
+    Returns:
+        Hex digest of the text
+    """
+    return hashlib.sha256(text.encode('utf-8', errors='surrogatepass')).hexdigest()
+
+class EmbeddingCache:
+    """Disk-backed embedding cache keyed by (embedding model name, text hash)
+
+    Embeddings are stored as float32 blobs in a SQLite database, so the cache
+    can be shared by several processes. When the stored vectors grow beyond
+    `max_size_mb`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_size_mb: float = DEFAULT_MAX_SIZE_MB):
+        """Open (and create if needed) the embedding cache
+
+        Args:
+            cache_dir: Directory where the cache database is stored
+            max_size_mb: Maximum size of the stored vectors in megabytes
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, CACHE_FILENAME)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Look up the embeddings of several texts
+
+        Args:
+            model: Name of the embedding model
+            texts: The texts to look up
+
+        Returns:
+            List with the cached embedding of each text, or None for a miss
+        """
+        hashes = [hash_text(text) for text in texts]
+        found: Dict[str, List[float]] = {}
+
+        with self._lock:
+            # Stay well below SQLite's limit on the number of host parameters
+            for i in range(0, len(hashes), 500):
+                chunk = hashes[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model] + chunk,
+                ).fetchall()
+                for text_hash, blob in rows:
+                    vector = array('f')
+                    vector.frombytes(blob)
+                    found[text_hash] = vector.tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, text_hash) for text_hash in found],
+                )
+                self._conn.commit()
+
+            results = [found.get(text_hash) for text_hash in hashes]
+            hit_count = sum(1 for result in results if result is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+
+        return results
+
+    def put_many(self, model: str, texts: Sequence[str], embeddings: Sequence[Sequence[float]]) -> None:
+        """Store the embeddings of several texts
+
+        Args:
+            model: Name of the embedding model
+            texts: The embedded texts
+            embeddings: The embedding of each text
+        """
+        now = time.time()
+        rows = []
+        for text, embedding in zip(texts, embeddings):
+            blob = array('f', embedding).tobytes()
+            rows.append((model, hash_text(text), blob, len(blob), now))
+
+        with self._lock:
+            # Only new rows add to the total; a text that is already cached only has its use time updated
+            added_size = 0
+            existing = []
+            for row in rows:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO embeddings (model, text_hash, vector, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                    row,
+                )
+                if cursor.rowcount:
+                    added_size += row[3]
+                else:
+                    existing.append((now, row[0], row[1]))
+            if existing:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    existing,
+                )
+            self._conn.commit()
+            self._total_size += added_size
+            if self._total_size > self.max_size_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Evict least recently used entries while the cache is over its size limit"""
+        # The running total is only an estimate when other processes share the cache
+        total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        self._total_size = total_size
+        if total_size <= self.max_size_bytes:
+            return
+
+        # Evict down to 90% of the limit so eviction does not run on every insert
+        target_size = int(self.max_size_bytes * 0.9)
+        to_delete = []
+        for model, text_hash, size in self._conn.execute(
+            "SELECT model, text_hash, size FROM embeddings ORDER BY last_used"
+        ):
+            if total_size <= target_size:
+                break
+            to_delete.append((model, text_hash))
+            total_size -= size
+
+        self._conn.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", to_delete)
+        self._conn.commit()
+        self.evictions += len(to_delete)
+        self._total_size = total_size
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the cache counters and size
+
+        Returns:
+            Dictionary with hits, misses, hit rate, evictions, entries and size
+        """
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings"
+            ).fetchone()
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": size,
+        }
+
+    def report(self) -> None:
+        """Print the cache counters"""
+        stats = self.stats()
+        print(
+            f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} hit rate), {stats['evictions']} evicted, "
+            f"{stats['entries']} entries ({stats['size_bytes'] / (1024 * 1024):.1f} MB)"
+        )
+
+    def close(self) -> None:
+        """Close the cache database"""
+        with self._lock:
+            self._conn.close()
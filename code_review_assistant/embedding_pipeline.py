@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Sequence, Callable, Optional
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode, MetadataMode
+
+# Import the embedding cache
+try:
+    from embedding_cache import EmbeddingCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_SIZE_MB
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.embedding_cache import EmbeddingCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_SIZE_MB
+
+# Import the default batch size and concurrency of embedding requests
+try:
+    from defaults import DEFAULT_EMBED_BATCH_SIZE, DEFAULT_EMBED_CONCURRENCY
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.defaults import DEFAULT_EMBED_BATCH_SIZE, DEFAULT_EMBED_CONCURRENCY
+
+class CachedEmbedding(BaseEmbedding):
+    """Embedding model wrapper that serves repeated texts from an EmbeddingCache
+
+    Only texts missing from the cache are sent to the wrapped model. Query
+    embeddings are cached separately from text embeddings because some
+    models embed queries with a different instruction prefix.
+    """
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+
+    def __init__(self, embed_model: BaseEmbedding, cache: EmbeddingCache, **kwargs):
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            **kwargs,
+        )
+        self._embed_model = embed_model
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        return self._cache
+
+    def _cached(self, namespace: str, texts: List[str], embed: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """Return the embeddings of texts, embedding only the cache misses"""
+        model_key = f"{self.model_name}#{namespace}"
+        embeddings = self._cache.get_many(model_key, texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            new_embeddings = embed(missing_texts)
+            self._cache.put_many(model_key, missing_texts, new_embeddings)
+            for i, embedding in zip(missing, new_embeddings):
+                embeddings[i] = embedding
+        return embeddings
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._cached("query", [query], lambda texts: [self._embed_model.get_query_embedding(texts[0])])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._cached("text", texts, self._embed_model._get_text_embeddings)
+
+def with_embedding_cache(
+    embed_model: BaseEmbedding,
+    cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    max_size_mb: float = DEFAULT_MAX_SIZE_MB,
+) -> BaseEmbedding:
+    """Wrap an embedding model with the shared on-disk embedding cache
+
+    Args:
+        embed_model: The embedding model to wrap
+        cache_dir: Directory of the embedding cache, or None to disable caching
+        max_size_mb: Maximum size of the cache in megabytes
+
+    Returns:
+        The wrapped model, or the model itself if caching is disabled or unavailable
+    """
+    if cache_dir is None:
+        return embed_model
+
+    try:
+        cache = EmbeddingCache(cache_dir, max_size_mb)
+    except Exception as e:
+        print(f"Warning: Could not open embedding cache in '{cache_dir}': {e}")
+        print("Continuing without embedding cache.")
+        return embed_model
+
+    return CachedEmbedding(embed_model, cache)
+
+def report_embedding_cache(embed_model: BaseEmbedding) -> None:
+    """Print the embedding cache counters if the model is cached
+
+    Args:
+        embed_model: The embedding model in use
+    """
+    if isinstance(embed_model, CachedEmbedding):
+        embed_model.cache.report()
+
+def embed_texts(
+    texts: Sequence[str],
+    embed_model: BaseEmbedding,
+    batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+    concurrency: int = DEFAULT_EMBED_CONCURRENCY,
+    show_progress: bool = True,
+) -> List[List[float]]:
+    """Embed texts in batches with a bounded number of requests in flight
+
+    The texts are grouped into batches of `batch_size` and each batch is sent
+    as one request. At most `concurrency` requests run at the same time, so the
+    Ollama server always has work queued instead of waiting for the next HTTP
+    round trip.
+
+    Args:
+        texts: The texts to embed
+        embed_model: Embedding model used for the requests
+        batch_size: Number of texts per embedding request
+        concurrency: Maximum number of embedding requests in flight
+        show_progress: Print progress after each completed batch
+
+    Returns:
+        List of embeddings in the same order as the texts
+    """
+    batch_size = max(1, batch_size)
+    concurrency = max(1, concurrency)
+    batches = [list(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+    embeddings: List[List[float]] = [None] * len(texts)
+
+    if not batches:
+        return embeddings
+
+    start_time = time.time()
+    done = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(embed_model.get_text_embedding_batch, batch): batch_index
+            for batch_index, batch in enumerate(batches)
+        }
+        try:
+            for future in as_completed(futures):
+                offset = futures[future] * batch_size
+                batch_embeddings = future.result()
+                embeddings[offset:offset + len(batch_embeddings)] = batch_embeddings
+
+                done += len(batch_embeddings)
+                if show_progress:
+                    elapsed = time.time() - start_time
+                    rate = done / elapsed if elapsed > 0 else 0.0
+                    print(f"Embedded {done}/{len(texts)} texts ({rate:.1f} texts/s)")
+        except BaseException:
+            # Do not keep sending requests after a failed batch
+            for future in futures:
+                future.cancel()
+            raise
+
+    return embeddings
+
+def embed_nodes(
+    nodes: Sequence[BaseNode],
+    embed_model: BaseEmbedding,
+    batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+    concurrency: int = DEFAULT_EMBED_CONCURRENCY,
+    show_progress: bool = True,
+) -> None:
+    """Embed nodes in place before they are added to an index
+
+    Nodes that already carry an embedding are skipped. VectorStoreIndex uses
+    the embeddings set here instead of embedding the nodes one request at a time.
+
+    Args:
+        nodes: The nodes to embed
+        embed_model: Embedding model used for the requests
+        batch_size: Number of nodes per embedding request
+        concurrency: Maximum number of embedding requests in flight
+        show_progress: Print progress after each completed batch
+    """
+    pending = [node for node in nodes if node.embedding is None]
+    if not pending:
+        return
+
+    print(f"Embedding {len(pending)} nodes (batch size: {batch_size}, concurrency: {concurrency})...")
+    start_time = time.time()
+
+    texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in pending]
+    embeddings = embed_texts(texts, embed_model, batch_size, concurrency, show_progress)
+    for node, embedding in zip(pending, embeddings):
+        node.embedding = embedding
+
+    elapsed = time.time() - start_time
+    rate = len(pending) / elapsed if elapsed > 0 else 0.0
+    print(f"Embedded {len(pending)} nodes in {elapsed:.1f} seconds ({rate:.1f} nodes/s).")
@@ -0,0 +1,372 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_FAKE_HOST = "127.0.0.1"
+DEFAULT_FAKE_PORT = 11435
+DEFAULT_FAKE_MODELS = ["codellama:latest"]
+DEFAULT_EMBEDDING_DIM = 256
+DEFAULT_LATENCY = 0.05
+DEFAULT_TOKENS_PER_SECOND = 50.0
+DEFAULT_RESPONSE_TOKENS = 64
+DEFAULT_CONTEXT_LENGTH = 4096
+FAKE_VERSION = "0.0.0-fake"
+
+WORD_PATTERN = re.compile(r"\w+")
+# Words of the generated responses
+RESPONSE_VOCABULARY = [
+    "the", "code", "function", "should", "check", "input", "value", "return", "error",
+    "controller", "model", "view", "query", "validate", "escape", "consider", "using",
+    "instead", "this", "method", "request", "data", "field", "issue", "security",
+]
+
+def fake_embedding(text: str, dim: int = DEFAULT_EMBEDDING_DIM) -> List[float]:
+    """Return a deterministic embedding of a text
+
+    Words are hashed into the dimensions of the vector (feature hashing), so
+    texts that share words get similar vectors and retrieval behaves
+    plausibly. The same text always gets the same unit vector.
+
+    Args:
+        text: Text to embed
+        dim: Number of dimensions
+
+    Returns:
+        The embedding vector
+    """
+    vector = [0.0] * dim
+    for word in WORD_PATTERN.findall(text.lower()):
+        digest = hashlib.md5(word.encode('utf-8')).digest()
+        index = int.from_bytes(digest[:4], 'little') % dim
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+
+    norm = math.sqrt(sum(value * value for value in vector))
+    if norm == 0.0:
+        vector[0] = 1.0
+        return vector
+    return [value / norm for value in vector]
+
+def fake_response_tokens(prompt: str, count: int) -> List[str]:
+    """Return the deterministic tokens generated for a prompt
+
+    Args:
+        prompt: The prompt
+        count: Number of tokens to generate
+
+    Returns:
+        The generated tokens; every token after the first starts with a space
+    """
+    seed = int.from_bytes(hashlib.sha256(prompt.encode('utf-8')).digest()[:8], 'little')
+    rng = random.Random(seed)
+    tokens = [rng.choice(RESPONSE_VOCABULARY) for _ in range(count)]
+    return [tokens[0].capitalize()] + [" " + token for token in tokens[1:]] if tokens else []
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    """HTTP server imitating the Ollama API for tests and load tests
+
+    Every request waits `latency` seconds before answering. Generated tokens
+    are paced at `tokens_per_second` (0 for no pacing), so the time to first
+    token and the generation time can be set independently.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        models: Optional[List[str]] = None,
+        embedding_dim: int = DEFAULT_EMBEDDING_DIM,
+        latency: float = DEFAULT_LATENCY,
+        tokens_per_second: float = DEFAULT_TOKENS_PER_SECOND,
+        response_tokens: int = DEFAULT_RESPONSE_TOKENS,
+    ):
+        """Create the server
+
+        Args:
+            address: (host, port) to bind to; port 0 picks a free port
+            models: Model names listed by /api/tags
+            embedding_dim: Number of dimensions of the embeddings
+            latency: Seconds each request waits before answering
+            tokens_per_second: Generation speed (0 for no pacing)
+            response_tokens: Number of tokens of each generated response
+        """
+        super().__init__(address, FakeOllamaHandler)
+        self.models = models or list(DEFAULT_FAKE_MODELS)
+        self.embedding_dim = embedding_dim
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": {}, "embedded_inputs": 0, "generated_tokens": 0}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, endpoint: str, embedded_inputs: int = 0, generated_tokens: int = 0) -> None:
+        """Count a request"""
+        with self._stats_lock:
+            self._stats["requests"][endpoint] = self._stats["requests"].get(endpoint, 0) + 1
+            self._stats["embedded_inputs"] += embedded_inputs
+            self._stats["generated_tokens"] += generated_tokens
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the request counters
+
+        Returns:
+            Dictionary with the requests per endpoint, embedded inputs and generated tokens
+        """
+        with self._stats_lock:
+            return {
+                "requests": dict(self._stats["requests"]),
+                "embedded_inputs": self._stats["embedded_inputs"],
+                "generated_tokens": self._stats["generated_tokens"],
+            }
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Handler of the Ollama endpoints used by the code review assistant
+
+    GET /api/version, GET /api/tags, POST /api/show, POST /api/embed,
+    POST /api/embeddings, POST /api/generate and POST /api/chat are
+    implemented. /api/generate and /api/chat stream newline-delimited JSON
+    unless the request sets "stream": false, as Ollama does. GET /api/fake/stats
+    returns the server's request counters.
+    """
+
+    server_version = "FakeOllama/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Optional[Dict[str, Any]]:
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self._send_json(400, {"error": f"Invalid request: {e}"})
+            return None
+        if not isinstance(payload, dict):
+            self._send_json(400, {"error": "Invalid request: expected a JSON object"})
+            return None
+        return payload
+
+    def _check_model(self, payload: Dict[str, Any]) -> bool:
+        model = payload.get("model") or payload.get("name")
+        # Like Ollama, a name without a tag refers to the latest tag
+        if model not in self.server.models and f"{model}:latest" not in self.server.models:
+            self._send_json(404, {"error": f"model '{model}' not found"})
+            return False
+        return True
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self.server.record("version")
+            self._send_json(200, {"version": FAKE_VERSION})
+        elif self.path == "/api/tags":
+            self.server.record("tags")
+            self._send_json(200, {"models": [self._model_entry(model) for model in self.server.models]})
+        elif self.path == "/api/fake/stats":
+            self._send_json(200, self.server.stats())
+        else:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        handlers = {
+            "/api/show": self._show,
+            "/api/embed": self._embed,
+            "/api/embeddings": self._embeddings,
+            "/api/generate": self._generate,
+            "/api/chat": self._chat,
+        }
+        handler = handlers.get(self.path)
+        if handler is None:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+
+        payload = self._read_json()
+        if payload is None or not self._check_model(payload):
+            return
+        if self.server.latency > 0:
+            time.sleep(self.server.latency)
+        handler(payload)
+
+    def _model_entry(self, model: str) -> Dict[str, Any]:
+        return {
+            "name": model,
+            "model": model,
+            "modified_at": datetime.now(timezone.utc).isoformat(),
+            "size": 0,
+            "digest": hashlib.sha256(model.encode('utf-8')).hexdigest(),
+            "details": {"format": "gguf", "family": "fake", "parameter_size": "0B", "quantization_level": "none"},
+        }
+
+    def _show(self, payload: Dict[str, Any]) -> None:
+        self.server.record("show")
+        self._send_json(200, {
+            "modelfile": "",
+            "parameters": "",
+            "template": "{{ .Prompt }}",
+            "details": self._model_entry(payload.get("model") or payload.get("name"))["details"],
+            "model_info": {"general.architecture": "fake", "fake.context_length": DEFAULT_CONTEXT_LENGTH},
+        })
+
+    def _embed(self, payload: Dict[str, Any]) -> None:
+        inputs = payload.get("input", "")
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        self.server.record("embed", embedded_inputs=len(inputs))
+        self._send_json(200, {
+            "model": payload["model"],
+            "embeddings": [fake_embedding(text, self.server.embedding_dim) for text in inputs],
+            "total_duration": int(self.server.latency * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": sum(len(WORD_PATTERN.findall(text)) for text in inputs),
+        })
+
+    def _embeddings(self, payload: Dict[str, Any]) -> None:
+        self.server.record("embeddings", embedded_inputs=1)
+        self._send_json(200, {"embedding": fake_embedding(payload.get("prompt", ""), self.server.embedding_dim)})
+
+    def _generate(self, payload: Dict[str, Any]) -> None:
+        prompt = payload.get("prompt", "")
+        self._respond(payload, prompt, lambda token: {"response": token}, {"context": []})
+
+    def _chat(self, payload: Dict[str, Any]) -> None:
+        prompt = "\n".join(str(message.get("content", "")) for message in payload.get("messages", []))
+        self._respond(
+            payload,
+            prompt,
+            lambda token: {"message": {"role": "assistant", "content": token}},
+            {"message": {"role": "assistant", "content": ""}},
+        )
+
+    def _respond(self, payload: Dict[str, Any], prompt: str, token_fields, final_fields: Dict[str, Any]) -> None:
+        """Generate a response, streamed as NDJSON unless "stream" is false"""
+        num_predict = (payload.get("options") or {}).get("num_predict")
+        count = self.server.response_tokens
+        if isinstance(num_predict, int) and num_predict > 0:
+            count = min(count, num_predict)
+        tokens = fake_response_tokens(prompt, count)
+        delay = 1.0 / self.server.tokens_per_second if self.server.tokens_per_second > 0 else 0.0
+        self.server.record(self.path.rsplit("/", 1)[-1], generated_tokens=len(tokens))
+
+        start_time = time.time()
+
+        def final(text: str) -> Dict[str, Any]:
+            message = {
+                "model": payload["model"],
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "done": True,
+                "done_reason": "stop",
+                "total_duration": int((time.time() - start_time + self.server.latency) * 1e9),
+                "load_duration": 0,
+                "prompt_eval_count": len(WORD_PATTERN.findall(prompt)),
+                "prompt_eval_duration": int(self.server.latency * 1e9),
+                "eval_count": len(tokens),
+                "eval_duration": int((time.time() - start_time) * 1e9),
+            }
+            message.update(final_fields)
+            if text:
+                # Non-streaming responses carry the whole text in the final message
+                message.update(token_fields(text))
+            return message
+
+        if payload.get("stream", True) is False:
+            time.sleep(delay * len(tokens))
+            self._send_json(200, final("".join(tokens)))
+            return
+
+        # Stream one NDJSON line per token; chunked so the connection can be reused
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_line(message: Dict[str, Any]) -> None:
+            data = json.dumps(message).encode('utf-8') + b"\n"
+            self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+
+        for token in tokens:
+            if delay:
+                time.sleep(delay)
+            message = {"model": payload["model"], "created_at": datetime.now(timezone.utc).isoformat(), "done": False}
+            message.update(token_fields(token))
+            write_line(message)
+        write_line(final(""))
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        # Keep the console for the server's own messages
+        pass
+
+def start_fake_ollama(host: str = DEFAULT_FAKE_HOST, port: int = 0, **options) -> FakeOllamaServer:
+    """Start a fake Ollama server in a background thread
+
+    Args:
+        host: Host to bind to
+        port: Port to listen on (0 picks a free port)
+        **options: Options of FakeOllamaServer (latency, tokens_per_second, ...)
+
+    Returns:
+        The running server; its base_url is ready to use, and shutdown() stops it
+    """
+    server = FakeOllamaServer((host, port), **options)
+    thread = threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True)
+    thread.start()
+    return server
+
+def main():
+    """Main function to run the fake Ollama server from command line"""
+    parser = argparse.ArgumentParser(description="Local stand-in for the Ollama API with deterministic responses")
+    parser.add_argument("--host", default=DEFAULT_FAKE_HOST, help="Host to bind to")
+    parser.add_argument("--port", "-p", type=int, default=DEFAULT_FAKE_PORT, help="Port to listen on")
+    parser.add_argument("--model", "-m", action="append", dest="models",
+                        help="Model name to serve (repeatable, default: codellama:latest)")
+    parser.add_argument("--embedding-dim", type=int, default=DEFAULT_EMBEDDING_DIM, help="Number of dimensions of the embeddings")
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY, help="Seconds each request waits before answering")
+    parser.add_argument("--tokens-per-second", type=float, default=DEFAULT_TOKENS_PER_SECOND,
+                        help="Generation speed (0 for no pacing)")
+    parser.add_argument("--response-tokens", type=int, default=DEFAULT_RESPONSE_TOKENS,
+                        help="Number of tokens of each generated response")
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(
+        (args.host, args.port),
+        models=args.models,
+        embedding_dim=args.embedding_dim,
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+    )
+    print(f"Fake Ollama server listening on {server.base_url} (models: {', '.join(server.models)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping fake Ollama server.")
+    finally:
+        server.server_close()
+        print(f"Requests served: {json.dumps(server.stats())}")
+
+if __name__ == "__main__":
+    main()
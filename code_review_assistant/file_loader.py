@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import hashlib
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Pattern, Sequence, Tuple
+
+# Files with gitignore-style patterns, read in every directory of a walked tree
+IGNORE_FILENAMES = [".gitignore", ".reviewignore"]
+# Patterns applied to every tree: dependencies, caches and minified code
+DEFAULT_IGNORE_PATTERNS = [
+    "node_modules/",
+    "bower_components/",
+    "vendor/",
+    "vendors/",
+    "Vendor/",
+    "tmp/",
+    "*.min.js",
+    "*.min.css",
+    "*.map",
+]
+# Larger files are skipped, such as data dumps and test fixtures
+DEFAULT_MAX_FILE_SIZE = 1024 * 1024
+# A NUL byte in the first bytes of a file marks it as binary
+BINARY_SNIFF_BYTES = 8192
+DEFAULT_READ_WORKERS = 8
+# Fewer files are read in the calling thread: importing the thread pool costs
+# more than the reads save
+PARALLEL_READ_MIN_FILES = 32
+
+class SourceFile(NamedTuple):
+    """A file read for analysis, indexing or review"""
+    path: str
+    # Decoded content, or None if the file was skipped or could not be read
+    text: Optional[str]
+    encoding: Optional[str]
+    sha256: Optional[str]
+    # Why the file was skipped ("binary file", "larger than ... bytes")
+    skipped: Optional[str] = None
+    # Why the file could not be read
+    error: Optional[str] = None
+
+class IgnoreRule(NamedTuple):
+    """One pattern of an ignore file"""
+    # Directory of the ignore file relative to the walked root ("" for the root)
+    base: str
+    pattern: Pattern
+    negated: bool
+    dir_only: bool
+
+def glob_to_regex(pattern: str) -> str:
+    """Translate a gitignore glob into a regular expression over '/'-separated paths
+
+    Args:
+        pattern: The glob, without negation, anchoring slash or trailing slash
+
+    Returns:
+        The regular expression, matching the whole path
+    """
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and pattern.find("]", i + 2) > 0:
+            end = pattern.find("]", i + 2)
+            body = pattern[i + 1:end].replace("\\", "\\\\")
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            parts.append(f"[{body}]")
+            i = end + 1
+        elif pattern[i] == "\\" and i + 1 < len(pattern):
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(parts)
+
+def parse_ignore_line(line: str, base: str = "") -> Optional[IgnoreRule]:
+    """Parse one line of a gitignore-style file
+
+    Args:
+        line: The line
+        base: Directory of the ignore file relative to the walked root
+
+    Returns:
+        The rule, or None for blank lines and comments
+    """
+    line = line.rstrip("\r\n").rstrip()
+    if not line or line.startswith("#"):
+        return None
+    negated = line.startswith("!")
+    if negated:
+        line = line[1:]
+    elif line.startswith(("\\!", "\\#")):
+        line = line[1:]
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+
+    # A pattern with a slash is relative to the ignore file, otherwise it matches at any depth
+    anchored = "/" in line
+    regex = glob_to_regex(line.lstrip("/"))
+    if not anchored:
+        regex = "(?:.*/)?" + regex
+    return IgnoreRule(base, re.compile(regex + r"\Z"), negated, dir_only)
+
+class IgnoreMatcher:
+    """Decides which paths of a tree are ignored
+
+    Rules come from DEFAULT_IGNORE_PATTERNS and from the IGNORE_FILENAMES in
+    each directory, with gitignore semantics: the patterns of an ignore file
+    apply below its directory, the last matching pattern wins and `!`
+    re-includes a path. Files inside an ignored directory stay ignored.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        patterns: Sequence[str] = DEFAULT_IGNORE_PATTERNS,
+        ignore_filenames: Sequence[str] = IGNORE_FILENAMES,
+    ):
+        """Create the matcher; ignore files are read as their directories are reached
+
+        Args:
+            root: Root directory of the tree
+            patterns: Patterns applied to the whole tree
+            ignore_filenames: Names of the ignore files to read
+        """
+        self.root = root
+        self.ignore_filenames = list(ignore_filenames)
+        self._root_rules = [rule for rule in (parse_ignore_line(pattern) for pattern in patterns) if rule]
+        self._rules: Dict[str, List[IgnoreRule]] = {}
+
+    def _read_ignore_files(self, rel_dir: str) -> List[IgnoreRule]:
+        """Return the rules of the ignore files in a directory"""
+        rules = []
+        directory = os.path.join(self.root, *rel_dir.split("/")) if rel_dir else self.root
+        for filename in self.ignore_filenames:
+            try:
+                with open(os.path.join(directory, filename), 'r', encoding='utf-8', errors='replace') as f:
+                    lines = f.readlines()
+            except OSError:
+                continue
+            rules.extend(rule for rule in (parse_ignore_line(line, rel_dir) for line in lines) if rule)
+        return rules
+
+    def rules_for(self, rel_dir: str) -> List[IgnoreRule]:
+        """Return the rules that apply to the entries of a directory
+
+        Args:
+            rel_dir: Directory relative to the root, '/'-separated ("" for the root)
+        """
+        rules = self._rules.get(rel_dir)
+        if rules is None:
+            if rel_dir:
+                parent = rel_dir.rpartition("/")[0]
+                rules = self.rules_for(parent) + self._read_ignore_files(rel_dir)
+            else:
+                rules = self._root_rules + self._read_ignore_files("")
+            self._rules[rel_dir] = rules
+        return rules
+
+    def match(self, rel_path: str, is_dir: bool) -> bool:
+        """Return True if the rules ignore a path, assuming its parent directories are not ignored
+
+        Args:
+            rel_path: Path relative to the root, '/'-separated
+            is_dir: Whether the path is a directory
+        """
+        return apply_rules(self.rules_for(rel_path.rpartition("/")[0]), rel_path, is_dir)
+
+    def is_ignored(self, path: str) -> bool:
+        """Return True if a path or one of its parent directories is ignored
+
+        Args:
+            path: Path of a file or directory; paths outside the root are never ignored
+        """
+        rel_path = os.path.relpath(os.path.abspath(path), os.path.abspath(self.root))
+        if rel_path == os.curdir or rel_path.startswith(os.pardir):
+            return False
+
+        parts = rel_path.split(os.sep)
+        for i in range(1, len(parts) + 1):
+            is_dir = i < len(parts) or os.path.isdir(path)
+            if self.match("/".join(parts[:i]), is_dir):
+                return True
+        return False
+
+def apply_rules(rules: Sequence[IgnoreRule], rel_path: str, is_dir: bool) -> bool:
+    """Return True if the last of the rules matching a path ignores it
+
+    Args:
+        rules: Rules in the order they were read
+        rel_path: Path relative to the walked root, '/'-separated
+        is_dir: Whether the path is a directory
+    """
+    ignored = False
+    for rule in rules:
+        if rule.dir_only and not is_dir:
+            continue
+        if rule.base:
+            if not rel_path.startswith(rule.base + "/"):
+                continue
+            subpath = rel_path[len(rule.base) + 1:]
+        else:
+            subpath = rel_path
+        if rule.pattern.match(subpath):
+            ignored = not rule.negated
+    return ignored
+
+def walk_files(
+    root: str,
+    extensions: Optional[Sequence[str]] = None,
+    ignore: bool = True,
+    max_size: Optional[int] = DEFAULT_MAX_FILE_SIZE,
+    on_skip: Optional[Callable[[str, str], None]] = None,
+) -> List[str]:
+    """List the files of a tree, honouring ignore files and the size cap
+
+    Hidden files and directories are always skipped. Ignored directories are
+    not entered, so dependency trees cost nothing.
+
+    Args:
+        root: Directory to walk, or a single file
+        extensions: File extensions to keep (all files if None)
+        ignore: Apply DEFAULT_IGNORE_PATTERNS and the ignore files
+        max_size: Skip files larger than this many bytes (no limit if None)
+        on_skip: Called with the path and the reason of each file skipped for its size
+
+    Returns:
+        File paths in os.walk order
+    """
+    if os.path.isfile(root):
+        return [root]
+
+    wanted = {extension.lower() for extension in extensions} if extensions is not None else None
+    matcher = IgnoreMatcher(root) if ignore else None
+    file_paths = []
+    for dirpath, dirs, files in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root)
+        rel_dir = "" if rel_dir == os.curdir else rel_dir.replace(os.sep, "/") + "/"
+        dirs[:] = [
+            d for d in dirs
+            if not d.startswith('.') and not (matcher and matcher.match(rel_dir + d, True))
+        ]
+        for file in files:
+            if file.startswith('.'):
+                continue
+            if wanted is not None and os.path.splitext(file)[1].lower() not in wanted:
+                continue
+            if matcher and matcher.match(rel_dir + file, False):
+                continue
+            file_path = os.path.join(dirpath, file)
+            if max_size is not None:
+                try:
+                    size = os.path.getsize(file_path)
+                except OSError:
+                    # Let the reader report the unreadable file
+                    size = 0
+                if size > max_size:
+                    if on_skip:
+                        on_skip(file_path, f"larger than {max_size} bytes")
+                    continue
+            file_paths.append(file_path)
+    return file_paths
+
+def decode_bytes(data: bytes) -> Tuple[str, str]:
+    """Decode file content as UTF-8, falling back to Latin-1
+
+    Line endings are normalised to '\\n', as when reading in text mode.
+
+    Args:
+        data: Content of the file
+
+    Returns:
+        Tuple of (text, encoding)
+    """
+    try:
+        text, encoding = data.decode('utf-8'), 'utf-8'
+    except UnicodeDecodeError:
+        text, encoding = data.decode('latin-1'), 'latin-1'
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text, encoding
+
+def read_source_file(path: str, max_size: Optional[int] = None) -> SourceFile:
+    """Read and decode a file with a single read
+
+    Args:
+        path: Path to the file
+        max_size: Skip the file if it is larger than this many bytes (no limit if None)
+
+    Returns:
+        The decoded file, or the reason it was skipped or could not be read
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read() if max_size is None else f.read(max_size + 1)
+    except OSError as e:
+        return SourceFile(path, None, None, None, error=str(e))
+
+    if max_size is not None and len(data) > max_size:
+        return SourceFile(path, None, None, None, skipped=f"larger than {max_size} bytes")
+    if b"\0" in data[:BINARY_SNIFF_BYTES]:
+        return SourceFile(path, None, None, None, skipped="binary file")
+    text, encoding = decode_bytes(data)
+    return SourceFile(path, text, encoding, hashlib.sha256(data).hexdigest())
+
+def load_files(
+    paths: Sequence[str],
+    max_size: Optional[int] = None,
+    workers: int = DEFAULT_READ_WORKERS,
+) -> Iterator[SourceFile]:
+    """Read files in a thread pool, yielding them in the given order
+
+    Only a few files per worker are read ahead, so memory stays bounded
+    when the consumer is slower than the reads.
+
+    Args:
+        paths: Paths of the files
+        max_size: Skip files larger than this many bytes (no limit if None)
+        workers: Number of reader threads (1 to read in the calling thread)
+
+    Yields:
+        The read files, in the order of `paths`
+    """
+    if workers <= 1 or len(paths) < PARALLEL_READ_MIN_FILES:
+        for path in paths:
+            yield read_source_file(path, max_size)
+        return
+
+    # Imported here to keep the startup of small runs fast
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for path in paths:
+            pending.append(executor.submit(read_source_file, path, max_size))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
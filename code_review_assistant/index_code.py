@@ -2,22 +2,125 @@
 # -*- coding: utf-8 -*-
 
 import os
-import sys
+import time
+import argparse
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
-from llama_index.core import Settings, SimpleDirectoryReader, VectorStoreIndex, Document
-from llama_index.core.node_parser import SentenceSplitter
+# llama_index and the Ollama integrations take seconds to import, so they are
+# imported when the repository is indexed; --help and argument errors stay fast
+
+if TYPE_CHECKING:
+    from llama_index.core import Document, VectorStoreIndex
+
+# Import the index manifest helpers
 try:
-    from llama_index_llms_ollama import Ollama
-    from llama_index_embeddings_ollama import OllamaEmbedding
+    from index_manifest import (
+        load_manifest, save_manifest, new_manifest, discover_files, diff_manifest, make_manifest_entry,
+        find_dependent_files,
+    )
 except ImportError:
-    try:
-        from llama_index.llms.ollama import Ollama
-        from llama_index.embeddings.ollama import OllamaEmbedding
-    except ImportError:
-        print("Error: Could not import Ollama modules. Please make sure llama-index-llms-ollama and llama-index-embeddings-ollama are installed.")
-        sys.exit(1)
+    # If imported from a different directory
+    from code_review_assistant.index_manifest import (
+        load_manifest, save_manifest, new_manifest, discover_files, diff_manifest, make_manifest_entry,
+        find_dependent_files,
+    )
+
+# Import the option defaults; the embedding pipeline, index storage and ANN
+# index import llama_index and numpy, which --help does not need
+try:
+    from defaults import (
+        DEFAULT_CACHE_DIR, DEFAULT_EMBED_BATCH_SIZE, DEFAULT_EMBED_CONCURRENCY, DEFAULT_DEDUP_SIMILARITY, ANN_MIN_NODES
+    )
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.defaults import (
+        DEFAULT_CACHE_DIR, DEFAULT_EMBED_BATCH_SIZE, DEFAULT_EMBED_CONCURRENCY, DEFAULT_DEDUP_SIMILARITY, ANN_MIN_NODES
+    )
+
+# Import the Ollama health check
+try:
+    from ollama_client import HealthCheck, import_ollama_classes, UNAVAILABLE_POLICIES, DEFAULT_UNAVAILABLE_POLICY
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.ollama_client import (
+        HealthCheck, import_ollama_classes, UNAVAILABLE_POLICIES, DEFAULT_UNAVAILABLE_POLICY
+    )
+
+# Import the tracing helpers
+try:
+    from tracing import span, count, start_run, finish_run
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.tracing import span, count, start_run, finish_run
+
+# Import the shared file reader
+try:
+    from file_loader import load_files, DEFAULT_MAX_FILE_SIZE
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.file_loader import load_files, DEFAULT_MAX_FILE_SIZE
+
+CHUNK_SIZE = 1024
+CHUNK_OVERLAP = 100
+
+def load_documents(
+    file_paths: List[str],
+    max_size: Optional[int] = DEFAULT_MAX_FILE_SIZE,
+) -> Tuple[List["Document"], Dict[str, str]]:
+    """
+    Load documents from the given files.
+
+    Files are read in a thread pool and decoded from a single read. Each file
+    is loaded with its path as the document id, so the documents of a file can
+    later be removed from the index when the file changes. Binary files,
+    files over the size cap and unreadable files are skipped.
+
+    Args:
+        file_paths: Paths of the files to load
+        max_size: Skip files larger than this many bytes (no limit if None)
+
+    Returns:
+        Tuple of (documents, content hash of each loaded file)
+    """
+    from llama_index.core import Document
+
+    documents = []
+    hashes = {}
+    for source in load_files(file_paths, max_size):
+        if source.error:
+            print(f"Warning: Could not read '{source.path}': {source.error}")
+        elif source.skipped:
+            print(f"Skipping '{source.path}': {source.skipped}")
+        else:
+            documents.append(Document(text=source.text, id_=source.path, metadata={"file_path": source.path}))
+            hashes[source.path] = source.sha256
+    return documents, hashes
+
+def build_ann_index(index: "VectorStoreIndex", mode: str = "auto") -> None:
+    """
+    Build the ANN index of the vector store so it is persisted with the index.
+
+    Args:
+        index: The index whose vector store is indexed
+        mode: "on" to always build, "off" to never build, "auto" to build only
+            for indexes with at least ANN_MIN_NODES nodes
+    """
+    vector_store = index.vector_store
+    if not hasattr(vector_store, "build_ann"):
+        if mode == "on":
+            print("Warning: The ANN index requires the memory-mapped vector store. Rebuild the index with --full-rebuild.")
+        return
+
+    node_count = vector_store.node_count
+    if mode == "off" or (mode == "auto" and node_count < ANN_MIN_NODES):
+        vector_store.drop_ann()
+        return
+
+    print(f"Building ANN index for {node_count} nodes...")
+    start_time = time.time()
+    vector_store.build_ann()
+    print(f"Built ANN index in {time.time() - start_time:.1f} seconds.")
 
 def index_code_repository(
     repo_path: str,
@@ -27,10 +130,28 @@ def index_code_repository(
     embedding_model_name: str = "codellama:latest",
     base_url: str = "http://127.0.0.1:11434",
     request_timeout: float = 60.0,
+    full_rebuild: bool = False,
+    embed_batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+    embed_concurrency: int = DEFAULT_EMBED_CONCURRENCY,
+    embedding_cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    ann: str = "auto",
+    on_unavailable: str = DEFAULT_UNAVAILABLE_POLICY,
+    dedup_similarity: Optional[float] = DEFAULT_DEDUP_SIMILARITY,
+    ignore: bool = True,
+    max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE,
 ) -> None:
     """
     Index a code repository and save it to a vector store.
 
+    A manifest of the indexed files (size, modification time, content hash and
+    node ids) is saved next to the index. When an index built with the same
+    settings already exists, only added or changed files are embedded and the
+    nodes of changed or removed files are deleted.
+
+    Duplicate and near-duplicate chunks of the indexed files are embedded and
+    stored once; the stored representative lists the other locations. A BM25
+    index of all nodes is saved with the index for lexical retrieval.
+
     Args:
         repo_path: Path to the code repository to index
         output_dir: Directory to save the index
@@ -39,6 +160,19 @@ def index_code_repository(
         embedding_model_name: Ollama model name to use for embeddings
         base_url: Base URL for Ollama API
         request_timeout: Timeout for API requests in seconds
+        full_rebuild: Ignore any existing index and re-embed every file
+        embed_batch_size: Number of nodes sent in one embedding request
+        embed_concurrency: Maximum number of embedding requests in flight
+        embedding_cache_dir: Directory of the shared embedding cache, or None to disable it
+        ann: Build the approximate nearest-neighbour index: "on", "off", or "auto"
+            (only for indexes with at least ANN_MIN_NODES nodes)
+        on_unavailable: "fail" to exit if the Ollama server cannot be reached,
+            or "continue" to go on anyway
+        dedup_similarity: Minimum similarity of near-duplicate chunks (1.0 for exact
+            duplicates only), or None to embed every chunk
+        ignore: Skip dependency, cache and minified files and the paths listed in
+            .gitignore and .reviewignore files
+        max_file_size: Skip files larger than this many bytes (no limit if None)
     """
     print(f"Creating index for repository '{repo_path}'...")
     print(f"Using Ollama API at: {base_url}")
@@ -54,21 +188,25 @@ def index_code_repository(
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
 
-    # Test connection to Ollama server
+    # Test connection to Ollama server while llama_index is imported and the files are compared with the index
+    health_check = HealthCheck(base_url)
+
+    from llama_index.core import Settings, VectorStoreIndex
+    from llama_index.core.node_parser import SentenceSplitter
     try:
-        import requests
-        version_response = requests.get(f"{base_url}/api/version", timeout=10)
-        if version_response.status_code == 200:
-            version_info = version_response.json()
-            print(f"Connected to Ollama server version: {version_info.get('version', 'unknown')}")
-        else:
-            print(f"Warning: Could not get Ollama server version. Status code: {version_response.status_code}")
-    except Exception as e:
-        print(f"Warning: Could not connect to Ollama server at {base_url}: {e}")
-        print("Please make sure Ollama is running and accessible.")
-        user_input = input("Do you want to continue anyway? (y/n): ")
-        if user_input.lower() != 'y':
-            sys.exit(1)
+        from embedding_pipeline import embed_nodes, with_embedding_cache, report_embedding_cache
+        from index_storage import new_storage_context, load_code_index
+        from code_splitter import CodeAwareSplitter, SPLITTER_VERSION
+        from chunk_dedup import deduplicate_nodes, report_dedup, remove_duplicate_locations
+        from lexical_index import BM25Index, build_lexical_index
+    except ImportError:
+        # If imported from a different directory
+        from code_review_assistant.embedding_pipeline import embed_nodes, with_embedding_cache, report_embedding_cache
+        from code_review_assistant.index_storage import new_storage_context, load_code_index
+        from code_review_assistant.code_splitter import CodeAwareSplitter, SPLITTER_VERSION
+        from code_review_assistant.chunk_dedup import deduplicate_nodes, report_dedup, remove_duplicate_locations
+        from code_review_assistant.lexical_index import BM25Index, build_lexical_index
+    Ollama, OllamaEmbedding = import_ollama_classes()
 
     # Set up Ollama models
     llm = Ollama(
@@ -79,61 +217,203 @@ def index_code_repository(
     embed_model = OllamaEmbedding(
         model_name=embedding_model_name,
         base_url=base_url,
-        request_timeout=request_timeout
+        request_timeout=request_timeout,
+        embed_batch_size=embed_batch_size,
     )
+    embed_model = with_embedding_cache(embed_model, embedding_cache_dir)
 
     # Update global settings
     Settings.llm = llm
     Settings.embed_model = embed_model
 
-    # Set up text splitter
-    text_splitter = SentenceSplitter(
-        chunk_size=1024,
-        chunk_overlap=100,
+    # Set up text splitter: code files are chunked on class, function and
+    # template-block boundaries, other files on sentences
+    text_splitter = CodeAwareSplitter(
+        chunk_size=CHUNK_SIZE,
+        fallback=SentenceSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP),
     )
 
-    # Load files
-    documents = []
-    if os.path.isfile(repo_path):
-        # Single file processing
+    # Settings that change the content of the index invalidate the manifest
+    index_settings = {
+        "embedding_model": embedding_model_name,
+        "file_extensions": sorted(file_extensions),
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "splitter": f"code-aware-{SPLITTER_VERSION}",
+    }
+
+    # Find the files to index and compare them with the existing index
+    oversized = []
+    with span("discover_files"):
+        file_paths = discover_files(
+            repo_path, file_extensions, ignore, max_file_size, lambda file_path, reason: oversized.append(file_path)
+        )
+    print(f"Found {len(file_paths)} files to index.")
+    if oversized:
+        print(f"Skipped {len(oversized)} files larger than {max_file_size // 1024} KB.")
+
+    manifest = None if full_rebuild else load_manifest(output_dir)
+    index = None
+    previous_lexical_index = None
+    if manifest is not None and manifest.get("settings") != index_settings:
+        print("Index settings have changed. Rebuilding the whole index.")
+        manifest = None
+    if manifest is not None:
         try:
-            with open(repo_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except UnicodeDecodeError:
-            # Try with Latin-1 encoding if UTF-8 fails
-            with open(repo_path, 'r', encoding='latin-1') as f:
-                content = f.read()
-
-        documents = [Document(text=content, metadata={"file_path": repo_path})]
-        print(f"Loaded single file: {repo_path}")
+            with span("index_load"):
+                index = load_code_index(output_dir)
+                previous_lexical_index = BM25Index.load(output_dir)
+        except Exception as e:
+            print(f"Warning: Could not load existing index from '{output_dir}': {e}")
+            print("Rebuilding the whole index.")
+            manifest = None
+
+    if manifest is None:
+        manifest = new_manifest(index_settings)
+        added, changed, removed, unchanged = file_paths, [], [], {}
     else:
-        # Directory processing
-        documents = SimpleDirectoryReader(
-            input_dir=repo_path,
-            recursive=True,
-            required_exts=file_extensions,
-            file_metadata=lambda file_path: {"file_path": file_path},
-        ).load_data()
-        print(f"Loaded {len(documents)} files from directory.")
+        with span("diff_manifest"):
+            added, changed, removed, unchanged = diff_manifest(manifest, file_paths)
+
+    print(f"Added: {len(added)}, changed: {len(changed)}, removed: {len(removed)}, unchanged: {len(unchanged)}")
+    health_check.wait(on_unavailable)
+
+    # Files whose duplicate chunks are represented by nodes that will be deleted
+    if index is not None:
+        dependent = find_dependent_files(manifest, changed + removed, unchanged)
+        if dependent:
+            print(f"Re-indexing {len(dependent)} unchanged files whose duplicate chunks were stored with changed files.")
+            for file_path in dependent:
+                del unchanged[file_path]
+            changed = sorted(changed + dependent)
+    if unchanged:
+        print(f"Skipped {len(unchanged)} unchanged files.")
+
+    # Delete the nodes of changed and removed files
+    if index is not None:
+        deleted_nodes = 0
+        with span("delete_nodes"):
+            for file_path in changed + removed:
+                entry = manifest["files"][file_path]
+                for doc_id in entry.get("doc_ids", []):
+                    index.delete_ref_doc(doc_id, delete_from_docstore=True)
+                deleted_nodes += len(entry.get("node_ids", []))
+            # Drop the old chunks of the files from the back-references of their representatives
+            for file_path in changed + removed:
+                remove_duplicate_locations(index.docstore, manifest["files"][file_path].get("duplicate_of", []), file_path)
+        if deleted_nodes:
+            print(f"Deleted {deleted_nodes} nodes of changed or removed files.")
+
+    # Load files
+    files_to_load = added + changed
+    with span("load_files"):
+        documents, hashes = load_documents(files_to_load, max_file_size)
+    count("files_loaded", len(files_to_load))
+    print(f"Loaded {len(documents)} documents from {len(files_to_load)} files.")
 
     # Split documents into nodes
-    nodes = text_splitter.get_nodes_from_documents(documents)
+    with span("split"):
+        nodes = text_splitter.get_nodes_from_documents(documents)
+    count("nodes", len(nodes))
     print(f"Created {len(nodes)} nodes.")
 
-    # Create index
-    index = VectorStoreIndex(nodes)
+    # Embed and store one representative of duplicate chunks
+    duplicates = []
+    if dedup_similarity is not None and nodes:
+        with span("dedup"):
+            result = deduplicate_nodes(nodes, dedup_similarity)
+        nodes, duplicates = result.representatives, result.duplicates
+        count("nodes_deduplicated", len(duplicates))
+        count("dedup_characters_saved", result.saved_characters)
+        report_dedup(result)
+
+    # Embed nodes in concurrent batches before adding them to the index
+    with span("embed"):
+        embed_nodes(nodes, embed_model, embed_batch_size, embed_concurrency)
+
+    # Create or update index
+    with span("index_insert"):
+        if index is None:
+            index = VectorStoreIndex(nodes, storage_context=new_storage_context())
+        elif nodes:
+            index.insert_nodes(nodes)
+
+    # Record the documents, nodes and represented duplicates of each loaded file
+    doc_ids = {file_path: [] for file_path in files_to_load}
+    node_ids = {file_path: [] for file_path in files_to_load}
+    duplicate_of = {file_path: [] for file_path in files_to_load}
+    for document in documents:
+        doc_ids.setdefault(document.metadata["file_path"], []).append(document.doc_id)
+    for node in nodes:
+        node_ids.setdefault(node.metadata["file_path"], []).append(node.node_id)
+    for duplicate, representative in duplicates:
+        duplicate_of.setdefault(duplicate.metadata["file_path"], []).append(representative.node_id)
+
+    manifest["files"] = dict(unchanged)
+    for file_path in files_to_load:
+        manifest["files"][file_path] = make_manifest_entry(
+            file_path, doc_ids[file_path], node_ids[file_path], duplicate_of[file_path], hashes.get(file_path)
+        )
+
+    # Build the approximate nearest-neighbour index
+    with span("build_ann"):
+        build_ann_index(index, ann)
+
+    # Build the BM25 index over all nodes for lexical and hybrid retrieval;
+    # only the nodes added by this run are tokenized
+    with span("build_lexical"):
+        lexical_index = build_lexical_index(index, previous_lexical_index)
+    print(f"Built BM25 index of {len(lexical_index.vocabulary)} terms for {lexical_index.node_count} nodes.")
 
     # Save index
-    index.storage_context.persist(persist_dir=output_dir)
+    with span("persist"):
+        index.storage_context.persist(persist_dir=output_dir)
+        lexical_index.save(output_dir)
+        save_manifest(output_dir, manifest)
     print(f"Saved index to '{output_dir}'.")
+    report_embedding_cache(embed_model)
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python index_code.py <repository_path> [output_directory] [base_url]")
-        sys.exit(1)
+def main(argv: Optional[List[str]] = None, prog: Optional[str] = None):
+    parser = argparse.ArgumentParser(prog=prog, description="Index a code repository for the code review assistant")
+    parser.add_argument("repo_path", help="Path to the code repository to index")
+    parser.add_argument("output_dir", nargs="?", default="./data", help="Directory to save the index")
+    parser.add_argument("base_url", nargs="?", default="http://127.0.0.1:11434", help="Base URL for Ollama API")
+    parser.add_argument("--full-rebuild", "-f", action="store_true", help="Ignore the existing index and re-embed every file")
+    parser.add_argument("--embed-batch-size", type=int, default=DEFAULT_EMBED_BATCH_SIZE, help="Number of nodes sent in one embedding request")
+    parser.add_argument("--embed-concurrency", type=int, default=DEFAULT_EMBED_CONCURRENCY, help="Maximum number of embedding requests in flight")
+    parser.add_argument("--embedding-cache-dir", default=DEFAULT_CACHE_DIR, help="Directory of the shared embedding cache")
+    parser.add_argument("--no-embedding-cache", action="store_true", help="Do not read or write the embedding cache")
+    parser.add_argument("--ann", choices=["auto", "on", "off"], default="auto",
+                        help=f"Build the approximate nearest-neighbour index (auto: only for {ANN_MIN_NODES}+ nodes)")
+    parser.add_argument("--dedup-similarity", type=float, default=DEFAULT_DEDUP_SIMILARITY,
+                        help=f"Minimum similarity of near-duplicate chunks, which are embedded once (1.0: exact duplicates only; default: {DEFAULT_DEDUP_SIMILARITY})")
+    parser.add_argument("--no-dedup", action="store_true", help="Embed every chunk, including duplicates")
+    parser.add_argument("--no-ignore", action="store_true",
+                        help="Also index dependency, cache and minified files and the paths listed in .gitignore/.reviewignore")
+    parser.add_argument("--max-file-kb", type=int, default=DEFAULT_MAX_FILE_SIZE // 1024,
+                        help=f"Skip files larger than this many KB, 0 for no limit (default: {DEFAULT_MAX_FILE_SIZE // 1024})")
+    parser.add_argument("--on-unavailable", choices=UNAVAILABLE_POLICIES, default=DEFAULT_UNAVAILABLE_POLICY,
+                        help="What to do when the Ollama server cannot be reached (default: fail)")
+    parser.add_argument("--metrics-file", help="Write the timing and token metrics of the run as JSON to this file")
+
+    args = parser.parse_args(argv)
 
-    repo_path = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else "./data"
-    base_url = sys.argv[3] if len(sys.argv) > 3 else "http://127.0.0.1:11434"
+    start_run("index_code")
+    index_code_repository(
+        args.repo_path,
+        args.output_dir,
+        base_url=args.base_url,
+        full_rebuild=args.full_rebuild,
+        embed_batch_size=args.embed_batch_size,
+        embed_concurrency=args.embed_concurrency,
+        embedding_cache_dir=None if args.no_embedding_cache else args.embedding_cache_dir,
+        ann=args.ann,
+        on_unavailable=args.on_unavailable,
+        dedup_similarity=None if args.no_dedup else args.dedup_similarity,
+        ignore=not args.no_ignore,
+        max_file_size=args.max_file_kb * 1024 or None,
+    )
+    finish_run(args.metrics_file)
 
-    index_code_repository(repo_path, output_dir, base_url=base_url)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import hashlib
+from typing import Callable, List, Dict, Any, Optional, Tuple
+
+# Import the repository walker
+try:
+    from file_loader import walk_files, DEFAULT_MAX_FILE_SIZE
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.file_loader import walk_files, DEFAULT_MAX_FILE_SIZE
+
+MANIFEST_FILENAME = "file_manifest.json"
+MANIFEST_VERSION = 1
+
+def get_manifest_path(output_dir: str) -> str:
+    """Return the path of the file manifest stored next to the index
+
+    Args:
+        output_dir: Directory where the index is stored
+
+    Returns:
+        Path to the manifest file
+    """
+    return os.path.join(output_dir, MANIFEST_FILENAME)
+
+def load_manifest(output_dir: str) -> Optional[Dict[str, Any]]:
+    """Load the file manifest of an existing index
+
+    Args:
+        output_dir: Directory where the index is stored
+
+    Returns:
+        The manifest dictionary, or None if it does not exist or cannot be read
+    """
+    manifest_path = get_manifest_path(output_dir)
+    if not os.path.exists(manifest_path):
+        return None
+
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read index manifest '{manifest_path}': {e}")
+        return None
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+def save_manifest(output_dir: str, manifest: Dict[str, Any]) -> None:
+    """Save the file manifest next to the index
+
+    The manifest is written to a temporary file first so an interrupted run
+    never leaves a truncated manifest behind.
+
+    Args:
+        output_dir: Directory where the index is stored
+        manifest: The manifest dictionary to save
+    """
+    manifest_path = get_manifest_path(output_dir)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+def new_manifest(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Create an empty manifest for the given index settings
+
+    Args:
+        settings: Settings that affect the content of the index (models, chunking, ...)
+
+    Returns:
+        An empty manifest dictionary
+    """
+    return {
+        "version": MANIFEST_VERSION,
+        "settings": settings,
+        "files": {},
+    }
+
+def compute_file_hash(file_path: str) -> str:
+    """Compute the SHA-256 hash of a file's content
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def discover_files(
+    repo_path: str,
+    file_extensions: List[str],
+    ignore: bool = True,
+    max_size: Optional[int] = DEFAULT_MAX_FILE_SIZE,
+    on_skip: Optional[Callable[[str, str], None]] = None,
+) -> List[str]:
+    """List the files of a repository that should be indexed
+
+    Hidden files and directories, files matched by the ignore files and files
+    over the size cap are skipped (see file_loader.walk_files).
+
+    Args:
+        repo_path: Path to the repository or a single file
+        file_extensions: List of file extensions to index
+        ignore: Apply the default ignore patterns and the .gitignore/.reviewignore files
+        max_size: Skip files larger than this many bytes (no limit if None)
+        on_skip: Called with the path and the reason of each file skipped for its size
+
+    Returns:
+        Sorted list of file paths
+    """
+    # Imported here so the analyzer, which only needs compute_file_hash, starts faster
+    from pathlib import Path
+
+    file_paths = walk_files(repo_path, file_extensions, ignore, max_size, on_skip)
+    return sorted(str(Path(file_path)) for file_path in file_paths)
+
+def diff_manifest(
+    manifest: Dict[str, Any],
+    file_paths: List[str],
+) -> Tuple[List[str], List[str], List[str], Dict[str, Dict[str, Any]]]:
+    """Compare the current files with the manifest of the existing index
+
+    Files whose size and modification time are unchanged are treated as
+    unchanged without being read. Other files are hashed, so a file that was
+    only touched is still recognised as unchanged.
+
+    Args:
+        manifest: The manifest of the existing index
+        file_paths: The files currently found in the repository
+
+    Returns:
+        Tuple of (added, changed, removed, unchanged) where unchanged maps each
+        unchanged file path to its refreshed manifest entry
+    """
+    known_files = manifest.get("files", {})
+    added, changed, unchanged = [], [], {}
+
+    for file_path in file_paths:
+        entry = known_files.get(file_path)
+        if entry is None:
+            added.append(file_path)
+            continue
+
+        stat = os.stat(file_path)
+        if entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime:
+            unchanged[file_path] = entry
+            continue
+
+        if entry.get("sha256") == compute_file_hash(file_path):
+            unchanged[file_path] = dict(entry, size=stat.st_size, mtime=stat.st_mtime)
+        else:
+            changed.append(file_path)
+
+    current = set(file_paths)
+    removed = sorted(path for path in known_files if path not in current)
+
+    return added, changed, removed, unchanged
+
+def make_manifest_entry(
+    file_path: str,
+    doc_ids: List[str],
+    node_ids: List[str],
+    duplicate_of: Optional[List[str]] = None,
+    sha256: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Create the manifest entry of an indexed file
+
+    Args:
+        file_path: Path to the indexed file
+        doc_ids: Ids of the documents loaded from the file
+        node_ids: Ids of the nodes created from the file
+        duplicate_of: Ids of the nodes of other files that represent the file's duplicate chunks
+        sha256: Hash of the content already read, so the file is not read again
+
+    Returns:
+        Manifest entry dictionary
+    """
+    stat = os.stat(file_path)
+    return {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha256": sha256 or compute_file_hash(file_path),
+        "doc_ids": doc_ids,
+        "node_ids": node_ids,
+        "duplicate_of": duplicate_of or [],
+    }
+
+def find_dependent_files(
+    manifest: Dict[str, Any],
+    deleted_files: List[str],
+    unchanged: Dict[str, Dict[str, Any]],
+) -> List[str]:
+    """Find unchanged files whose duplicate chunks are represented by deleted nodes
+
+    The duplicate chunks of a file are not stored; a node of another file
+    represents them. When that file changes or is removed, its nodes are
+    deleted and the dependent files must be indexed again. Indexing them
+    again deletes their nodes too, so the search repeats until no file is added.
+
+    Args:
+        manifest: The manifest of the existing index
+        deleted_files: Changed and removed files whose nodes are deleted
+        unchanged: Unchanged files and their manifest entries
+
+    Returns:
+        Sorted list of the unchanged files to index again
+    """
+    files = manifest.get("files", {})
+    deleted_node_ids = {node_id for file_path in deleted_files for node_id in files[file_path].get("node_ids", [])}
+    dependent = set()
+    found = True
+    while found:
+        found = False
+        for file_path, entry in unchanged.items():
+            if file_path in dependent or deleted_node_ids.isdisjoint(entry.get("duplicate_of", [])):
+                continue
+            dependent.add(file_path)
+            deleted_node_ids.update(entry.get("node_ids", []))
+            found = True
+    return sorted(dependent)
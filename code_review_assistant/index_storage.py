@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from llama_index.core import StorageContext, load_index_from_storage
+from llama_index.core.indices.base import BaseIndex
+
+# Import the memory-mapped vector store and the default search width
+try:
+    from vector_store import MemmapVectorStore, has_memmap_vector_store
+    from defaults import DEFAULT_NPROBE
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.vector_store import MemmapVectorStore, has_memmap_vector_store
+    from code_review_assistant.defaults import DEFAULT_NPROBE
+
+def new_storage_context() -> StorageContext:
+    """Create the storage context for a new index
+
+    Returns:
+        A storage context backed by a MemmapVectorStore
+    """
+    return StorageContext.from_defaults(vector_store=MemmapVectorStore())
+
+def load_storage_context(index_dir: str, nprobe: int = DEFAULT_NPROBE) -> StorageContext:
+    """Load the storage context of a persisted index
+
+    Indexes created before the memory-mapped vector store was introduced are
+    loaded with the default JSON vector store.
+
+    Args:
+        index_dir: Directory where the index is stored
+        nprobe: Number of ANN inverted lists scanned per query (0 for exact search)
+
+    Returns:
+        The loaded storage context
+    """
+    if has_memmap_vector_store(index_dir):
+        vector_store = MemmapVectorStore.from_persist_dir(index_dir, nprobe=nprobe)
+        return StorageContext.from_defaults(persist_dir=index_dir, vector_store=vector_store)
+
+    print(f"Note: '{index_dir}' uses the JSON vector store. Rebuild the index with --full-rebuild for faster loading.")
+    return StorageContext.from_defaults(persist_dir=index_dir)
+
+def load_code_index(index_dir: str, nprobe: int = DEFAULT_NPROBE) -> BaseIndex:
+    """Load a persisted code index
+
+    Args:
+        index_dir: Directory where the index is stored
+        nprobe: Number of ANN inverted lists scanned per query (0 for exact search)
+
+    Returns:
+        The loaded index
+    """
+    return load_index_from_storage(load_storage_context(index_dir, nprobe))
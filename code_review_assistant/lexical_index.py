@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import math
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import BaseNode, MetadataMode, NodeWithScore, QueryBundle
+
+# Import the node id fingerprint shared with the ANN index
+try:
+    from ann_index import fingerprint_node_ids
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.ann_index import fingerprint_node_ids
+
+# Import the retrieval modes
+try:
+    from defaults import RETRIEVAL_MODES, DEFAULT_RETRIEVAL_MODE
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.defaults import RETRIEVAL_MODES, DEFAULT_RETRIEVAL_MODE
+
+LEXICAL_FILENAME = "bm25_index.npz"
+LEXICAL_VERSION = 1
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Longer tokens are base64 blobs, hashes and the like
+MAX_TOKEN_LENGTH = 64
+# Rank constant of reciprocal rank fusion; larger values flatten the rank differences
+RRF_K = 60
+# Each ranking contributes this many times the requested number of nodes to the fusion
+HYBRID_CANDIDATE_FACTOR = 4
+
+WORD_PATTERN = re.compile(r"\w+")
+# Parts of camelCase, PascalCase and snake_case identifiers
+SUBWORD_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+STOPWORDS = frozenset("""
+a an and are as at be by do does for from how in is it of on or the to was
+what when where which who why with
+""".split())
+
+@lru_cache(maxsize=1 << 16)
+def word_terms(word: str) -> Tuple[str, ...]:
+    """Return the search terms of one word: the word and its identifier parts, lowercased"""
+    if len(word) > MAX_TOKEN_LENGTH:
+        return ()
+    lower = word.lower()
+    terms = [lower] if len(lower) > 1 and lower not in STOPWORDS else []
+    parts = SUBWORD_PATTERN.findall(word)
+    if len(parts) > 1:
+        terms.extend(part.lower() for part in parts if len(part) > 1 and part.lower() not in STOPWORDS)
+    return tuple(terms)
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase search terms
+
+    Identifiers are indexed whole and by their camelCase and snake_case
+    parts, so `beforeFilter` matches "beforefilter", "before" and "filter".
+
+    Args:
+        text: Code or query text
+
+    Returns:
+        The terms in order, with repeats
+    """
+    terms = []
+    for word in WORD_PATTERN.findall(text):
+        terms.extend(word_terms(word))
+    return terms
+
+def node_search_text(node: BaseNode) -> str:
+    """Return the text of a node that is indexed for lexical search: its content, file path and symbol"""
+    metadata = node.metadata
+    return "\n".join([
+        node.get_content(metadata_mode=MetadataMode.NONE),
+        metadata.get("file_path", ""),
+        metadata.get("symbol") or "",
+    ])
+
+class BM25Index:
+    """Inverted index scoring nodes with Okapi BM25
+
+    Each term has a postings list of (row, term frequency) pairs, stored as
+    flat arrays grouped by term like the inverted lists of the ANN index. The
+    vocabulary is kept sorted, so a term is found by bisection without
+    building a dictionary when the index is loaded.
+    """
+
+    def __init__(
+        self,
+        node_ids: List[str],
+        vocabulary: List[str],
+        offsets: np.ndarray,
+        rows: np.ndarray,
+        frequencies: np.ndarray,
+        lengths: np.ndarray,
+    ):
+        """Initialize the index from its arrays
+
+        Args:
+            node_ids: The node id of each row
+            vocabulary: The terms in sorted order
+            offsets: Start offset of each term's postings (length len(vocabulary) + 1)
+            rows: Row numbers of the postings, grouped by term
+            frequencies: Term frequency of each posting
+            lengths: Number of terms of each row
+        """
+        self.node_ids = node_ids
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.rows = rows
+        self.frequencies = frequencies
+        self.lengths = lengths
+        self.average_length = float(lengths.mean()) if lengths.size else 0.0
+        self.fingerprint = fingerprint_node_ids(node_ids)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    @classmethod
+    def build(
+        cls,
+        node_ids: List[str],
+        get_text: Callable[[str], str],
+        previous: Optional["BM25Index"] = None,
+    ) -> "BM25Index":
+        """Build the index over the texts of the nodes
+
+        Node text never changes for a node id, so the postings of nodes that
+        are already in `previous` are copied instead of tokenizing them again.
+
+        Args:
+            node_ids: The ids of the nodes, in row order
+            get_text: Returns the text of a node id
+            previous: Index of an earlier build to reuse postings from
+
+        Returns:
+            The built index
+        """
+        term_ids: Dict[str, int] = {}
+        posting_terms, posting_rows, posting_frequencies = array('i'), array('i'), array('i')
+        lengths = np.zeros(len(node_ids), dtype=np.float32)
+        previous_rows = {node_id: row for row, node_id in enumerate(previous.node_ids)} if previous else {}
+        # Row of each node of the previous index in this one (-1 if it was removed)
+        moved_rows = np.full(len(previous_rows), -1, dtype=np.int64)
+        for row, node_id in enumerate(node_ids):
+            previous_row = previous_rows.get(node_id)
+            if previous_row is not None:
+                moved_rows[previous_row] = row
+                lengths[row] = previous.lengths[previous_row]
+                continue
+            counts = Counter(tokenize(get_text(node_id)))
+            lengths[row] = sum(counts.values())
+            for term, frequency in counts.items():
+                posting_terms.append(term_ids.setdefault(term, len(term_ids)))
+                posting_rows.append(row)
+                posting_frequencies.append(frequency)
+
+        terms = np.frombuffer(posting_terms, dtype=np.int32).astype(np.int64)
+        rows = np.frombuffer(posting_rows, dtype=np.int32).astype(np.int64)
+        frequencies = np.frombuffer(posting_frequencies, dtype=np.int32)
+        if previous is not None and previous.rows.size:
+            previous_terms = np.repeat(np.arange(len(previous.vocabulary)), np.diff(previous.offsets))
+            kept_rows = moved_rows[previous.rows]
+            keep = kept_rows >= 0
+            term_map = np.array([term_ids.setdefault(term, len(term_ids)) for term in previous.vocabulary], dtype=np.int64)
+            terms = np.concatenate((terms, term_map[previous_terms[keep]]))
+            rows = np.concatenate((rows, kept_rows[keep]))
+            frequencies = np.concatenate((frequencies, previous.frequencies[keep]))
+
+        # Renumber the terms that still have postings in sorted order and group the postings by term
+        counts = np.bincount(terms, minlength=len(term_ids))
+        vocabulary = sorted(term for term, term_id in term_ids.items() if counts[term_id])
+        rank = np.full(len(term_ids), -1, dtype=np.int64)
+        rank[[term_ids[term] for term in vocabulary]] = np.arange(len(vocabulary))
+        terms = rank[terms]
+        order = np.lexsort((rows, terms))
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(terms, minlength=len(vocabulary))))).astype(np.int64)
+
+        return cls(
+            list(node_ids),
+            vocabulary,
+            offsets,
+            rows[order].astype(np.int32),
+            frequencies[order].astype(np.int32),
+            lengths,
+        )
+
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the rows and term frequencies of a term (empty if it is unknown)"""
+        i = bisect_left(self.vocabulary, term)
+        if i == len(self.vocabulary) or self.vocabulary[i] != term:
+            return self.rows[:0], self.frequencies[:0]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.rows[start:end], self.frequencies[start:end]
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Find the nodes with the highest BM25 scores for a query
+
+        Args:
+            query: The query text
+            k: Number of results
+
+        Returns:
+            (node id, score) pairs in descending score order; nodes that match
+            no query term are not returned
+        """
+        if not self.node_ids or k <= 0:
+            return []
+
+        scores = np.zeros(len(self.node_ids), dtype=np.float32)
+        norms = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths / max(self.average_length, 1.0))
+        for term in dict.fromkeys(tokenize(query)):
+            rows, frequencies = self._postings(term)
+            if not rows.size:
+                continue
+            idf = math.log(1 + (len(self.node_ids) - rows.size + 0.5) / (rows.size + 0.5))
+            scores[rows] += idf * frequencies * (BM25_K1 + 1) / (frequencies + norms[rows])
+
+        matched = np.flatnonzero(scores > 0)
+        if matched.size > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(self.node_ids[row], float(scores[row])) for row in matched]
+
+    def save(self, persist_dir: str) -> None:
+        """Save the index next to the other index files
+
+        Args:
+            persist_dir: Directory where the index is stored
+        """
+        path = os.path.join(persist_dir, LEXICAL_FILENAME)
+        with open(path + ".tmp", 'wb') as f:
+            np.savez(
+                f,
+                version=np.array(LEXICAL_VERSION),
+                node_ids=np.array("\n".join(self.node_ids)),
+                vocabulary=np.array("\n".join(self.vocabulary)),
+                offsets=self.offsets,
+                rows=self.rows,
+                frequencies=self.frequencies,
+                lengths=self.lengths,
+            )
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, persist_dir: str) -> Optional["BM25Index"]:
+        """Load a saved index
+
+        Args:
+            persist_dir: Directory where the index is stored
+
+        Returns:
+            The loaded index, or None if there is none or it has another version
+        """
+        path = os.path.join(persist_dir, LEXICAL_FILENAME)
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path) as data:
+            if int(data["version"]) != LEXICAL_VERSION:
+                return None
+            node_ids = str(data["node_ids"])
+            vocabulary = str(data["vocabulary"])
+            return cls(
+                node_ids.split("\n") if node_ids else [],
+                vocabulary.split("\n") if vocabulary else [],
+                data["offsets"],
+                data["rows"],
+                data["frequencies"],
+                data["lengths"],
+            )
+
+def index_node_ids(index) -> List[str]:
+    """Return the ids of the nodes of a vector store index, in insertion order"""
+    return list(index.index_struct.nodes_dict.values())
+
+def build_lexical_index(index, previous: Optional[BM25Index] = None) -> BM25Index:
+    """Build the BM25 index over the nodes of a vector store index
+
+    Args:
+        index: The vector store index
+        previous: BM25 index of the previous indexing run, whose postings are
+            reused for the nodes that were kept
+
+    Returns:
+        The built index
+    """
+    docstore = index.docstore
+    return BM25Index.build(
+        index_node_ids(index), lambda node_id: node_search_text(docstore.get_node(node_id)), previous
+    )
+
+def load_lexical_index(index, persist_dir: str) -> Optional[BM25Index]:
+    """Load the BM25 index saved with a vector store index
+
+    Args:
+        index: The loaded vector store index
+        persist_dir: Directory where the index is stored
+
+    Returns:
+        The BM25 index, or None if there is none or it does not cover the nodes of the index
+    """
+    lexical_index = BM25Index.load(persist_dir)
+    if lexical_index is not None and lexical_index.fingerprint != fingerprint_node_ids(index_node_ids(index)):
+        print("Warning: BM25 index does not match the vector index. Rebuild the index to use lexical retrieval.")
+        return None
+    return lexical_index
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Fuse rankings by summing 1 / (k + rank) over the rankings that contain each id
+
+    Args:
+        rankings: Lists of ids, best first
+        k: Rank constant
+
+    Returns:
+        (id, fused score) pairs in descending score order
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, node_id in enumerate(ranking, start=1):
+            scores[node_id] = scores.get(node_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+class HybridRetriever(BaseRetriever):
+    """Retriever combining vector search with BM25 search
+
+    In "vector" mode only the vector retriever is used. In "lexical" mode
+    nodes are ranked by BM25 alone, so retrieval needs no query embedding;
+    if no node contains a query term the vector retriever is used instead.
+    In "hybrid" mode both rankings are fused with reciprocal rank fusion, so
+    exact identifier matches and semantically similar code both surface.
+    """
+
+    def __init__(self, index, lexical_index: Optional[BM25Index], mode: str = DEFAULT_RETRIEVAL_MODE, similarity_top_k: int = 5):
+        """Create the retriever
+
+        Args:
+            index: The vector store index
+            lexical_index: The BM25 index of the same nodes, or None to use vector search only
+            mode: "vector", "hybrid" or "lexical"
+            similarity_top_k: Number of nodes retrieved
+        """
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}'. Choose from: {', '.join(RETRIEVAL_MODES)}")
+        super().__init__()
+        self.index = index
+        self.lexical_index = lexical_index
+        self.mode = mode if lexical_index is not None else "vector"
+        self.similarity_top_k = similarity_top_k
+
+    def _vector_retrieve(self, query_bundle: QueryBundle, k: int) -> List[NodeWithScore]:
+        return self.index.as_retriever(similarity_top_k=k).retrieve(query_bundle)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        if self.mode == "vector":
+            return self._vector_retrieve(query_bundle, self.similarity_top_k)
+
+        docstore = self.index.docstore
+        if self.mode == "lexical":
+            matches = self.lexical_index.search(query_bundle.query_str, self.similarity_top_k)
+            if not matches:
+                return self._vector_retrieve(query_bundle, self.similarity_top_k)
+            return [NodeWithScore(node=docstore.get_node(node_id), score=score) for node_id, score in matches]
+
+        candidates = self.similarity_top_k * HYBRID_CANDIDATE_FACTOR
+        vector_nodes = self._vector_retrieve(query_bundle, candidates)
+        lexical_ids = [node_id for node_id, _ in self.lexical_index.search(query_bundle.query_str, candidates)]
+        nodes = {result.node.node_id: result.node for result in vector_nodes}
+        fused = reciprocal_rank_fusion([[result.node.node_id for result in vector_nodes], lexical_ids])
+        return [
+            NodeWithScore(node=nodes.get(node_id) or docstore.get_node(node_id), score=score)
+            for node_id, score in fused[:self.similarity_top_k]
+        ]
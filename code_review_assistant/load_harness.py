@@ -0,0 +1,404 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable
+
+# Import the fake Ollama server
+try:
+    from fake_ollama import (
+        start_fake_ollama, DEFAULT_LATENCY, DEFAULT_TOKENS_PER_SECOND,
+        DEFAULT_RESPONSE_TOKENS, DEFAULT_EMBEDDING_DIM,
+    )
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.fake_ollama import (
+        start_fake_ollama, DEFAULT_LATENCY, DEFAULT_TOKENS_PER_SECOND,
+        DEFAULT_RESPONSE_TOKENS, DEFAULT_EMBEDDING_DIM,
+    )
+
+# Import the tools driven by the harness
+try:
+    from index_code import index_code_repository
+    from query_service import QuerySession
+    from code_review import ReviewSession, review_file
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.index_code import index_code_repository
+    from code_review_assistant.query_service import QuerySession
+    from code_review_assistant.code_review import ReviewSession, review_file
+
+PHASES = ["index", "query", "review"]
+DEFAULT_QUERIES = 20
+DEFAULT_REVIEWS = 6
+DEFAULT_CONCURRENCY = 2
+REVIEW_EXTENSIONS = (".php", ".ctp", ".js")
+
+# Queries sent in the query phase, in turn
+QUERIES = [
+    "Where is user input validated before it is saved?",
+    "Which controllers render views without escaping output?",
+    "How are database queries built in the models?",
+    "Which components are loaded by the controllers?",
+    "Where is the session used to show flash messages?",
+]
+
+def percentile(values: List[float], pct: float) -> float:
+    """Return a percentile of a list of values, interpolating between ranks
+
+    Args:
+        values: The values
+        pct: Percentile between 0 and 100
+
+    Returns:
+        The percentile, or 0.0 for an empty list
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+def summarize(latencies: List[float], elapsed: float, errors: int) -> Dict[str, Any]:
+    """Summarize the latencies of a phase
+
+    Args:
+        latencies: Seconds taken by each successful operation
+        elapsed: Wall-clock seconds of the whole phase
+        errors: Number of failed operations
+
+    Returns:
+        Dictionary with the operation count, throughput and latency percentiles
+    """
+    return {
+        "operations": len(latencies),
+        "errors": errors,
+        "elapsed_seconds": elapsed,
+        "throughput_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p90": percentile(latencies, 90),
+        "latency_p99": percentile(latencies, 99),
+        "latency_max": max(latencies) if latencies else 0.0,
+    }
+
+def run_concurrently(operation: Callable[[int], Dict[str, float]], count: int, concurrency: int) -> Dict[str, Any]:
+    """Run an operation `count` times with up to `concurrency` in flight
+
+    Args:
+        operation: Function of the operation number returning its timings
+            (at least "latency")
+        count: Number of operations
+        concurrency: Maximum number of operations in flight
+
+    Returns:
+        Phase summary, with the percentiles of every timing the operations return
+    """
+    timings = {}
+    errors = []
+
+    def run(number: int):
+        try:
+            return operation(number)
+        except Exception as e:
+            errors.append(str(e))
+            return None
+
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for result in executor.map(run, range(count)):
+            if result is not None:
+                for name, value in result.items():
+                    timings.setdefault(name, []).append(value)
+    elapsed = time.time() - start_time
+
+    summary = summarize(timings.pop("latency", []), elapsed, len(errors))
+    for name, values in timings.items():
+        summary[f"{name}_p50"] = percentile(values, 50)
+        summary[f"{name}_p90"] = percentile(values, 90)
+    if errors:
+        summary["first_error"] = errors[0]
+    return summary
+
+def find_review_files(repo_path: str, limit: int) -> List[str]:
+    """Find the files to review in a repository
+
+    Args:
+        repo_path: Path of the repository
+        limit: Maximum number of files
+
+    Returns:
+        Paths of up to `limit` PHP, template and JavaScript files, sorted
+    """
+    found = []
+    for root, dirs, files in os.walk(repo_path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for file in sorted(files):
+            if file.endswith(REVIEW_EXTENSIONS):
+                found.append(os.path.join(root, file))
+    return found[:limit]
+
+class FakeServerStats:
+    """Request counters of an in-process fake server, measured per phase"""
+
+    def __init__(self, server):
+        self.server = server
+        self._before = None
+
+    def start(self) -> None:
+        if self.server is not None:
+            self._before = self.server.stats()
+
+    def delta(self) -> Optional[Dict[str, Any]]:
+        """Return the requests, embedded inputs and generated tokens since start()"""
+        if self.server is None or self._before is None:
+            return None
+        after = self.server.stats()
+        requests = {
+            endpoint: count - self._before["requests"].get(endpoint, 0)
+            for endpoint, count in after["requests"].items()
+            if count - self._before["requests"].get(endpoint, 0)
+        }
+        return {
+            "requests": requests,
+            "embedded_inputs": after["embedded_inputs"] - self._before["embedded_inputs"],
+            "generated_tokens": after["generated_tokens"] - self._before["generated_tokens"],
+        }
+
+def run_index_phase(repo_path: str, index_dir: str, base_url: str) -> Dict[str, Any]:
+    """Build the index of a repository from scratch and time it"""
+    start_time = time.time()
+    index_code_repository(
+        repo_path,
+        index_dir,
+        base_url=base_url,
+        full_rebuild=True,
+        embedding_cache_dir=None,
+    )
+    elapsed = time.time() - start_time
+    return summarize([elapsed], elapsed, 0)
+
+def run_query_phase(index_dir: str, base_url: str, count: int, concurrency: int) -> Dict[str, Any]:
+    """Send queries through a query session and time them"""
+    session = QuerySession(index_dir, base_url=base_url, embedding_cache_dir=None, answer_cache_dir=None)
+
+    def query(number: int) -> Dict[str, float]:
+        result = session.query(QUERIES[number % len(QUERIES)], on_token=lambda token: None)
+        return {
+            "latency": result["elapsed_seconds"],
+            "time_to_first_token": result["time_to_first_token_seconds"],
+        }
+
+    return run_concurrently(query, count, concurrency)
+
+def run_review_phase(
+    index_dir: str,
+    base_url: str,
+    review_paths: List[str],
+    count: int,
+    concurrency: int
+) -> Dict[str, Any]:
+    """Review files through a review session and time them"""
+    session = ReviewSession(index_dir, base_url=base_url, embedding_cache_dir=None, analysis_cache_dir=None)
+
+    def review(number: int) -> Dict[str, float]:
+        start_time = time.time()
+        review_file(review_paths[number % len(review_paths)], session, io.StringIO())
+        return {"latency": time.time() - start_time}
+
+    return run_concurrently(review, count, concurrency)
+
+def format_report(results: Dict[str, Any]) -> str:
+    """Format the phase summaries as a table
+
+    Args:
+        results: Results of run_harness
+
+    Returns:
+        The formatted table
+    """
+    output = [
+        f"{'phase':<8} {'ops':>5} {'errors':>6} {'seconds':>9} {'ops/s':>8} "
+        f"{'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    ]
+    for phase, summary in results["phases"].items():
+        output.append(
+            f"{phase:<8} {summary['operations']:>5} {summary['errors']:>6} {summary['elapsed_seconds']:>9.2f} "
+            f"{summary['throughput_per_second']:>8.2f} {summary['latency_p50'] * 1000:>9.1f} "
+            f"{summary['latency_p90'] * 1000:>9.1f} {summary['latency_p99'] * 1000:>9.1f} "
+            f"{summary['latency_max'] * 1000:>9.1f}"
+        )
+        if "time_to_first_token_p50" in summary:
+            output.append(
+                f"{'':<8} time to first token: p50 {summary['time_to_first_token_p50'] * 1000:.1f} ms, "
+                f"p90 {summary['time_to_first_token_p90'] * 1000:.1f} ms"
+            )
+        if "first_error" in summary:
+            output.append(f"{'':<8} first error: {summary['first_error']}")
+        server = summary.get("server")
+        if server:
+            output.append(
+                f"{'':<8} server: {server['requests']}, {server['embedded_inputs']} embedded inputs, "
+                f"{server['generated_tokens']} generated tokens"
+            )
+    return "\n".join(output)
+
+def run_harness(
+    repo_path: str,
+    phases: List[str],
+    base_url: Optional[str] = None,
+    index_dir: Optional[str] = None,
+    queries: int = DEFAULT_QUERIES,
+    reviews: int = DEFAULT_REVIEWS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    review_paths: Optional[List[str]] = None,
+    server_options: Optional[Dict[str, Any]] = None,
+    verbose: bool = False
+) -> Dict[str, Any]:
+    """Drive indexing, querying and reviewing against an Ollama server
+
+    Args:
+        repo_path: Repository to index and review
+        phases: Phases to run, in order ("index", "query", "review")
+        base_url: Ollama server to use, or None to start a fake one in-process
+        index_dir: Directory of the index, or None for a temporary directory
+            (the query and review phases need an index, so then "index" runs first)
+        queries: Number of queries of the query phase
+        reviews: Number of reviews of the review phase
+        concurrency: Maximum number of queries or reviews in flight
+        review_paths: Files to review, or None to pick some from the repository
+        server_options: Options of the fake server (latency, tokens_per_second, ...)
+        verbose: Show the output of the driven tools
+
+    Returns:
+        Machine-readable results with a summary per phase
+    """
+    server = None
+    if base_url is None:
+        server = start_fake_ollama(**(server_options or {}))
+        base_url = server.base_url
+    server_stats = FakeServerStats(server)
+
+    results = {
+        "harness": "ollama_load",
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "base_url": base_url,
+        "fake_server": dict(server_options or {}) if server is not None else None,
+        "config": {"repo_path": repo_path, "queries": queries, "reviews": reviews, "concurrency": concurrency},
+        "phases": {},
+    }
+
+    temp_dir = None
+    if index_dir is None:
+        temp_dir = tempfile.TemporaryDirectory(prefix="load_harness_")
+        index_dir = temp_dir.name
+        if "index" not in phases:
+            phases = ["index"] + list(phases)
+
+    if "review" in phases and not review_paths:
+        review_paths = find_review_files(repo_path, max(1, reviews))
+
+    try:
+        for phase in PHASES:
+            if phase not in phases:
+                continue
+            print(f"Running {phase} phase...", file=sys.stderr)
+            server_stats.start()
+            # The driven tools print progress; keep the report readable
+            with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+                if phase == "index":
+                    summary = run_index_phase(repo_path, index_dir, base_url)
+                elif phase == "query":
+                    summary = run_query_phase(index_dir, base_url, queries, concurrency)
+                elif not review_paths:
+                    print(f"Warning: No files to review in '{repo_path}'.", file=sys.stderr)
+                    continue
+                else:
+                    summary = run_review_phase(index_dir, base_url, review_paths, reviews, concurrency)
+            summary["server"] = server_stats.delta()
+            results["phases"][phase] = summary
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+    return results
+
+def main():
+    """Main function to run the load harness from command line"""
+    default_repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description="Load test indexing, queries and reviews against a (fake) Ollama server")
+    parser.add_argument("repo_path", nargs="?", default=default_repo, help="Repository to index and review")
+    parser.add_argument("--phases", default=",".join(PHASES),
+                        help="Comma-separated phases to run (index, query, review)")
+    parser.add_argument("--base-url", "-u",
+                        help="Ollama server to load (default: start a fake server in-process)")
+    parser.add_argument("--index-dir", help="Index directory to use and keep (default: a temporary directory)")
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES, help="Number of queries")
+    parser.add_argument("--reviews", type=int, default=DEFAULT_REVIEWS, help="Number of file reviews")
+    parser.add_argument("--concurrency", "-c", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Maximum number of queries or reviews in flight")
+    parser.add_argument("--review-files", nargs="+", help="Files to review (default: PHP, template and JS files of the repository)")
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY, help="Fake server: seconds before each answer")
+    parser.add_argument("--tokens-per-second", type=float, default=DEFAULT_TOKENS_PER_SECOND,
+                        help="Fake server: generation speed (0 for no pacing)")
+    parser.add_argument("--response-tokens", type=int, default=DEFAULT_RESPONSE_TOKENS,
+                        help="Fake server: tokens of each generated response")
+    parser.add_argument("--embedding-dim", type=int, default=DEFAULT_EMBEDDING_DIM,
+                        help="Fake server: number of dimensions of the embeddings")
+    parser.add_argument("--output", "-o", help="Write the results as JSON to this file")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Show the output of the driven tools")
+    args = parser.parse_args()
+
+    phases = [phase.strip() for phase in args.phases.split(",") if phase.strip()]
+    unknown = [phase for phase in phases if phase not in PHASES]
+    if unknown or not phases:
+        print(f"Error: Unknown phases: {', '.join(unknown) or '(none)'}. Choose from: {', '.join(PHASES)}")
+        sys.exit(1)
+    if not os.path.isdir(args.repo_path):
+        print(f"Error: Repository '{args.repo_path}' not found.")
+        sys.exit(1)
+
+    server_options = {
+        "latency": args.latency,
+        "tokens_per_second": args.tokens_per_second,
+        "response_tokens": args.response_tokens,
+        "embedding_dim": args.embedding_dim,
+    }
+    results = run_harness(
+        args.repo_path,
+        phases,
+        base_url=args.base_url,
+        index_dir=args.index_dir,
+        queries=args.queries,
+        reviews=args.reviews,
+        concurrency=args.concurrency,
+        review_paths=args.review_files,
+        server_options=None if args.base_url else server_options,
+        verbose=args.verbose,
+    )
+    print(format_report(results))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
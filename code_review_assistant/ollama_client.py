@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import requests
+
+DEFAULT_RETRIES = 3
+# Seconds before the second retry; each further retry waits twice as long
+DEFAULT_BACKOFF = 0.5
+DEFAULT_POOL_SIZE = 16
+DEFAULT_CHECK_TIMEOUT = 10.0
+# Status codes returned while a server is starting or overloaded
+RETRY_STATUS_CODES = [429, 502, 503, 504]
+# What to do when the Ollama server cannot be reached: "fail" exits with
+# status 1, "continue" goes on and lets the first model call fail instead
+UNAVAILABLE_POLICIES = ["fail", "continue"]
+DEFAULT_UNAVAILABLE_POLICY = "fail"
+
+_session = None
+_session_lock = threading.Lock()
+
+def create_session(
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+    pool_size: int = DEFAULT_POOL_SIZE,
+) -> "requests.Session":
+    """Create an HTTP session with keep-alive connection pooling and retries
+
+    Failed connections and the status codes in RETRY_STATUS_CODES are retried
+    with exponential backoff. Read errors are not retried, so a generation
+    that already started is never sent twice.
+
+    Args:
+        retries: Maximum number of retries per request (0 to disable)
+        backoff: Backoff factor between retries in seconds
+        pool_size: Number of connections kept open per host
+
+    Returns:
+        The configured session
+    """
+    # requests is imported on first use to keep the startup of the commands fast
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=0,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=None,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def get_session() -> "requests.Session":
+    """Return the HTTP session shared by all calls in this process"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+def import_ollama_classes():
+    """Import the Ollama LLM and embedding classes of llama_index
+
+    llama_index and its Ollama integrations take seconds to import, so
+    commands that may not need them import them through this function.
+
+    Returns:
+        The Ollama and OllamaEmbedding classes
+    """
+    try:
+        from llama_index_llms_ollama import Ollama
+        from llama_index_embeddings_ollama import OllamaEmbedding
+    except ImportError:
+        try:
+            from llama_index.llms.ollama import Ollama
+            from llama_index.embeddings.ollama import OllamaEmbedding
+        except ImportError:
+            print("Error: Could not import Ollama modules. Please make sure llama-index-llms-ollama and llama-index-embeddings-ollama are installed.")
+            sys.exit(1)
+    return Ollama, OllamaEmbedding
+
+class HealthCheck:
+    """Checks that an Ollama server is reachable in a background thread
+
+    The check starts when the object is created, so it overlaps with loading
+    the index or the files; `wait` reports the result and applies the policy
+    for an unreachable server.
+    """
+
+    def __init__(self, base_url: str, timeout: float = DEFAULT_CHECK_TIMEOUT):
+        """Start checking the server
+
+        Args:
+            base_url: Base URL for Ollama API
+            timeout: Timeout for each request in seconds
+        """
+        self.base_url = base_url
+        self.version = None
+        self.status_code = None
+        self.error = None
+        self._thread = threading.Thread(target=self._run, args=(timeout,), daemon=True)
+        self._thread.start()
+
+    def _run(self, timeout: float) -> None:
+        try:
+            response = get_session().get(f"{self.base_url.rstrip('/')}/api/version", timeout=timeout)
+            self.status_code = response.status_code
+            if response.status_code == 200:
+                self.version = response.json().get("version", "unknown")
+        except Exception as e:
+            self.error = e
+
+    def wait(self, on_unavailable: str = DEFAULT_UNAVAILABLE_POLICY) -> bool:
+        """Wait for the check and report its result
+
+        Args:
+            on_unavailable: "fail" to exit if the server cannot be reached,
+                or "continue" to go on anyway
+
+        Returns:
+            True if the server answered with its version
+        """
+        if on_unavailable not in UNAVAILABLE_POLICIES:
+            raise ValueError(f"Unknown policy '{on_unavailable}'. Choose from: {', '.join(UNAVAILABLE_POLICIES)}")
+        self._thread.join()
+
+        if self.version is not None:
+            print(f"Connected to Ollama server version: {self.version}")
+            return True
+        if self.error is None:
+            # The server is up but did not report its version
+            print(f"Warning: Could not get Ollama server version. Status code: {self.status_code}")
+            print("Attempting to continue anyway...")
+            return False
+
+        print(f"Warning: Could not connect to Ollama server at {self.base_url}: {self.error}")
+        print("Please make sure Ollama is running and accessible.")
+        if on_unavailable == "fail":
+            print("Exiting. Use '--on-unavailable continue' to continue without a reachable server.")
+            sys.exit(1)
+        print("Continuing anyway (--on-unavailable continue).")
+        return False
+
+def check_ollama(
+    base_url: str,
+    on_unavailable: str = DEFAULT_UNAVAILABLE_POLICY,
+    timeout: float = DEFAULT_CHECK_TIMEOUT,
+) -> bool:
+    """Check that an Ollama server is reachable and report the result
+
+    Args:
+        base_url: Base URL for Ollama API
+        on_unavailable: "fail" to exit if the server cannot be reached,
+            or "continue" to go on anyway
+        timeout: Timeout for each request in seconds
+
+    Returns:
+        True if the server answered with its version
+    """
+    return HealthCheck(base_url, timeout).wait(on_unavailable)
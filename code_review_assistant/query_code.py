@@ -3,20 +3,104 @@
 
 import os
 import sys
-from typing import Optional
+import argparse
+from typing import List, Optional, Dict, Any
 
-from llama_index.core import Settings, load_index_from_storage, StorageContext
-from llama_index.core.response.notebook_utils import display_response
+# Import the resident query session
 try:
-    from llama_index_llms_ollama import Ollama
-    from llama_index_embeddings_ollama import OllamaEmbedding
+    from query_service import (
+        QuerySession, remote_query, add_answer_cache_arguments, answer_cache_options, DEFAULT_CACHE_DIR, DEFAULT_NPROBE,
+        UNAVAILABLE_POLICIES, DEFAULT_UNAVAILABLE_POLICY, RETRIEVAL_MODES, DEFAULT_RETRIEVAL_MODE,
+        DEFAULT_ANSWER_SIMILARITY, DEFAULT_ANSWER_TTL_HOURS, DEFAULT_ANSWER_CACHE_SIZE,
+    )
 except ImportError:
-    try:
-        from llama_index.llms.ollama import Ollama
-        from llama_index.embeddings.ollama import OllamaEmbedding
-    except ImportError:
-        print("Error: Could not import Ollama modules. Please make sure llama-index-llms-ollama and llama-index-embeddings-ollama are installed.")
-        sys.exit(1)
+    # If imported from a different directory
+    from code_review_assistant.query_service import (
+        QuerySession, remote_query, add_answer_cache_arguments, answer_cache_options, DEFAULT_CACHE_DIR, DEFAULT_NPROBE,
+        UNAVAILABLE_POLICIES, DEFAULT_UNAVAILABLE_POLICY, RETRIEVAL_MODES, DEFAULT_RETRIEVAL_MODE,
+        DEFAULT_ANSWER_SIMILARITY, DEFAULT_ANSWER_TTL_HOURS, DEFAULT_ANSWER_CACHE_SIZE,
+    )
+
+# Import the tracing helpers
+try:
+    from tracing import span, start_run, finish_run
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.tracing import span, start_run, finish_run
+
+def display_query_result(result: Dict[str, Any], show_response: bool = True) -> None:
+    """
+    Display the response and source references of a query.
+
+    Args:
+        result: Query result dictionary returned by QuerySession.query
+        show_response: Print the response text (False if it was already streamed)
+    """
+    if show_response:
+        print("=" * 80)
+        print(result["response"])
+        print("=" * 80)
+
+    # Display source nodes
+    print("\nSource references:")
+    for i, source in enumerate(result["sources"]):
+        text = source["text"]
+        location = source['file_path']
+        # Chunks of code files carry their line range and symbols
+        if source.get("start_line"):
+            location += f":{source['start_line']}-{source['end_line']}"
+        if source.get("symbol"):
+            location += f" ({source['symbol']})"
+        print(f"\n[{i+1}] {location}")
+        # Duplicate chunks are stored once, with the other locations listed
+        duplicates = source.get("duplicates") or []
+        if duplicates:
+            more = f" (+{len(duplicates) - 3} more)" if len(duplicates) > 3 else ""
+            print(f"Also in: {', '.join(duplicates[:3])}{more}")
+        print(f"Relevance score: {source['score']:.4f}")
+        print("-" * 40)
+        print(text[:300] + "..." if len(text) > 300 else text)
+
+    if result.get("cached"):
+        cached_query = result.get("cached_query")
+        print(f"\nAnswer from the answer cache (cached query: {cached_query!r})." if cached_query else "\nAnswer from the answer cache.")
+    print(f"\nTime to first token: {result['time_to_first_token_seconds']:.2f} seconds, total: {result['elapsed_seconds']:.1f} seconds.")
+
+def execute_query(
+    query: str,
+    session: Optional[QuerySession] = None,
+    server_url: Optional[str] = None,
+    stream: bool = False,
+) -> Dict[str, Any]:
+    """
+    Execute a query with a local session or a running query service and display it.
+
+    Args:
+        query: The query to execute
+        session: Loaded query session (used if given)
+        server_url: Base URL of a running query service (used without a session)
+        stream: Print tokens as they are generated
+
+    Returns:
+        The query result dictionary
+    """
+    on_token = None
+    if stream:
+        print("=" * 80)
+        on_token = lambda token: print(token, end="", flush=True)
+
+    if session is not None:
+        result = session.query(query, on_token=on_token)
+    else:
+        # Retrieval and generation happen in the service; only the round trip is timed here
+        with span("remote_query"):
+            result = remote_query(server_url, query, on_token=on_token)
+
+    if stream:
+        print()
+        print("=" * 80)
+    display_query_result(result, show_response=not stream)
+    return result
 
 def query_code_index(
     query: str,
@@ -27,6 +111,15 @@ def query_code_index(
     max_tokens: int = 2048,
     base_url: str = "http://127.0.0.1:11434",
     request_timeout: float = 60.0,
+    embedding_cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    nprobe: int = DEFAULT_NPROBE,
+    stream: bool = False,
+    on_unavailable: str = DEFAULT_UNAVAILABLE_POLICY,
+    retrieval_mode: str = DEFAULT_RETRIEVAL_MODE,
+    answer_cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    answer_similarity: float = DEFAULT_ANSWER_SIMILARITY,
+    answer_ttl_hours: float = DEFAULT_ANSWER_TTL_HOURS,
+    answer_cache_size: int = DEFAULT_ANSWER_CACHE_SIZE,
 ) -> None:
     """
     Execute a query against the indexed codebase.
@@ -40,6 +133,17 @@ def query_code_index(
         max_tokens: Maximum number of tokens to generate
         base_url: Base URL for Ollama API
         request_timeout: Timeout for API requests in seconds
+        embedding_cache_dir: Directory of the shared embedding cache, or None to disable it
+        nprobe: Number of ANN inverted lists scanned per query (0 for exact search)
+        stream: Print tokens as they are generated
+        on_unavailable: "fail" to exit if the Ollama server cannot be reached,
+            or "continue" to go on anyway
+        retrieval_mode: "vector", "hybrid" or "lexical" (BM25 only, no query embedding)
+        answer_cache_dir: Directory of the answer cache, or None to disable it
+        answer_similarity: Reuse the answer to a cached query with at least this
+            embedding cosine similarity (0 for the same normalized query only)
+        answer_ttl_hours: Hours after which a cached answer expires (never if 0)
+        answer_cache_size: Maximum number of cached answers
     """
     # Check if index directory exists
     if not os.path.exists(index_dir):
@@ -48,71 +152,31 @@ def query_code_index(
         sys.exit(1)
 
     print(f"Executing query from index '{index_dir}'...")
-    print(f"Using Ollama API at: {base_url}")
-    print(f"Request timeout: {request_timeout} seconds")
-
-    # Test connection to Ollama server
-    try:
-        import requests
-        version_response = requests.get(f"{base_url}/api/version", timeout=10)
-        if version_response.status_code == 200:
-            version_info = version_response.json()
-            print(f"Connected to Ollama server version: {version_info.get('version', 'unknown')}")
-        else:
-            print(f"Warning: Could not get Ollama server version. Status code: {version_response.status_code}")
-            print("Attempting to continue anyway...")
-    except Exception as e:
-        print(f"Warning: Could not connect to Ollama server at {base_url}: {e}")
-        print("Please make sure Ollama is running and accessible.")
-        user_input = input("Do you want to continue anyway? (y/n): ")
-        if user_input.lower() != 'y':
-            sys.exit(1)
 
-    # Set up Ollama models
-    llm = Ollama(
-        model=model_name,
-        base_url=base_url,
-        request_timeout=request_timeout,
+    session = QuerySession(
+        index_dir,
+        model_name,
+        embedding_model_name,
         temperature=temperature,
         max_tokens=max_tokens,
-    )
-    embed_model = OllamaEmbedding(
-        model_name=embedding_model_name,
         base_url=base_url,
-        request_timeout=request_timeout
-    )
-
-    # Update global settings
-    Settings.llm = llm
-    Settings.embed_model = embed_model
-
-    # Load index
-    storage_context = StorageContext.from_defaults(persist_dir=index_dir)
-    index = load_index_from_storage(storage_context)
-
-    # Create query engine
-    query_engine = index.as_query_engine(
-        similarity_top_k=5,  # Use top k search results
-        response_mode="compact",  # Compact response
+        request_timeout=request_timeout,
+        embedding_cache_dir=embedding_cache_dir,
+        nprobe=nprobe,
+        on_unavailable=on_unavailable,
+        retrieval_mode=retrieval_mode,
+        answer_cache_dir=answer_cache_dir,
+        answer_similarity=answer_similarity,
+        answer_ttl_hours=answer_ttl_hours,
+        answer_cache_size=answer_cache_size,
     )
 
     # Execute query
     print(f"\nQuery: {query}")
     print("\nGenerating response...\n")
-    response = query_engine.query(query)
+    execute_query(query, session, stream=stream)
 
-    # Display response
-    print("=" * 80)
-    print(response.response)
-    print("=" * 80)
-
-    # Display source nodes
-    print("\nSource references:")
-    for i, node in enumerate(response.source_nodes):
-        print(f"\n[{i+1}] {node.metadata.get('file_path', 'Unknown')}")
-        print(f"Relevance score: {node.score:.4f}")
-        print("-" * 40)
-        print(node.text[:300] + "..." if len(node.text) > 300 else node.text)
+    session.report_caches()
 
 def interactive_mode(
     index_dir: str = "./data",
@@ -120,19 +184,67 @@ def interactive_mode(
     embedding_model_name: str = "codellama:latest",
     base_url: str = "http://127.0.0.1:11434",
     request_timeout: float = 60.0,
+    embedding_cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    nprobe: int = DEFAULT_NPROBE,
+    server_url: Optional[str] = None,
+    stream: bool = False,
+    on_unavailable: str = DEFAULT_UNAVAILABLE_POLICY,
+    retrieval_mode: str = DEFAULT_RETRIEVAL_MODE,
+    answer_cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    answer_similarity: float = DEFAULT_ANSWER_SIMILARITY,
+    answer_ttl_hours: float = DEFAULT_ANSWER_TTL_HOURS,
+    answer_cache_size: int = DEFAULT_ANSWER_CACHE_SIZE,
 ) -> None:
     """
     Run queries in interactive mode.
 
+    The index and models are loaded once for the whole session. With
+    `server_url`, queries are sent to a running query service instead.
+
     Args:
         index_dir: Directory where the index is stored
         model_name: Ollama model name to use
         embedding_model_name: Ollama model name to use for embeddings
         base_url: Base URL for Ollama API
         request_timeout: Timeout for API requests in seconds
+        embedding_cache_dir: Directory of the shared embedding cache, or None to disable it
+        nprobe: Number of ANN inverted lists scanned per query (0 for exact search)
+        server_url: Base URL of a running query service to send queries to
+        stream: Print tokens as they are generated
+        on_unavailable: "fail" to exit if the Ollama server cannot be reached,
+            or "continue" to go on anyway
+        retrieval_mode: "vector", "hybrid" or "lexical" (BM25 only, no query embedding)
+        answer_cache_dir: Directory of the answer cache, or None to disable it
+        answer_similarity: Reuse the answer to a cached query with at least this
+            embedding cosine similarity (0 for the same normalized query only)
+        answer_ttl_hours: Hours after which a cached answer expires (never if 0)
+        answer_cache_size: Maximum number of cached answers
     """
     print("Starting interactive mode. Type 'exit' or 'quit' to end the session.")
-    print(f"Using Ollama API at: {base_url}")
+
+    session = None
+    if server_url:
+        print(f"Using query service at: {server_url}")
+    else:
+        try:
+            session = QuerySession(
+                index_dir,
+                model_name,
+                embedding_model_name,
+                base_url=base_url,
+                request_timeout=request_timeout,
+                embedding_cache_dir=embedding_cache_dir,
+                nprobe=nprobe,
+                on_unavailable=on_unavailable,
+                retrieval_mode=retrieval_mode,
+                answer_cache_dir=answer_cache_dir,
+                answer_similarity=answer_similarity,
+                answer_ttl_hours=answer_ttl_hours,
+                answer_cache_size=answer_cache_size,
+            )
+        except FileNotFoundError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
 
     while True:
         try:
@@ -144,14 +256,8 @@ def interactive_mode(
             if not query.strip():
                 continue
 
-            query_code_index(
-                query,
-                index_dir,
-                model_name,
-                embedding_model_name,
-                base_url=base_url,
-                request_timeout=request_timeout
-            )
+            print("\nGenerating response...\n")
+            execute_query(query, session, server_url, stream)
 
         except KeyboardInterrupt:
             print("\nExiting interactive mode.")
@@ -159,14 +265,62 @@ def interactive_mode(
         except Exception as e:
             print(f"An error occurred: {e}")
 
-if __name__ == "__main__":
-    if len(sys.argv) == 1:
-        # Start interactive mode if no arguments
-        interactive_mode()
+    if session is not None:
+        session.report_caches()
+
+def main(argv: Optional[List[str]] = None, prog: Optional[str] = None):
+    parser = argparse.ArgumentParser(prog=prog, description="Query the indexed codebase using Ollama")
+    parser.add_argument("query", nargs="?", help="The query to execute (starts interactive mode if omitted)")
+    parser.add_argument("index_dir", nargs="?", default="./data", help="Directory where the index is stored")
+    parser.add_argument("base_url", nargs="?", default="http://127.0.0.1:11434", help="Base URL for Ollama API")
+    parser.add_argument("--embedding-cache-dir", default=DEFAULT_CACHE_DIR, help="Directory of the shared embedding cache")
+    parser.add_argument("--no-embedding-cache", action="store_true", help="Do not read or write the embedding cache")
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE,
+                        help="ANN lists scanned per query; higher is more accurate but slower (0 for exact search)")
+    parser.add_argument("--retrieval", choices=RETRIEVAL_MODES, default=DEFAULT_RETRIEVAL_MODE,
+                        help="How source code is retrieved: by embedding (vector), by BM25 without embedding the query (lexical), "
+                             f"or both fused (hybrid; default: {DEFAULT_RETRIEVAL_MODE})")
+    add_answer_cache_arguments(parser)
+    parser.add_argument("--server", "-s", help="URL of a running query service (query_service.py) to send queries to")
+    parser.add_argument("--stream", action="store_true", help="Print the response tokens as they are generated")
+    parser.add_argument("--on-unavailable", choices=UNAVAILABLE_POLICIES, default=DEFAULT_UNAVAILABLE_POLICY,
+                        help="What to do when the Ollama server cannot be reached (default: fail)")
+    parser.add_argument("--metrics-file", help="Write the timing and token metrics of the run as JSON to this file")
+
+    args = parser.parse_args(argv)
+    embedding_cache_dir = None if args.no_embedding_cache else args.embedding_cache_dir
+
+    start_run("query_code")
+    if args.query is None:
+        # Start interactive mode if no query is given
+        interactive_mode(
+            args.index_dir,
+            base_url=args.base_url,
+            embedding_cache_dir=embedding_cache_dir,
+            nprobe=args.nprobe,
+            server_url=args.server,
+            stream=args.stream,
+            on_unavailable=args.on_unavailable,
+            retrieval_mode=args.retrieval,
+            **answer_cache_options(args),
+        )
+    elif args.server:
+        # Send a single query to the running query service
+        execute_query(args.query, server_url=args.server, stream=args.stream)
     else:
-        # Process as a single query if arguments are provided
-        query = sys.argv[1]
-        index_dir = sys.argv[2] if len(sys.argv) > 2 else "./data"
-        base_url = sys.argv[3] if len(sys.argv) > 3 else "http://127.0.0.1:11434"
+        # Process as a single query
+        query_code_index(
+            args.query,
+            args.index_dir,
+            base_url=args.base_url,
+            embedding_cache_dir=embedding_cache_dir,
+            nprobe=args.nprobe,
+            stream=args.stream,
+            on_unavailable=args.on_unavailable,
+            retrieval_mode=args.retrieval,
+            **answer_cache_options(args),
+        )
+    finish_run(args.metrics_file)
 
-        query_code_index(query, index_dir, base_url=base_url)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,604 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+# llama_index and the Ollama integrations take seconds to import, so they are
+# imported when a query session is created; --help and remote queries stay fast
+
+if TYPE_CHECKING:
+    from llama_index.core import QueryBundle
+
+# Import the option defaults; the index, retrieval and cache modules import
+# llama_index, numpy and sqlite3, which --help does not need
+try:
+    from defaults import (
+        DEFAULT_CACHE_DIR, DEFAULT_NPROBE, RETRIEVAL_MODES, DEFAULT_RETRIEVAL_MODE,
+        DEFAULT_ANSWER_TTL_HOURS, DEFAULT_ANSWER_CACHE_SIZE, DEFAULT_ANSWER_SIMILARITY,
+    )
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.defaults import (
+        DEFAULT_CACHE_DIR, DEFAULT_NPROBE, RETRIEVAL_MODES, DEFAULT_RETRIEVAL_MODE,
+        DEFAULT_ANSWER_TTL_HOURS, DEFAULT_ANSWER_CACHE_SIZE, DEFAULT_ANSWER_SIMILARITY,
+    )
+
+# Import the Ollama health check
+try:
+    from ollama_client import (
+        HealthCheck, get_session, import_ollama_classes, UNAVAILABLE_POLICIES, DEFAULT_UNAVAILABLE_POLICY
+    )
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.ollama_client import (
+        HealthCheck, get_session, import_ollama_classes, UNAVAILABLE_POLICIES, DEFAULT_UNAVAILABLE_POLICY
+    )
+
+# Import the tracing helpers
+try:
+    from tracing import span, start_run, finish_run
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.tracing import span, start_run, finish_run
+
+DEFAULT_SERVICE_HOST = "127.0.0.1"
+DEFAULT_SERVICE_PORT = 8765
+
+# Files whose modification marks a rebuilt or updated index
+INDEX_FILES = [
+    "docstore.json",
+    "index_store.json",
+    "vector_store.npy",
+    "vector_store_ids.json",
+    "ann_ivf.npz",
+    "bm25_index.npz",
+    "default__vector_store.json",
+]
+
+def index_fingerprint(index_dir: str) -> Tuple[Tuple[str, int, int], ...]:
+    """Return a fingerprint of the persisted index files
+
+    Args:
+        index_dir: Directory where the index is stored
+
+    Returns:
+        Tuple of (file name, modification time, size) for each existing index file
+    """
+    fingerprint = []
+    for name in INDEX_FILES:
+        try:
+            stat = os.stat(os.path.join(index_dir, name))
+        except FileNotFoundError:
+            continue
+        fingerprint.append((name, stat.st_mtime_ns, stat.st_size))
+    return tuple(fingerprint)
+
+class QuerySession:
+    """Long-lived query session that keeps the index and models loaded
+
+    The Ollama models, the index and the query engine are created once. Before
+    each query the index files are checked, and the index is only reloaded when
+    it has been rebuilt or updated on disk.
+
+    The query engine always streams, so callers can show tokens as they are
+    generated and the time to first token can be measured.
+    """
+
+    def __init__(
+        self,
+        index_dir: str = "./data",
+        model_name: str = "codellama:latest",
+        embedding_model_name: str = "codellama:latest",
+        temperature: float = 0.1,
+        max_tokens: int = 2048,
+        base_url: str = "http://127.0.0.1:11434",
+        request_timeout: float = 60.0,
+        embedding_cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        nprobe: int = DEFAULT_NPROBE,
+        similarity_top_k: int = 5,
+        on_unavailable: str = DEFAULT_UNAVAILABLE_POLICY,
+        retrieval_mode: str = DEFAULT_RETRIEVAL_MODE,
+        answer_cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        answer_similarity: float = DEFAULT_ANSWER_SIMILARITY,
+        answer_ttl_hours: float = DEFAULT_ANSWER_TTL_HOURS,
+        answer_cache_size: int = DEFAULT_ANSWER_CACHE_SIZE,
+    ):
+        """Set up the models and load the index
+
+        Args:
+            index_dir: Directory where the index is stored
+            model_name: Ollama model name to use
+            embedding_model_name: Ollama model name to use for embeddings
+            temperature: Temperature parameter for generation
+            max_tokens: Maximum number of tokens to generate
+            base_url: Base URL for Ollama API
+            request_timeout: Timeout for API requests in seconds
+            embedding_cache_dir: Directory of the shared embedding cache, or None to disable it
+            nprobe: Number of ANN inverted lists scanned per query (0 for exact search)
+            similarity_top_k: Number of source nodes retrieved per query
+            on_unavailable: "fail" to exit if the Ollama server cannot be reached,
+                or "continue" to go on anyway
+            retrieval_mode: "vector" to retrieve by embedding, "lexical" to rank by
+                BM25 without embedding the query, or "hybrid" to fuse both rankings
+            answer_cache_dir: Directory of the answer cache, or None to disable it
+            answer_similarity: Serve the answer of a cached query whose embedding has at
+                least this cosine similarity (0 for the same normalized query only)
+            answer_ttl_hours: Hours after which a cached answer expires (never if 0)
+            answer_cache_size: Maximum number of cached answers
+        """
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{retrieval_mode}'. Choose from: {', '.join(RETRIEVAL_MODES)}")
+        if not os.path.exists(index_dir):
+            raise FileNotFoundError(f"Index directory '{index_dir}' not found. Please run 'index_code.py' first to create an index.")
+
+        self.index_dir = index_dir
+        self.nprobe = nprobe
+        self.similarity_top_k = similarity_top_k
+        self.retrieval_mode = retrieval_mode
+
+        print(f"Using Ollama API at: {base_url}")
+        print(f"Request timeout: {request_timeout} seconds")
+
+        # Test connection to Ollama server while llama_index and the index are loaded
+        health_check = HealthCheck(base_url)
+
+        from llama_index.core import Settings
+        try:
+            from embedding_pipeline import with_embedding_cache
+            from answer_cache import open_answer_cache, hash_key
+        except ImportError:
+            # If imported from a different directory
+            from code_review_assistant.embedding_pipeline import with_embedding_cache
+            from code_review_assistant.answer_cache import open_answer_cache, hash_key
+        Ollama, OllamaEmbedding = import_ollama_classes()
+
+        # Set up Ollama models
+        self.llm = Ollama(
+            model=model_name,
+            base_url=base_url,
+            request_timeout=request_timeout,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        embed_model = OllamaEmbedding(
+            model_name=embedding_model_name,
+            base_url=base_url,
+            request_timeout=request_timeout
+        )
+        self.embed_model = with_embedding_cache(embed_model, embedding_cache_dir)
+
+        # Update global settings
+        Settings.llm = self.llm
+        Settings.embed_model = self.embed_model
+
+        # Everything besides the index that changes the answer to a query
+        self.answer_cache = open_answer_cache(answer_cache_dir, answer_ttl_hours, answer_cache_size)
+        self.answer_similarity = answer_similarity
+        self._answer_settings = hash_key({
+            "model": model_name,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "embedding_model": embedding_model_name,
+            "retrieval_mode": retrieval_mode,
+            "similarity_top_k": similarity_top_k,
+            "nprobe": nprobe,
+        })
+
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        # Query engine and index version of the loaded index; replaced as one tuple so a
+        # query never pairs the engine of one build with the version of another
+        self._engine = None
+        self.loaded_at = None
+        self.reload()
+        health_check.wait(on_unavailable)
+
+    def reload(self) -> None:
+        """Load the index from disk and create a new query engine"""
+        from llama_index.core.query_engine import RetrieverQueryEngine
+        try:
+            from index_storage import load_code_index
+            from lexical_index import HybridRetriever, load_lexical_index
+            from answer_cache import hash_key
+        except ImportError:
+            # If imported from a different directory
+            from code_review_assistant.index_storage import load_code_index
+            from code_review_assistant.lexical_index import HybridRetriever, load_lexical_index
+            from code_review_assistant.answer_cache import hash_key
+
+        fingerprint = index_fingerprint(self.index_dir)
+        start_time = time.time()
+        with span("index_load"):
+            index = load_code_index(self.index_dir, self.nprobe)
+            lexical_index = load_lexical_index(index, self.index_dir) if self.retrieval_mode != "vector" else None
+        if self.retrieval_mode != "vector" and lexical_index is None:
+            print(f"Note: No usable BM25 index in '{self.index_dir}'. Using vector retrieval; re-run index_code.py to build it.")
+        retriever = HybridRetriever(index, lexical_index, self.retrieval_mode, self.similarity_top_k)
+        query_engine = RetrieverQueryEngine.from_args(
+            retriever,
+            response_mode="compact",
+            streaming=True,
+        )
+
+        index_version = hash_key(fingerprint)
+        self._fingerprint = fingerprint
+        self._engine = (query_engine, index_version)
+        self.loaded_at = time.time()
+        print(f"Loaded index from '{self.index_dir}' in {self.loaded_at - start_time:.2f} seconds.")
+
+        # Answers computed from an earlier build of the index are stale
+        if self.answer_cache is not None:
+            removed = self.answer_cache.invalidate(self.index_dir, index_version)
+            if removed:
+                print(f"Removed {removed} cached answers of the previous index.")
+
+    def refresh_if_changed(self) -> bool:
+        """Reload the index if its files changed since it was loaded
+
+        If the index is being written while we try to reload, the previous
+        query engine is kept and the reload is retried on the next query.
+
+        Returns:
+            True if the index was reloaded
+        """
+        with self._lock:
+            if index_fingerprint(self.index_dir) == self._fingerprint:
+                return False
+
+            print("Index has changed on disk. Reloading...")
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Warning: Could not reload index, keeping the previous one: {e}")
+                return False
+            return True
+
+    def query(self, query: str, on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """Execute a query against the loaded index
+
+        Args:
+            query: The query to execute
+            on_token: Optional callback called with each generated token as it arrives
+
+        Returns:
+            Dictionary with the response text, source nodes, time to first token,
+            elapsed time and whether the answer came from the answer cache
+        """
+        from llama_index.core import QueryBundle
+
+        self.refresh_if_changed()
+        query_engine, index_version = self._engine
+
+        start_time = time.time()
+        query_bundle = QueryBundle(query)
+        if self.answer_cache is not None:
+            with span("answer_cache"):
+                cached = self._cached_answer(query_bundle, index_version)
+            if cached is not None:
+                if on_token:
+                    on_token(cached["response"])
+                elapsed = time.time() - start_time
+                cached.update({
+                    "query": query,
+                    "cached": True,
+                    "time_to_first_token_seconds": elapsed,
+                    "elapsed_seconds": elapsed,
+                })
+                return cached
+
+        # Retrieval and synthesis are run separately so each gets its own span
+        with span("retrieve"):
+            nodes = query_engine.retrieve(query_bundle)
+
+        first_token_time = None
+        with span("generate"):
+            response = query_engine.synthesize(query_bundle, nodes)
+            if hasattr(response, "response_gen"):
+                tokens = []
+                for token in response.response_gen:
+                    if first_token_time is None:
+                        first_token_time = time.time()
+                    tokens.append(token)
+                    if on_token:
+                        on_token(token)
+                response_text = "".join(tokens)
+            else:
+                first_token_time = time.time()
+                response_text = response.response or ""
+                if on_token:
+                    on_token(response_text)
+        elapsed = time.time() - start_time
+
+        result = {
+            "query": query,
+            "response": response_text,
+            "sources": [
+                {
+                    "file_path": node.metadata.get("file_path", "Unknown"),
+                    "start_line": node.metadata.get("start_line"),
+                    "end_line": node.metadata.get("end_line"),
+                    "symbol": node.metadata.get("symbol"),
+                    "duplicates": node.metadata.get("duplicates", []),
+                    "score": node.score,
+                    "text": node.text,
+                }
+                for node in response.source_nodes
+            ],
+            "time_to_first_token_seconds": (first_token_time or time.time()) - start_time,
+            "elapsed_seconds": elapsed,
+            "cached": False,
+        }
+        if self.answer_cache is not None and response_text.strip():
+            self.answer_cache.put(
+                self.index_dir, index_version, self._answer_settings, query, result, query_bundle.embedding
+            )
+        return result
+
+    def _cached_answer(self, query_bundle: "QueryBundle", index_version: str) -> Optional[Dict[str, Any]]:
+        """Look up a cached answer to a query
+
+        For a similarity lookup the query is embedded once; the embedding is
+        kept in the query bundle so retrieval does not request it again.
+
+        Args:
+            query_bundle: The query
+            index_version: Hash of the fingerprint of the loaded index
+
+        Returns:
+            The cached query result, or None for a miss
+        """
+        cache = self.answer_cache
+        result = cache.get(self.index_dir, index_version, self._answer_settings, query_bundle.query_str)
+        if result is None and self.answer_similarity > 0:
+            query_bundle.embedding = self.embed_model.get_query_embedding(query_bundle.query_str)
+            result = cache.get_similar(
+                self.index_dir, index_version, self._answer_settings, query_bundle.embedding, self.answer_similarity
+            )
+        if result is None:
+            cache.record_miss()
+        return result
+
+    def status(self) -> Dict[str, Any]:
+        """Return information about the loaded index
+
+        Returns:
+            Dictionary with the index directory, retrieval mode, load time and
+            answer cache counters
+        """
+        return {
+            "status": "ok",
+            "index_dir": self.index_dir,
+            "retrieval_mode": self.retrieval_mode,
+            "loaded_at": self.loaded_at,
+            "answer_cache": self.answer_cache.stats() if self.answer_cache is not None else None,
+        }
+
+    def report_caches(self) -> None:
+        """Print the embedding and answer cache counters"""
+        try:
+            from embedding_pipeline import report_embedding_cache
+        except ImportError:
+            # If imported from a different directory
+            from code_review_assistant.embedding_pipeline import report_embedding_cache
+
+        report_embedding_cache(self.embed_model)
+        if self.answer_cache is not None:
+            self.answer_cache.report()
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler exposing a QuerySession
+
+    GET /health returns the session status, POST /query with a JSON body
+    {"query": "..."} returns the query result as JSON. With {"stream": true}
+    the response is newline-delimited JSON: one {"token": ...} line per
+    generated token followed by a {"result": ...} line.
+    """
+
+    server_version = "CodeQueryService/1.0"
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, self.server.session.status())
+        else:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/query":
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self._send_json(400, {"error": f"Invalid request: {e}"})
+            return
+        if not isinstance(payload, dict):
+            self._send_json(400, {"error": "Invalid request: the body must be a JSON object"})
+            return
+        query = payload.get("query")
+        if not isinstance(query, str) or not query.strip():
+            self._send_json(400, {"error": "Invalid request: 'query' must be a non-empty string"})
+            return
+
+        if not payload.get("stream"):
+            try:
+                self._send_json(200, self.server.session.query(query))
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+            return
+
+        # Stream tokens as newline-delimited JSON; the connection is closed at the end
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+
+        def write_line(message: Dict[str, Any]) -> None:
+            self.wfile.write(json.dumps(message).encode('utf-8') + b"\n")
+            self.wfile.flush()
+
+        try:
+            result = self.server.session.query(query, on_token=lambda token: write_line({"token": token}))
+            write_line({"result": result})
+        except Exception as e:
+            write_line({"error": str(e)})
+
+    def log_message(self, format, *args):
+        # Keep the console for the service's own messages
+        pass
+
+def serve(session: QuerySession, host: str = DEFAULT_SERVICE_HOST, port: int = DEFAULT_SERVICE_PORT) -> None:
+    """Serve a query session over HTTP until interrupted
+
+    Args:
+        session: The loaded query session
+        host: Host to bind to
+        port: Port to listen on
+    """
+    server = ThreadingHTTPServer((host, port), QueryRequestHandler)
+    server.session = session
+    print(f"Query service listening on http://{host}:{port} (POST /query, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping query service.")
+    finally:
+        server.server_close()
+        session.report_caches()
+
+def remote_query(
+    server_url: str,
+    query: str,
+    timeout: float = 600.0,
+    on_token: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """Execute a query through a running query service
+
+    Args:
+        server_url: Base URL of the query service (e.g. http://127.0.0.1:8765)
+        query: The query to execute
+        timeout: Timeout for the request in seconds
+        on_token: Optional callback called with each generated token as it arrives
+
+    Returns:
+        The query result dictionary
+    """
+    session = get_session()
+    url = f"{server_url.rstrip('/')}/query"
+
+    if on_token is None:
+        response = session.post(url, json={"query": query}, timeout=timeout)
+        result = response.json()
+        if response.status_code != 200:
+            raise RuntimeError(result.get("error", f"Query service returned status {response.status_code}"))
+        return result
+
+    with session.post(url, json={"query": query, "stream": True}, timeout=timeout, stream=True) as response:
+        if response.status_code != 200:
+            raise RuntimeError(response.json().get("error", f"Query service returned status {response.status_code}"))
+        for line in response.iter_lines():
+            if not line:
+                continue
+            message = json.loads(line)
+            if "token" in message:
+                on_token(message["token"])
+            elif "result" in message:
+                return message["result"]
+            elif "error" in message:
+                raise RuntimeError(message["error"])
+
+    raise RuntimeError("Query service closed the connection before returning a result")
+
+def add_answer_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the answer cache options to a command line parser
+
+    Args:
+        parser: The parser of query_code.py or query_service.py
+    """
+    parser.add_argument("--answer-cache-dir", default=DEFAULT_CACHE_DIR, help="Directory of the answer cache")
+    parser.add_argument("--no-answer-cache", action="store_true", help="Do not read or write the answer cache")
+    parser.add_argument("--answer-similarity", type=float, default=DEFAULT_ANSWER_SIMILARITY,
+                        help="Also reuse the answer to a cached query whose embedding has at least this cosine similarity, "
+                             "e.g. 0.95 (default: 0, only the same query up to case, spacing and trailing punctuation)")
+    parser.add_argument("--answer-ttl-hours", type=float, default=DEFAULT_ANSWER_TTL_HOURS,
+                        help=f"Hours after which a cached answer expires; 0 keeps answers until the index changes (default: {DEFAULT_ANSWER_TTL_HOURS})")
+    parser.add_argument("--answer-cache-size", type=int, default=DEFAULT_ANSWER_CACHE_SIZE,
+                        help=f"Maximum number of cached answers; the least recently used are evicted (default: {DEFAULT_ANSWER_CACHE_SIZE})")
+
+def answer_cache_options(args: argparse.Namespace) -> Dict[str, Any]:
+    """Return the QuerySession keyword arguments of the parsed answer cache options
+
+    Args:
+        args: Arguments parsed by a parser set up with add_answer_cache_arguments
+
+    Returns:
+        Dictionary of QuerySession keyword arguments
+    """
+    return {
+        "answer_cache_dir": None if args.no_answer_cache else args.answer_cache_dir,
+        "answer_similarity": args.answer_similarity,
+        "answer_ttl_hours": args.answer_ttl_hours,
+        "answer_cache_size": args.answer_cache_size,
+    }
+
+def main(argv: Optional[List[str]] = None, prog: Optional[str] = None):
+    parser = argparse.ArgumentParser(prog=prog, description="Resident query service for the indexed codebase")
+    parser.add_argument("index_dir", nargs="?", default="./data", help="Directory where the index is stored")
+    parser.add_argument("--host", default=DEFAULT_SERVICE_HOST, help="Host to bind to")
+    parser.add_argument("--port", "-p", type=int, default=DEFAULT_SERVICE_PORT, help="Port to listen on")
+    parser.add_argument("--model", "-m", default="codellama:latest", help="Ollama model name to use")
+    parser.add_argument("--embedding-model", "-e", default="codellama:latest", help="Ollama model name to use for embeddings")
+    parser.add_argument("--base-url", "-u", default="http://127.0.0.1:11434", help="Base URL for Ollama API")
+    parser.add_argument("--request-timeout", "-r", type=float, default=60.0, help="Timeout for API requests in seconds")
+    parser.add_argument("--embedding-cache-dir", default=DEFAULT_CACHE_DIR, help="Directory of the shared embedding cache")
+    parser.add_argument("--no-embedding-cache", action="store_true", help="Do not read or write the embedding cache")
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE,
+                        help="ANN lists scanned per query; higher is more accurate but slower (0 for exact search)")
+    parser.add_argument("--retrieval", choices=RETRIEVAL_MODES, default=DEFAULT_RETRIEVAL_MODE,
+                        help="How source code is retrieved: by embedding (vector), by BM25 without embedding the query (lexical), "
+                             f"or both fused (hybrid; default: {DEFAULT_RETRIEVAL_MODE})")
+    add_answer_cache_arguments(parser)
+    parser.add_argument("--on-unavailable", choices=UNAVAILABLE_POLICIES, default=DEFAULT_UNAVAILABLE_POLICY,
+                        help="What to do when the Ollama server cannot be reached (default: fail)")
+    parser.add_argument("--metrics-file", help="Write the timing and token metrics of the service as JSON to this file when it stops")
+
+    args = parser.parse_args(argv)
+
+    start_run("query_service")
+    try:
+        session = QuerySession(
+            args.index_dir,
+            args.model,
+            args.embedding_model,
+            base_url=args.base_url,
+            request_timeout=args.request_timeout,
+            embedding_cache_dir=None if args.no_embedding_cache else args.embedding_cache_dir,
+            nprobe=args.nprobe,
+            on_unavailable=args.on_unavailable,
+            retrieval_mode=args.retrieval,
+            **answer_cache_options(args),
+        )
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    serve(session, args.host, args.port)
+    finish_run(args.metrics_file)
+
+if __name__ == "__main__":
+    main()
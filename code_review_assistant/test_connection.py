@@ -1,79 +1,144 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import io
 import sys
-import requests
 import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, TextIO, Tuple
 
-def test_ollama_connection(base_url="http://localhost:11434", model="codellama"):
+# Import the shared HTTP client
+try:
+    from ollama_client import create_session
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.ollama_client import create_session
+
+# 接続テストでは失敗をすぐに報告するため再試行しない
+session = create_session(retries=0)
+
+def probe_version(base_url: str) -> Tuple[bool, List[str]]:
     """
-    Ollamaサーバーへの接続をテストする関数
+    バージョン確認エンドポイントをテストする関数
 
     Args:
         base_url: OllamaサーバーのベースURL
-        model: テストに使用するモデル名
 
     Returns:
-        bool: 接続が成功したかどうか
+        成功したかどうかと出力する行のリスト
     """
-    print(f"Ollamaサーバー ({base_url}) への接続をテストしています...")
-
-    # バージョン確認エンドポイントをテスト
+    version_url = f"{base_url}/api/version"
+    output = [f"バージョンエンドポイントにリクエスト送信中: {version_url}"]
     try:
-        version_url = f"{base_url}/api/version"
-        print(f"バージョンエンドポイントにリクエスト送信中: {version_url}")
-        version_response = requests.get(version_url, timeout=10)
-        print(f"バージョンエンドポイント応答: {version_response.status_code}")
-        print(f"応答内容: {version_response.json()}")
+        version_response = session.get(version_url, timeout=10)
+        output.append(f"バージョンエンドポイント応答: {version_response.status_code}")
+        output.append(f"応答内容: {version_response.json()}")
+        return True, output
     except Exception as e:
-        print(f"バージョンエンドポイントへの接続に失敗しました: {e}")
-        return False
+        output.append(f"バージョンエンドポイントへの接続に失敗しました: {e}")
+        return False, output
+
+def probe_models(base_url: str, model: str) -> Tuple[bool, List[str]]:
+    """
+    モデル一覧エンドポイントをテストする関数
+
+    Args:
+        base_url: OllamaサーバーのベースURL
+        model: 存在を確認するモデル名
 
-    # モデル一覧エンドポイントをテスト
+    Returns:
+        成功したかどうかと出力する行のリスト
+    """
+    models_url = f"{base_url}/api/tags"
+    output = [f"\nモデル一覧エンドポイントにリクエスト送信中: {models_url}"]
     try:
-        models_url = f"{base_url}/api/tags"
-        print(f"\nモデル一覧エンドポイントにリクエスト送信中: {models_url}")
-        models_response = requests.get(models_url, timeout=10)
-        print(f"モデル一覧エンドポイント応答: {models_response.status_code}")
+        models_response = session.get(models_url, timeout=10)
+        output.append(f"モデル一覧エンドポイント応答: {models_response.status_code}")
         if models_response.status_code == 200:
             models = models_response.json().get("models", [])
-            print(f"利用可能なモデル: {[m.get('name') for m in models]}")
+            output.append(f"利用可能なモデル: {[m.get('name') for m in models]}")
 
             # 指定されたモデルが存在するか確認
             model_exists = any(m.get('name') == model for m in models)
             if not model_exists:
-                print(f"警告: 指定されたモデル '{model}' が見つかりません。")
-                print(f"利用可能なモデルのいずれかを使用してください。")
+                output.append(f"警告: 指定されたモデル '{model}' が見つかりません。")
+                output.append(f"利用可能なモデルのいずれかを使用してください。")
+        return True, output
     except Exception as e:
-        print(f"モデル一覧エンドポイントへの接続に失敗しました: {e}")
+        output.append(f"モデル一覧エンドポイントへの接続に失敗しました: {e}")
+        return False, output
+
+def probe_embeddings(base_url: str, model: str) -> Tuple[bool, List[str]]:
+    """
+    埋め込みエンドポイントをテストする関数
 
-    # 埋め込みエンドポイントをテスト
+    Args:
+        base_url: OllamaサーバーのベースURL
+        model: 埋め込みに使用するモデル名
+
+    Returns:
+        成功したかどうかと出力する行のリスト
+    """
+    output = [f"\n埋め込みエンドポイントにリクエスト送信中..."]
     try:
-        print(f"\n埋め込みエンドポイントにリクエスト送信中...")
         start_time = time.time()
-        embed_response = requests.post(
+        embed_response = session.post(
             f"{base_url}/api/embeddings",
             json={"model": model, "prompt": "Test embedding"},
             timeout=30
         )
         elapsed_time = time.time() - start_time
-        print(f"埋め込みエンドポイント応答: {embed_response.status_code} (処理時間: {elapsed_time:.2f}秒)")
+        output.append(f"埋め込みエンドポイント応答: {embed_response.status_code} (処理時間: {elapsed_time:.2f}秒)")
 
         if embed_response.status_code == 200:
             embed_data = embed_response.json()
             embed_length = len(embed_data.get("embedding", []))
-            print(f"埋め込みベクトルの次元数: {embed_length}")
-            return True
+            output.append(f"埋め込みベクトルの次元数: {embed_length}")
+            return True, output
         else:
-            print(f"エラー詳細: {embed_response.text}")
-            return False
+            output.append(f"エラー詳細: {embed_response.text}")
+            return False, output
     except Exception as e:
-        print(f"埋め込みエンドポイントへの接続に失敗しました: {e}")
-        return False
+        output.append(f"埋め込みエンドポイントへの接続に失敗しました: {e}")
+        return False, output
+
+def test_ollama_connection(base_url="http://localhost:11434", model="codellama", output: Optional[TextIO] = None):
+    """
+    Ollamaサーバーへの接続をテストする関数
+
+    3つのエンドポイントを同時にテストし、結果をエンドポイントの順に表示する。
+
+    Args:
+        base_url: OllamaサーバーのベースURL
+        model: テストに使用するモデル名
+        output: 結果の出力先 (Noneの場合は標準出力)
+
+    Returns:
+        bool: 接続が成功したかどうか
+    """
+    print(f"Ollamaサーバー ({base_url}) への接続をテストしています...", file=output)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        version = executor.submit(probe_version, base_url)
+        models = executor.submit(probe_models, base_url, model)
+        embeddings = executor.submit(probe_embeddings, base_url, model)
+
+        # バージョン確認に失敗した場合は他の結果を表示しない
+        version_ok, lines = version.result()
+        print("\n".join(lines), file=output)
+        if not version_ok:
+            return False
+
+        for probe in (models, embeddings):
+            ok, lines = probe.result()
+            print("\n".join(lines), file=output)
+    return ok
 
 def test_with_alternative_urls():
     """
     複数の代替URLでOllamaサーバーへの接続をテストする
+
+    全てのURLを同時にテストし、結果をURLの順に表示する。
     """
     urls_to_try = [
         "http://localhost:11434",
@@ -81,17 +146,26 @@ def test_with_alternative_urls():
         "http://0.0.0.0:11434"
     ]
 
-    for url in urls_to_try:
-        print("\n" + "=" * 50)
-        print(f"{url} でテスト中...")
-        print("=" * 50)
-        success = test_ollama_connection(url)
-        if success:
-            print(f"\n✅ {url} への接続に成功しました！")
-            print(f"この接続URLをコードで使用してください。")
-            return url
-        else:
-            print(f"\n❌ {url} への接続に失敗しました。")
+    def test_url(url: str) -> Tuple[bool, str]:
+        output = io.StringIO()
+        success = test_ollama_connection(url, output=output)
+        return success, output.getvalue()
+
+    with ThreadPoolExecutor(max_workers=len(urls_to_try)) as executor:
+        futures = [executor.submit(test_url, url) for url in urls_to_try]
+
+        for url, future in zip(urls_to_try, futures):
+            print("\n" + "=" * 50)
+            print(f"{url} でテスト中...")
+            print("=" * 50)
+            success, text = future.result()
+            print(text, end="")
+            if success:
+                print(f"\n✅ {url} への接続に成功しました！")
+                print(f"この接続URLをコードで使用してください。")
+                return url
+            else:
+                print(f"\n❌ {url} への接続に失敗しました。")
 
     print("\n全ての接続テストに失敗しました。")
     return None
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, Mapping, Optional, TextIO
+
+# Ollama response fields that are summed over all generations
+OLLAMA_COUNTERS = ["prompt_eval_count", "eval_count"]
+OLLAMA_DURATIONS = ["total_duration", "load_duration", "prompt_eval_duration", "eval_duration"]
+
+class Tracer:
+    """Records the time spent in each stage of a run and Ollama's token statistics
+
+    Spans with the same name are aggregated (count, total, min and max), so a
+    stage that runs once per file or per query shows up as one row. Spans
+    from several threads add up, so their total can exceed the run's time.
+    """
+
+    def __init__(self, run_name: str = "run"):
+        """Create an empty tracer
+
+        Args:
+            run_name: Name of the run, e.g. the script name
+        """
+        self.run_name = run_name
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans = {}
+        self.counters = {}
+        self.llm = {"calls": 0}
+        self.llm.update({name: 0 for name in OLLAMA_COUNTERS + OLLAMA_DURATIONS})
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as a span
+
+        Args:
+            name: Name of the stage
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.perf_counter() - start)
+
+    def add_span(self, name: str, seconds: float) -> None:
+        """Record a span measured by the caller
+
+        Args:
+            name: Name of the stage
+            seconds: Duration of the span
+        """
+        with self._lock:
+            span = self.spans.get(name)
+            if span is None:
+                self.spans[name] = {"count": 1, "total": seconds, "min": seconds, "max": seconds}
+            else:
+                span["count"] += 1
+                span["total"] += seconds
+                span["min"] = min(span["min"], seconds)
+                span["max"] = max(span["max"], seconds)
+
+    def count(self, name: str, value: float = 1) -> None:
+        """Add to a counter, e.g. files loaded or prompt characters
+
+        Args:
+            name: Name of the counter
+            value: Amount to add
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_ollama_stats(self, raw: Any) -> bool:
+        """Record the token counts and durations of a finished Ollama generation
+
+        Args:
+            raw: Final response of /api/chat or /api/generate
+
+        Returns:
+            True if the response carried statistics
+        """
+        if not isinstance(raw, Mapping) or raw.get("eval_count") is None:
+            return False
+        with self._lock:
+            self.llm["calls"] += 1
+            for name in OLLAMA_COUNTERS + OLLAMA_DURATIONS:
+                self.llm[name] += raw.get(name) or 0
+        return True
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the metrics of the run
+
+        Returns:
+            Dictionary with the run, its spans, counters and LLM statistics
+        """
+        with self._lock:
+            spans = {
+                name: {
+                    "count": span["count"],
+                    "total_seconds": span["total"],
+                    "mean_seconds": span["total"] / span["count"],
+                    "min_seconds": span["min"],
+                    "max_seconds": span["max"],
+                }
+                for name, span in self.spans.items()
+            }
+            counters = dict(self.counters)
+            llm = dict(self.llm)
+
+        # Ollama reports durations in nanoseconds
+        llm_summary = {
+            "calls": llm["calls"],
+            "prompt_tokens": llm["prompt_eval_count"],
+            "generated_tokens": llm["eval_count"],
+        }
+        for name in OLLAMA_DURATIONS:
+            llm_summary[name.replace("_duration", "_seconds")] = llm[name] / 1e9
+        llm_summary["prompt_tokens_per_second"] = (
+            llm["prompt_eval_count"] / (llm["prompt_eval_duration"] / 1e9) if llm["prompt_eval_duration"] else 0.0
+        )
+        llm_summary["generated_tokens_per_second"] = (
+            llm["eval_count"] / (llm["eval_duration"] / 1e9) if llm["eval_duration"] else 0.0
+        )
+
+        return {
+            "run": self.run_name,
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            "elapsed_seconds": time.perf_counter() - self._start,
+            "spans": spans,
+            "counters": counters,
+            "llm": llm_summary,
+        }
+
+    def format_summary(self) -> str:
+        """Format the metrics of the run as a table
+
+        Returns:
+            The formatted table
+        """
+        summary = self.summary()
+        output = [f"Timing summary ({summary['run']}, {summary['elapsed_seconds']:.2f} s):"]
+        output.append(f"  {'stage':<22} {'count':>6} {'total s':>9} {'mean ms':>9} {'max ms':>9}")
+        for name, span in summary["spans"].items():
+            output.append(
+                f"  {name:<22} {span['count']:>6} {span['total_seconds']:>9.3f} "
+                f"{span['mean_seconds'] * 1000:>9.1f} {span['max_seconds'] * 1000:>9.1f}"
+            )
+        for name, value in summary["counters"].items():
+            output.append(f"  {name}: {value:g}")
+
+        llm = summary["llm"]
+        if llm["calls"]:
+            output.append(
+                f"  LLM: {llm['calls']} calls, {llm['prompt_tokens']} prompt tokens "
+                f"({llm['prompt_eval_seconds']:.2f} s, {llm['prompt_tokens_per_second']:.1f} tokens/s), "
+                f"{llm['generated_tokens']} generated tokens "
+                f"({llm['eval_seconds']:.2f} s, {llm['generated_tokens_per_second']:.1f} tokens/s), "
+                f"load {llm['load_seconds']:.2f} s"
+            )
+        return "\n".join(output)
+
+    def report(self, stream: Optional[TextIO] = None) -> None:
+        """Print the summary table
+
+        Args:
+            stream: Stream to print to (stdout if None)
+        """
+        print(self.format_summary(), file=stream)
+
+    def write_json(self, path: str) -> None:
+        """Write the metrics of the run as JSON
+
+        Args:
+            path: Path of the JSON file
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2)
+
+# Tracer of the current run, replaced by start_run
+_tracer = Tracer()
+_handler_installed = False
+
+def get_tracer() -> Tracer:
+    """Return the tracer of the current run"""
+    return _tracer
+
+def start_run(run_name: str) -> Tracer:
+    """Start recording a new run and capture Ollama statistics from llama_index
+
+    Args:
+        run_name: Name of the run, e.g. the script name
+
+    Returns:
+        The tracer of the run
+    """
+    global _tracer
+    _tracer = Tracer(run_name)
+    install_llm_handler()
+    return _tracer
+
+def span(name: str):
+    """Time the enclosed block as a span of the current run
+
+    Args:
+        name: Name of the stage
+    """
+    return _tracer.span(name)
+
+def count(name: str, value: float = 1) -> None:
+    """Add to a counter of the current run
+
+    Args:
+        name: Name of the counter
+        value: Amount to add
+    """
+    _tracer.count(name, value)
+
+def finish_run(metrics_file: Optional[str] = None, stream: Optional[TextIO] = None) -> None:
+    """Print the summary of the current run and optionally write it as JSON
+
+    Args:
+        metrics_file: Path of the JSON metrics file, or None
+        stream: Stream to print the summary to (stdout if None)
+    """
+    _tracer.report(stream)
+    if metrics_file:
+        try:
+            _tracer.write_json(metrics_file)
+            print(f"Metrics written to {metrics_file}", file=stream)
+        except OSError as e:
+            print(f"Warning: Could not write metrics to '{metrics_file}': {e}", file=sys.stderr)
+
+def install_llm_handler() -> None:
+    """Record Ollama statistics of every LLM call made through llama_index
+
+    Ollama's complete and stream_complete are implemented with chat, so
+    each generation ends with exactly one chat end event whose raw response
+    carries the token counts and durations.
+    """
+    global _handler_installed
+    if _handler_installed:
+        return
+    try:
+        from llama_index.core.instrumentation import get_dispatcher
+        from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+        from llama_index.core.instrumentation.events.llm import LLMChatEndEvent
+    except ImportError:
+        return
+
+    class OllamaStatsHandler(BaseEventHandler):
+        """Forwards the statistics of finished chats to the current tracer"""
+
+        @classmethod
+        def class_name(cls) -> str:
+            return "OllamaStatsHandler"
+
+        def handle(self, event, **kwargs) -> None:
+            if isinstance(event, LLMChatEndEvent) and event.response is not None:
+                _tracer.record_ollama_stats(event.response.raw)
+
+    get_dispatcher().add_event_handler(OllamaStatsHandler())
+    _handler_installed = True
@@ -0,0 +1,403 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+
+# Import the approximate nearest-neighbour index
+try:
+    from ann_index import IVFIndex, remove_ann_index, fingerprint_node_ids, recommended_list_count
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.ann_index import IVFIndex, remove_ann_index, fingerprint_node_ids, recommended_list_count
+
+# Import the default search width
+try:
+    from defaults import DEFAULT_NPROBE
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.defaults import DEFAULT_NPROBE
+
+MATRIX_FILENAME = "vector_store.npy"
+IDS_FILENAME = "vector_store_ids.json"
+STORE_VERSION = 1
+
+def has_memmap_vector_store(persist_dir: str) -> bool:
+    """Check whether a directory contains a persisted MemmapVectorStore
+
+    Args:
+        persist_dir: Directory where the index is stored
+
+    Returns:
+        True if the matrix and id table files exist
+    """
+    return (
+        os.path.exists(os.path.join(persist_dir, MATRIX_FILENAME))
+        and os.path.exists(os.path.join(persist_dir, IDS_FILENAME))
+    )
+
+class MemmapVectorStore(BasePydanticVectorStore):
+    """Vector store that persists embeddings as a contiguous float32 matrix
+
+    The embeddings are saved as a `.npy` matrix plus a JSON table of node ids
+    and document ids. On load the matrix is opened with `numpy.memmap`, so
+    startup does not parse any JSON vectors and the OS page cache is shared by
+    concurrent processes. Rows are normalised when they are added, so a query
+    is scored with a single matrix-vector product (cosine similarity).
+
+    If an IVF index has been built with `build_ann`, queries only scan the
+    `nprobe` closest inverted lists. Setting `nprobe` to 0, filtering by node
+    or document ids, or modifying the store falls back to the exact scan.
+
+    Node text is kept in the docstore, like with SimpleVectorStore.
+    """
+
+    stores_text: bool = False
+    flat_metadata: bool = False
+    nprobe: int = DEFAULT_NPROBE
+
+    _matrix: np.ndarray = PrivateAttr()
+    _node_ids: List[str] = PrivateAttr()
+    _ref_doc_ids: List[str] = PrivateAttr()
+    _deleted: Set[int] = PrivateAttr()
+    _pending_vectors: List[np.ndarray] = PrivateAttr()
+    _pending_node_ids: List[str] = PrivateAttr()
+    _pending_ref_doc_ids: List[str] = PrivateAttr()
+    _rows_by_doc: Optional[Dict[str, List[int]]] = PrivateAttr()
+    _ann: Optional[IVFIndex] = PrivateAttr()
+    _ann_centroids: Optional[np.ndarray] = PrivateAttr()
+    _lock: Any = PrivateAttr()
+
+    def __init__(
+        self,
+        matrix: Optional[np.ndarray] = None,
+        node_ids: Optional[List[str]] = None,
+        ref_doc_ids: Optional[List[str]] = None,
+        ann: Optional[IVFIndex] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self._matrix = matrix
+        self._node_ids = list(node_ids or [])
+        self._ref_doc_ids = list(ref_doc_ids or [])
+        self._deleted = set()
+        self._pending_vectors = []
+        self._pending_node_ids = []
+        self._pending_ref_doc_ids = []
+        self._rows_by_doc = None
+        self._ann = ann
+        self._ann_centroids = ann.centroids if ann is not None else None
+        self._lock = threading.RLock()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MemmapVectorStore"
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str, mmap: bool = True, nprobe: int = DEFAULT_NPROBE) -> "MemmapVectorStore":
+        """Load a vector store persisted with `persist`
+
+        Args:
+            persist_dir: Directory where the index is stored
+            mmap: Open the matrix with numpy.memmap instead of reading it into memory
+            nprobe: Number of ANN inverted lists scanned per query (0 for exact search)
+
+        Returns:
+            The loaded vector store
+        """
+        with open(os.path.join(persist_dir, IDS_FILENAME), 'r', encoding='utf-8') as f:
+            table = json.load(f)
+
+        if table.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported vector store version: {table.get('version')}")
+
+        matrix = np.load(os.path.join(persist_dir, MATRIX_FILENAME), mmap_mode="r" if mmap else None)
+        if matrix.shape[0] != len(table["node_ids"]):
+            raise ValueError("Vector store matrix and node id table do not match. Please rebuild the index.")
+
+        ann = IVFIndex.load(persist_dir)
+        if ann is not None and (ann.num_rows != matrix.shape[0] or ann.fingerprint != fingerprint_node_ids(table["node_ids"])):
+            print("Warning: ANN index does not match the vector store. Using exact search.")
+            ann = None
+
+        return cls(matrix=matrix, node_ids=table["node_ids"], ref_doc_ids=table["ref_doc_ids"], ann=ann, nprobe=nprobe)
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    @property
+    def matrix(self) -> Optional[np.ndarray]:
+        """The consolidated embedding matrix (one normalised row per node)"""
+        with self._lock:
+            self._consolidate()
+            return self._matrix
+
+    @property
+    def node_ids(self) -> List[str]:
+        """The node id of each matrix row"""
+        with self._lock:
+            self._consolidate()
+            return self._node_ids
+
+    @property
+    def has_ann(self) -> bool:
+        """Whether queries can use the ANN index"""
+        return self._ann is not None
+
+    def build_ann(self, n_lists: Optional[int] = None) -> None:
+        """Build the IVF index for the current vectors
+
+        Centroids of the previous build are reused when the number of nodes
+        has not changed much, so re-indexing only has to reassign the rows.
+
+        Args:
+            n_lists: Number of inverted lists (defaults to about sqrt(nodes))
+        """
+        with self._lock:
+            self._consolidate()
+            if self._matrix is None or not self._node_ids:
+                self._ann = None
+                return
+
+            centroids = self._ann_centroids
+            wanted_lists = n_lists or recommended_list_count(len(self._node_ids))
+            if centroids is not None and (
+                centroids.shape[1] != self._matrix.shape[1]
+                or not wanted_lists / 2 <= centroids.shape[0] <= wanted_lists * 2
+            ):
+                centroids = None
+
+            self._ann = IVFIndex.build(self._matrix, self._node_ids, n_lists=wanted_lists, centroids=centroids)
+            self._ann_centroids = self._ann.centroids
+
+    def drop_ann(self) -> None:
+        """Stop using the ANN index (it is removed on the next persist)"""
+        with self._lock:
+            self._ann = None
+
+    @property
+    def node_count(self) -> int:
+        """Number of nodes in the store"""
+        with self._lock:
+            return len(self._node_ids) - len(self._deleted) + len(self._pending_node_ids)
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        """Add nodes with their embeddings to the store
+
+        Args:
+            nodes: Nodes with embeddings
+
+        Returns:
+            The ids of the added nodes
+        """
+        if not nodes:
+            return []
+
+        vectors = _normalize(np.asarray([node.get_embedding() for node in nodes], dtype=np.float32))
+        with self._lock:
+            self._ann = None
+            self._pending_vectors.append(vectors)
+            self._pending_node_ids.extend(node.node_id for node in nodes)
+            self._pending_ref_doc_ids.extend(node.ref_doc_id or "" for node in nodes)
+
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        """Delete all nodes of a document
+
+        Args:
+            ref_doc_id: Id of the document whose nodes are deleted
+        """
+        with self._lock:
+            self._ann = None
+            if ref_doc_id in self._pending_ref_doc_ids:
+                self._consolidate()
+
+            # Deleting a changed file deletes one document at a time, so the
+            # row lookup is built once and the matrix is only compacted later
+            if self._rows_by_doc is None:
+                self._rows_by_doc = {}
+                for i, doc_id in enumerate(self._ref_doc_ids):
+                    self._rows_by_doc.setdefault(doc_id, []).append(i)
+            self._deleted.update(self._rows_by_doc.get(ref_doc_id, []))
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, filters: Any = None, **delete_kwargs: Any) -> None:
+        """Delete nodes by id
+
+        Args:
+            node_ids: Ids of the nodes to delete
+        """
+        if filters is not None:
+            raise NotImplementedError("MemmapVectorStore does not support metadata filters.")
+        if not node_ids:
+            return
+
+        wanted = set(node_ids)
+        with self._lock:
+            self._ann = None
+            if not wanted.isdisjoint(self._pending_node_ids):
+                self._consolidate()
+            self._deleted.update(i for i, node_id in enumerate(self._node_ids) if node_id in wanted)
+
+    def clear(self) -> None:
+        """Remove all nodes from the store"""
+        with self._lock:
+            self._matrix = None
+            self._node_ids = []
+            self._ref_doc_ids = []
+            self._deleted = set()
+            self._pending_vectors = []
+            self._pending_node_ids = []
+            self._pending_ref_doc_ids = []
+            self._rows_by_doc = None
+            self._ann = None
+
+    def _consolidate(self) -> None:
+        """Merge pending additions and drop deleted rows into one matrix"""
+        if not self._pending_vectors and not self._deleted:
+            return
+
+        parts = []
+        if self._matrix is not None and len(self._node_ids):
+            if self._deleted:
+                keep = np.ones(len(self._node_ids), dtype=bool)
+                keep[list(self._deleted)] = False
+                parts.append(np.asarray(self._matrix)[keep])
+                self._node_ids = [node_id for i, node_id in enumerate(self._node_ids) if keep[i]]
+                self._ref_doc_ids = [doc_id for i, doc_id in enumerate(self._ref_doc_ids) if keep[i]]
+            else:
+                parts.append(np.asarray(self._matrix))
+        parts.extend(self._pending_vectors)
+
+        self._matrix = np.ascontiguousarray(np.vstack(parts), dtype=np.float32) if parts else None
+        self._node_ids.extend(self._pending_node_ids)
+        self._ref_doc_ids.extend(self._pending_ref_doc_ids)
+        self._deleted = set()
+        self._pending_vectors = []
+        self._pending_node_ids = []
+        self._pending_ref_doc_ids = []
+        self._rows_by_doc = None
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        """Return the nodes most similar to the query embedding
+
+        Args:
+            query: The vector store query
+
+        Returns:
+            The ids and cosine similarities of the top-k nodes
+        """
+        if query.filters is not None:
+            raise NotImplementedError("MemmapVectorStore does not support metadata filters.")
+        if query.query_embedding is None:
+            raise ValueError("MemmapVectorStore requires a query embedding.")
+
+        with self._lock:
+            self._consolidate()
+            matrix, node_ids, ref_doc_ids, ann = self._matrix, self._node_ids, self._ref_doc_ids, self._ann
+
+        if matrix is None or not node_ids:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+
+        query_vector = _normalize(np.asarray([query.query_embedding], dtype=np.float32))[0]
+
+        if ann is not None and self.nprobe > 0 and query.node_ids is None and query.doc_ids is None:
+            rows, ann_scores = ann.search(matrix, query_vector, query.similarity_top_k, self.nprobe)
+            # Too few candidates in the probed lists; fall back to the exact scan
+            if rows.size >= min(query.similarity_top_k, len(node_ids)):
+                return VectorStoreQueryResult(
+                    nodes=None,
+                    similarities=[float(score) for score in ann_scores],
+                    ids=[node_ids[row] for row in rows],
+                )
+
+        scores = matrix @ query_vector
+
+        # Restrict the candidates when the query names specific nodes or documents
+        if query.node_ids is not None or query.doc_ids is not None:
+            allowed_nodes = set(query.node_ids) if query.node_ids is not None else None
+            allowed_docs = set(query.doc_ids) if query.doc_ids is not None else None
+            mask = np.array([
+                (allowed_nodes is None or node_id in allowed_nodes)
+                and (allowed_docs is None or doc_id in allowed_docs)
+                for node_id, doc_id in zip(node_ids, ref_doc_ids)
+            ], dtype=bool)
+            scores = np.where(mask, scores, -np.inf)
+
+        top_rows = _top_k(scores, query.similarity_top_k)
+        return VectorStoreQueryResult(
+            nodes=None,
+            similarities=[float(scores[row]) for row in top_rows],
+            ids=[node_ids[row] for row in top_rows],
+        )
+
+    def persist(self, persist_path: str, fs: Any = None) -> None:
+        """Save the matrix and id table next to the other index files
+
+        StorageContext passes the path of the default JSON vector store file;
+        the store writes its own files into the same directory instead.
+
+        Args:
+            persist_path: Path of the default vector store file inside the index directory
+        """
+        persist_dir = os.path.dirname(persist_path) or "."
+        os.makedirs(persist_dir, exist_ok=True)
+
+        with self._lock:
+            self._consolidate()
+            matrix = self._matrix
+            if matrix is None:
+                matrix = np.zeros((0, 0), dtype=np.float32)
+            table = {
+                "version": STORE_VERSION,
+                "dim": int(matrix.shape[1]),
+                "node_ids": self._node_ids,
+                "ref_doc_ids": self._ref_doc_ids,
+            }
+
+            # Write to temporary files first so readers never see a half-written matrix
+            matrix_path = os.path.join(persist_dir, MATRIX_FILENAME)
+            ids_path = os.path.join(persist_dir, IDS_FILENAME)
+            with open(matrix_path + ".tmp", 'wb') as f:
+                np.save(f, np.ascontiguousarray(matrix, dtype=np.float32))
+            with open(ids_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(table, f)
+            os.replace(matrix_path + ".tmp", matrix_path)
+            os.replace(ids_path + ".tmp", ids_path)
+
+            if self._ann is not None:
+                self._ann.save(persist_dir)
+            else:
+                remove_ann_index(persist_dir)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length (zero rows are left unchanged)"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the row numbers of the k highest finite scores in descending order"""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+
+    if k < scores.shape[0]:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.shape[0])
+    ordered = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return ordered[np.isfinite(scores[ordered])]
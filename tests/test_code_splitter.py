@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Checks of the code-aware splitter on the sample files. split_code needs
+# llama_index's tokenizer but no Ollama server.
+#
+#   python -m pytest tests
+
+import os
+import re
+
+import pytest
+
+pytest.importorskip("llama_index.core")
+
+try:
+    from code_splitter import split_code
+except ImportError:
+    # If imported from a different directory
+    from code_review_assistant.code_splitter import split_code
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHUNK_SIZES = [32, 64, 128, 1024]
+# Chunk sizes small enough to split the samples into their methods and blocks
+SYMBOL_CHUNK_SIZES = [32, 64, 128]
+
+# (sample file, language, symbols some chunk must carry)
+SAMPLES = [
+    ("sample_code.php", "php", ["UserController::login", "UserController::saveUser"]),
+    ("sample_code.js", "js", ["AuthController.login", "AuthController.logout", "AuthService.isLoggedIn"]),
+    ("sample_view.ctp", "ctp", ["div.users::div.profile-info", "div.users::form"]),
+]
+
+# A line that only closes blocks: brackets, `})();`, `</div>`, `<?php endforeach; ?>`
+CLOSING_LINE = re.compile(r"^(?:[\s)}\];,]|\(\)|</\w+\s*>|<\?(?:php)?|\?>|\bend\w+\b)*$")
+
+def load_sample(file_name):
+    with open(os.path.join(ROOT_DIR, file_name), encoding="utf-8") as f:
+        return f.read()
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("file_name, language, symbols", SAMPLES)
+def test_every_line_is_covered(file_name, language, symbols, chunk_size):
+    lines = load_sample(file_name).split("\n")
+    chunks = split_code("\n".join(lines), language, chunk_size)
+
+    covered = set()
+    for chunk in chunks:
+        assert 1 <= chunk.start_line <= chunk.end_line <= len(lines)
+        covered.update(range(chunk.start_line, chunk.end_line + 1))
+    missing = [number for number, line in enumerate(lines, 1) if line.strip() and number not in covered]
+    assert not missing, f"lines not in any chunk: {missing}"
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("file_name, language, symbols", SAMPLES)
+def test_no_chunk_of_closing_lines_only(file_name, language, symbols, chunk_size):
+    for chunk in split_code(load_sample(file_name), language, chunk_size):
+        assert not all(CLOSING_LINE.match(line) for line in chunk.text.split("\n")), (
+            f"chunk of lines {chunk.start_line}-{chunk.end_line} only closes blocks: {chunk.text!r}"
+        )
+
+@pytest.mark.parametrize("chunk_size", SYMBOL_CHUNK_SIZES)
+@pytest.mark.parametrize("file_name, language, symbols", SAMPLES)
+def test_methods_keep_their_symbols(file_name, language, symbols, chunk_size):
+    found = set()
+    for chunk in split_code(load_sample(file_name), language, chunk_size):
+        found.update(chunk.symbol.split(", "))
+    assert set(symbols) <= found, f"missing symbols: {sorted(set(symbols) - found)}"